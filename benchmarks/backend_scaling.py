@@ -0,0 +1,109 @@
+"""
+Measures how decryption scales with workers for each execution backend.
+
+Keys are read once from a key file into a single keyring, which every thread
+of the thread backend shares and each process of the process backend receives
+a copy of. The token's key is last, so each token is tried against the whole
+keyring. Run on a free-threaded build
+(such as python3.13t) to compare threads against processes:
+
+    python benchmarks/backend_scaling.py --files 64 --lines 200 --keys 64
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from cryptography.fernet import Fernet
+
+from bullcrypt import main
+
+
+def _prepare(directory: str, files: int, lines: int, keys: int) -> None:
+    keyring: List[bytes] = [Fernet.generate_key() for _ in range(keys)]
+    fernet = Fernet(keyring[-1])
+    tokens: str = os.path.join(directory, "tokens")
+    os.mkdir(tokens)
+    for index in range(files):
+        with open(os.path.join(tokens, f"tokens-{index}"), "wb") as file:
+            file.writelines(
+                fernet.encrypt(b"benchmark plaintext %d" % line) + b"\n"
+                for line in range(lines)
+            )
+
+    with open(os.path.join(directory, "keys"), "wb") as file:
+        file.writelines(key + b"\n" for key in keyring)
+
+
+def _run(directory: str, backend: str, jobs: int) -> float:
+    args: List[str] = [
+        "--line",
+        "--plain",
+        "--recursive",
+        f"--jobs={jobs}",
+        f"--backend={backend}",
+        f"--fernet.key-file={os.path.join(directory, 'keys')}",
+        "fernet",
+        os.path.join(directory, "tokens"),
+    ]
+
+    start: float = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.main(args)
+
+    return time.perf_counter() - start
+
+
+def _job_counts(maximum: int) -> List[int]:
+    # A single job runs serially, without a pool.
+    counts: List[int] = []
+    jobs: int = 2
+    while jobs < maximum:
+        counts.append(jobs)
+        jobs *= 2
+
+    return counts + [max(maximum, 2)]
+
+
+def benchmark() -> None:
+    """
+    Runs the benchmark and prints a table of timings.
+
+    :return: None.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--lines", type=int, default=100)
+    parser.add_argument("--keys", type=int, default=32)
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--backend", action="append", choices=("thread", "process"), default=[]
+    )
+    args = parser.parse_args()
+
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    print(f"Python {sys.version.split()[0]}, GIL enabled: {is_gil_enabled()}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        _prepare(directory, args.files, args.lines, args.keys)
+        baseline: float = _run(directory, "process", 1)
+        print(f"{'backend':>8} {'jobs':>4} {'seconds':>8} {'speedup':>7}")
+        print(f"{'serial':>8} {1:>4} {baseline:>8.2f} {1:>7.2f}")
+
+        for backend in args.backend or ["thread", "process"]:
+            for jobs in _job_counts(args.max_jobs):
+                elapsed: float = _run(directory, backend, jobs)
+                print(
+                    f"{backend:>8} {jobs:>4} {elapsed:>8.2f} "
+                    f"{baseline / elapsed:>7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    benchmark()
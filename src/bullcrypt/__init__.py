@@ -0,0 +1,9 @@
+"""
+Decrypts ciphertexts in bulk using pluggable algorithms.
+"""
+
+from typing import Tuple
+
+from .api import Decryptor, Results, decrypt
+
+__all__: Tuple[str, ...] = ("Decryptor", "Results", "decrypt")
@@ -1,22 +1,50 @@
 """
 Abstract algorithm for decryption handling.
+
+Plugins implement the batch interface: `setup` prepares per-worker state once,
+such as parsed keys or cipher contexts, and `decrypt_batch` decrypts many
+payloads against that state, returning compact `types.DecryptionResult`
+records. Plugins written against the original interface, which only provide
+`_decryption_group` or `decrypt`, keep working through the default
+`decrypt_batch`.
 """
 
 import argparse
 import functools
 import pathlib
 from abc import abstractmethod
-from typing import Optional, Tuple, TYPE_CHECKING, Generator, Callable, Any
+from typing import (
+    Optional,
+    Tuple,
+    Generator,
+    Callable,
+    Any,
+    Sequence,
+    List,
+)
+
+from .. import scoring, types, utils
+
 
-from .. import utils
+class State:
+    """Per-worker state prepared by `Algorithm.setup`."""
 
-if TYPE_CHECKING:
-    from .. import types
+    __slots__ = ("options", "validator")
+
+    def __init__(
+        self, options: "types.Options", validator: Optional[scoring.Validator]
+    ) -> None:
+        self.options: "types.Options" = options
+        self.validator: Optional[scoring.Validator] = validator
 
 
 class Algorithm:
     """Algorithm for decryption."""
 
+    #: Validators applied when none are requested. Authenticated algorithms
+    #: reject wrong keys themselves and need none.
+    default_validators: Tuple[scoring.Validator, ...] = ()
+
     @classmethod
     def extract_content(
         cls, file_path: pathlib.Path, options: "types.Options"
@@ -36,6 +64,253 @@ class Algorithm:
             encoding=options.encoding,
         )
 
+    @classmethod
+    def extract_positioned_content(
+        cls,
+        file_path: pathlib.Path,
+        options: "types.Options",
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> Generator[Tuple[int, bytes], None, None]:
+        """
+        Extract ciphertext from a file along with positions to resume from.
+
+        Plugins that only override `extract_content` keep working; their
+        positions count payloads.
+
+        :param file_path: File path to extract ciphertext from.
+        :param options: Parsing options.
+        :param start: Position to resume from, as previously yielded.
+        :param stop: Position to end at, as previously yielded or, where
+            `splittable`, a line boundary.
+        :return: Generator of positions and ciphertext bytes.
+        """
+
+        if cls._overrides_extraction():
+            payloads = cls.extract_content(file_path, options)
+            for position, payload in enumerate(payloads, start=1):
+                if position > start:
+                    yield position, payload
+
+                if position == stop:
+                    return
+
+            return
+
+        yield from utils.extract_positioned_content(
+            file_path,
+            mode=options.mode,
+            plaintext_encoding=options.plaintext_encoding,
+            encoding=options.encoding,
+            start=start,
+            stop=stop,
+        )
+
+    @classmethod
+    def _overrides_extraction(cls) -> bool:
+        extract_content = cls.extract_content.__func__  # type: ignore[attr-defined]
+        return extract_content is not Algorithm.extract_content.__func__  # type: ignore[attr-defined]
+
+    @classmethod
+    def splittable(cls, options: "types.Options") -> bool:
+        """
+        Whether a file may be divided at line boundaries into byte ranges
+        that are decrypted independently.
+
+        :param options: Decryption options.
+        :return: Whether positions are byte offsets of line boundaries.
+        """
+
+        return (
+            options.mode == "line"
+            and utils.is_ascii_compatible(options.encoding)
+            and not cls.rewrites(options)
+            and not cls._overrides_extraction()
+        )
+
+    @classmethod
+    def sniff(cls, prefix: bytes, options: "types.Options") -> bool:
+        """
+        Cheaply checks whether a file could contain ciphertext.
+
+        Files found while recursing that fail the check are skipped without
+        being read in full. Implementations should only reject files that
+        certainly hold no payloads.
+
+        :param prefix: Leading bytes of the file.
+        :param options: Parsing options.
+        :return: Whether the file should be processed.
+        """
+
+        return utils.plausible_content(
+            prefix, options.mode, options.plaintext_encoding, options.encoding
+        )
+
+    @classmethod
+    def setup(cls, options: "types.Options") -> State:
+        """
+        Prepares state reused across every payload a worker decrypts.
+
+        Called once per worker. Subclasses may return a `State` subclass
+        holding parsed keys or cipher contexts; it must be picklable.
+
+        :param options: Decryption options.
+        :return: Worker state passed to `decrypt_batch`.
+        """
+
+        return State(options, cls.validator(options))
+
+    @classmethod
+    def decrypt_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List["types.DecryptionResult"]:
+        """
+        Decrypts a batch of payloads.
+
+        The default implementation adapts the original per-payload interface
+        (`decrypt`), trying keys in order until one passes validation.
+
+        :param state: Worker state from `setup`.
+        :param payloads: Ciphertexts to decrypt.
+        :return: One result for each payload that was decrypted.
+        """
+
+        results: List[types.DecryptionResult] = []
+        for index, payload in enumerate(payloads):
+            match: Optional[Tuple[int, bytes]] = scoring.select(
+                utils.attempt_all(cls.decrypt(payload, state.options)()),
+                state.validator,
+            )
+            if match is not None:
+                results.append(types.DecryptionResult(index, *match))
+
+        return results
+
+    # noinspection PyUnusedLocal
+    @classmethod
+    def decrypt_file(
+        cls, state: State, file_path: pathlib.Path
+    ) -> Optional[List["types.DecryptionResult"]]:
+        """
+        Decrypts a whole file directly, bypassing payload extraction.
+
+        Allows plugins to stream payloads too large to read into memory.
+        Plugins that write plaintext elsewhere, such as to a file, may report
+        where it was written in place of the plaintext.
+
+        :param state: Worker state from `setup`.
+        :param file_path: File to decrypt.
+        :return: Results for the file, or None to extract payloads as usual.
+        """
+
+        del state, file_path
+        return None
+
+    # noinspection PyUnusedLocal
+    @classmethod
+    def rewrites(cls, options: "types.Options") -> bool:
+        """
+        Whether files are rewritten, such as re-encrypted under a new key,
+        rather than having their plaintext reported.
+
+        :param options: Decryption options.
+        :return: Whether to call `rewrite_batch` instead of `decrypt_batch`.
+        """
+
+        del options
+        return False
+
+    @classmethod
+    def rewrite_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List[Optional[bytes]]:
+        """
+        Produces replacement ciphertexts for a batch of payloads.
+
+        :param state: Worker state from `setup`.
+        :param payloads: Ciphertexts to replace.
+        :return: A replacement for each payload, or None to keep it unchanged.
+        """
+
+        return [None] * len(payloads)
+
+    # noinspection PyUnusedLocal
+    @classmethod
+    def key_count(cls, options: "types.Options") -> Optional[int]:
+        """
+        Counts the keys tried against each payload.
+
+        :param options: Decryption options.
+        :return: Number of keys, or None if the key space cannot be split.
+        """
+
+        del options
+        return None
+
+    @classmethod
+    def cost(cls, options: "types.Options") -> float:
+        """
+        Estimates the relative cost of trying to decrypt a payload, so that
+        cheaper algorithms are tried first when several are.
+
+        :param options: Decryption options.
+        :return: Cost in units of roughly one key trial.
+        """
+
+        return float(cls.key_count(options) or 1)
+
+    # noinspection PyUnusedLocal
+    @classmethod
+    def plausible(cls, payload: bytes, options: "types.Options") -> bool:
+        """
+        Cheaply checks whether a payload could be ciphertext for the
+        algorithm, such as by its length or format, before any decryption.
+
+        Implementations should only reject payloads that certainly cannot
+        be decrypted.
+
+        :param payload: Ciphertext as extracted.
+        :param options: Decryption options.
+        :return: Whether decryption should be attempted.
+        """
+
+        del payload, options
+        return True
+
+    # noinspection PyUnusedLocal
+    @classmethod
+    def recovers_keys(cls, options: "types.Options") -> bool:
+        """
+        Whether keys are guessed from the ciphertext rather than given, so
+        that some plaintext is produced for nearly any payload.
+
+        Such algorithms are only tried by `any` when asked to.
+
+        :param options: Decryption options.
+        :return: Whether keys are recovered.
+        """
+
+        del options
+        return False
+
+    @classmethod
+    def restrict_keys(
+        cls, options: "types.Options", start: int, stop: int
+    ) -> "types.Options":
+        """
+        Limits decryption to a range of keys, for splitting the key space.
+
+        Key indices reported for the restricted options are relative to `start`.
+
+        :param options: Decryption options.
+        :param start: Index of the first key to keep.
+        :param stop: Index after the last key to keep.
+        :return: Options using only keys in the range.
+        """
+
+        del start, stop
+        return options
+
     @classmethod
     @abstractmethod
     def _decryption_group(
@@ -65,6 +340,18 @@ class Algorithm:
 
         return functools.partial(cls._decryption_group, payload, options)
 
+    @classmethod
+    def validator(cls, options: "types.Options") -> Optional[scoring.Validator]:
+        """
+        Provides the validator used to accept candidate plaintexts.
+
+        :param options: Decryption options.
+        :return: A validator, or None to accept the first successful decryption.
+        """
+
+        validators = options.validators or cls.default_validators
+        return scoring.Pipeline(validators) if validators else None
+
     # noinspection PyUnusedLocal
     @classmethod
     def register_args(
@@ -98,4 +385,4 @@ class Algorithm:
         return None
 
 
-__all__: Tuple[str, ...] = ("Algorithm",)
+__all__: Tuple[str, ...] = ("Algorithm", "State")
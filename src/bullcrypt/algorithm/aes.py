@@ -0,0 +1,124 @@
+"""
+Decrypts raw AES ciphertexts in CBC and GCM modes.
+
+CBC has no authentication, so a wrong key is first rejected cheaply by
+decrypting only the last block and checking its PKCS7 padding; roughly one in
+256 wrong keys passes and is left to the validators, which default to
+expecting printable text only when several keys are tried. GCM keys are
+rejected by their tag.
+"""
+
+import argparse
+from typing import Any, Dict, Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import (
+    Cipher,
+    CipherContext,
+    algorithms,
+    modes,
+)
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .. import scoring, types
+from .symmetric import Symmetric
+
+_BLOCK_SIZE: int = 16
+
+
+def _xor(left: bytes, right: bytes) -> bytes:
+    return (int.from_bytes(left, "big") ^ int.from_bytes(right, "big")).to_bytes(
+        len(left), "big"
+    )
+
+
+class AesCbc(Symmetric[CipherContext]):
+    """Plugin for decrypting AES-CBC ciphertext with a prefixed IV."""
+
+    cipher_name = "AES-CBC"
+    key_sizes = (16, 24, 32)
+    nonce_size = _BLOCK_SIZE
+
+    @classmethod
+    def prepare(cls, key: bytes) -> CipherContext:
+        # CBC is applied over a reusable ECB context, as CBC contexts are
+        # bound to a single IV.
+        return Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+
+    @classmethod
+    def decrypt_with(
+        cls, context: CipherContext, nonce: bytes, ciphertext: bytes, tag: bytes
+    ) -> Optional[bytes]:
+        if not ciphertext or len(ciphertext) % _BLOCK_SIZE:
+            return None
+
+        previous: bytes = (
+            ciphertext[-2 * _BLOCK_SIZE : -_BLOCK_SIZE]
+            if len(ciphertext) > _BLOCK_SIZE
+            else nonce
+        )
+        last: bytes = _xor(context.update(ciphertext[-_BLOCK_SIZE:]), previous)
+        padding: int = last[-1]
+        if (
+            not 0 < padding <= _BLOCK_SIZE
+            or last[-padding:] != bytes([padding]) * padding
+        ):
+            return None
+
+        body: bytes = ciphertext[:-_BLOCK_SIZE]
+        if not body:
+            return last[:-padding]
+
+        chained: bytes = nonce + body[:-_BLOCK_SIZE]
+        return _xor(context.update(body), chained) + last[:-padding]
+
+    @classmethod
+    def validator(cls, options: "types.Options") -> Optional[scoring.Validator]:
+        # Wrong keys pass the padding check once in 256 tries, which only
+        # matters when several keys are tried; a single key's plaintext,
+        # binary or not, is kept.
+        if options.validators or not isinstance(options.algorithm_options, dict):
+            return super().validator(options)
+
+        if options.algorithm_options.get("key_total", 1) < 2:
+            return None
+
+        return scoring.Pipeline((scoring.PrintableValidator(),))
+
+    @classmethod
+    def extract_args(
+        cls, algorithm_name: str, args: argparse.Namespace
+    ) -> Optional[Dict[str, Any]]:
+        algorithm_options: Optional[Dict[str, Any]] = super().extract_args(
+            algorithm_name, args
+        )
+        if algorithm_options is not None:
+            # Counted before the keys are split across distributed workers.
+            algorithm_options["key_total"] = len(algorithm_options["key"])
+
+        return algorithm_options
+
+
+class AesGcm(Symmetric[AESGCM]):
+    """Plugin for decrypting AES-GCM ciphertext with a prefixed nonce."""
+
+    cipher_name = "AES-GCM"
+    key_sizes = (16, 24, 32)
+    nonce_size = 12
+    tag_size = 16
+
+    @classmethod
+    def prepare(cls, key: bytes) -> AESGCM:
+        return AESGCM(key)
+
+    @classmethod
+    def decrypt_with(
+        cls, context: AESGCM, nonce: bytes, ciphertext: bytes, tag: bytes
+    ) -> Optional[bytes]:
+        try:
+            return context.decrypt(nonce, ciphertext + tag, None)
+        except InvalidTag:
+            return None
+
+
+__all__: Tuple[str, ...] = ("AesCbc", "AesGcm")
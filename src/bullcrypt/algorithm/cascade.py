@@ -0,0 +1,236 @@
+"""
+Tries every installed algorithm, for ciphertexts of unknown scheme.
+
+Each file is read once. Every payload is offered to the algorithms in order
+of their estimated cost, skipping those whose cheap structural check rules the
+payload out, until one decrypts it. Results name the algorithm that matched.
+When any algorithm rewrites files, such as Fernet rekeying, payloads are
+offered to the rewriting algorithms instead.
+"""
+
+import argparse
+import functools
+import logging
+import pathlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from .. import scoring, types, utils
+from ..algorithm import Algorithm, State
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class CascadeState(State):
+    """Worker state holding each algorithm's state, cheapest first."""
+
+    __slots__ = ("algorithms",)
+
+    def __init__(
+        self,
+        options: "types.Options",
+        validator: Optional[scoring.Validator],
+        algorithms: Sequence[Tuple[str, Type[Algorithm], State]],
+    ) -> None:
+        super().__init__(options, validator)
+        self.algorithms: Tuple[Tuple[str, Type[Algorithm], State], ...] = tuple(
+            algorithms
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _algorithms() -> Tuple[Tuple[str, Type[Algorithm]], ...]:
+    return tuple(
+        (entry_point.name, handler)
+        for entry_point in utils.get_algorithms()
+        for handler in (entry_point.load(),)
+        if not issubclass(handler, Cascade)
+    )
+
+
+class Cascade(Algorithm):
+    """Plugin that tries every other installed algorithm, cheapest first."""
+
+    @classmethod
+    def _configured(
+        cls, options: "types.Options"
+    ) -> List[Tuple[str, Type[Algorithm], "types.Options"]]:
+        if not isinstance(options.algorithm_options, dict):
+            raise ValueError("Algorithm options expected to be a dict")
+
+        configured: List[Tuple[str, Type[Algorithm], "types.Options"]] = [
+            (name, handler, options._replace(algorithm_options=sub_options))
+            for name, handler in _algorithms()
+            if name in options.algorithm_options
+            for sub_options in (options.algorithm_options[name],)
+        ]
+        configured.sort(key=lambda item: item[1].cost(item[2]))
+        return configured
+
+    @classmethod
+    def sniff(cls, prefix: bytes, options: "types.Options") -> bool:
+        return any(
+            handler.sniff(prefix, sub_options)
+            for _name, handler, sub_options in cls._configured(options)
+        )
+
+    @classmethod
+    def setup(cls, options: "types.Options") -> CascadeState:
+        return CascadeState(
+            options,
+            cls.validator(options),
+            [
+                (name, handler, handler.setup(sub_options))
+                for name, handler, sub_options in cls._configured(options)
+            ],
+        )
+
+    @classmethod
+    def decrypt_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List["types.DecryptionResult"]:
+        if not isinstance(state, CascadeState):
+            raise ValueError("Cascade state expected; use Cascade.setup")
+
+        matches: Dict[int, types.DecryptionResult] = {}
+        pending: List[int] = list(range(len(payloads)))
+        for name, handler, algorithm_state in state.algorithms:
+            # Structural checks are far cheaper than decryption.
+            plausible: List[int] = [
+                index
+                for index in pending
+                if handler.plausible(payloads[index], algorithm_state.options)
+            ]
+            if not plausible:
+                continue
+
+            for result in handler.decrypt_batch(
+                algorithm_state, [payloads[index] for index in plausible]
+            ):
+                index: int = plausible[result.index]
+                matches[index] = types.DecryptionResult(
+                    index, result.key_index, result.plaintext, name
+                )
+
+            pending = [index for index in pending if index not in matches]
+            if not pending:
+                break
+
+        return [matches[index] for index in sorted(matches)]
+
+    @classmethod
+    def decrypt_file(
+        cls, state: State, file_path: pathlib.Path
+    ) -> Optional[List["types.DecryptionResult"]]:
+        if not isinstance(state, CascadeState):
+            raise ValueError("Cascade state expected; use Cascade.setup")
+
+        for name, handler, algorithm_state in state.algorithms:
+            results = handler.decrypt_file(algorithm_state, file_path)
+            # Even an empty list means the file was handled, such as by a
+            # streamed token that no key matched.
+            if results is not None:
+                return [
+                    types.DecryptionResult(
+                        result.index, result.key_index, result.plaintext, name
+                    )
+                    for result in results
+                ]
+
+        # Other algorithms may still match the extracted payloads.
+        return None
+
+    @classmethod
+    def rewrites(cls, options: "types.Options") -> bool:
+        return any(
+            handler.rewrites(sub_options)
+            for _name, handler, sub_options in cls._configured(options)
+        )
+
+    @classmethod
+    def rewrite_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List[Optional[bytes]]:
+        if not isinstance(state, CascadeState):
+            raise ValueError("Cascade state expected; use Cascade.setup")
+
+        replacements: List[Optional[bytes]] = [None] * len(payloads)
+        pending: List[int] = list(range(len(payloads)))
+        for _name, handler, algorithm_state in state.algorithms:
+            if not handler.rewrites(algorithm_state.options):
+                continue
+
+            plausible: List[int] = [
+                index
+                for index in pending
+                if handler.plausible(payloads[index], algorithm_state.options)
+            ]
+            rewritten: List[Optional[bytes]] = handler.rewrite_batch(
+                algorithm_state, [payloads[index] for index in plausible]
+            )
+            for index, replacement in zip(plausible, rewritten):
+                replacements[index] = replacement
+
+            pending = [index for index in pending if replacements[index] is None]
+            if not pending:
+                break
+
+        return replacements
+
+    @classmethod
+    def cost(cls, options: "types.Options") -> float:
+        return sum(
+            handler.cost(sub_options)
+            for _name, handler, sub_options in cls._configured(options)
+        )
+
+    @classmethod
+    def register_args(
+        cls, algorithm_name: str, parser: argparse.ArgumentParser
+    ) -> None:
+        group = parser.add_argument_group(f"Any algorithm ({algorithm_name})")
+        group.add_argument(
+            f"--{algorithm_name}.recover",
+            dest=f"{algorithm_name}.recover",
+            action="store_true",
+            help="Also try algorithms that recover keys from the ciphertext, "
+            "such as XOR without --xor.key. Recovered keys produce a plaintext "
+            "for nearly any payload, so pair this with --match or --english.",
+        )
+
+    @classmethod
+    def extract_args(
+        cls, algorithm_name: str, args: argparse.Namespace
+    ) -> Optional[Dict[str, Any]]:
+        recover: bool = getattr(args, f"{algorithm_name}.recover", False)
+        algorithm_options: Dict[str, Any] = {}
+        for name, handler in _algorithms():
+            try:
+                sub_options: Any = handler.extract_args(name, args)
+            except ValueError as e:
+                # Algorithms missing required options, such as keys, are left out.
+                logger.info("Not trying %s: %s", name, e)
+                continue
+
+            probe: types.Options = types.Options(
+                mode="raw", plaintext_encoding=None, algorithm_options=sub_options
+            )
+            if not recover and handler.recovers_keys(probe):
+                logger.info(
+                    "Not trying %s: it recovers keys; pass --%s.recover to do so",
+                    name,
+                    algorithm_name,
+                )
+                continue
+
+            algorithm_options[name] = sub_options
+
+        if not algorithm_options:
+            raise ValueError(
+                f"No algorithm could be configured for {algorithm_name}; "
+                "provide the options of at least one, such as its keys."
+            )
+
+        return algorithm_options
+
+
+__all__: Tuple[str, ...] = ("Cascade", "CascadeState")
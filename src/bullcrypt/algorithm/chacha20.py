@@ -0,0 +1,37 @@
+"""
+Decrypts raw ChaCha20-Poly1305 ciphertexts.
+"""
+
+from typing import Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import (
+    ChaCha20Poly1305 as _ChaCha20Poly1305,
+)
+
+from .symmetric import Symmetric
+
+
+class ChaCha20Poly1305(Symmetric[_ChaCha20Poly1305]):
+    """Plugin for decrypting ChaCha20-Poly1305 ciphertext with a prefixed nonce."""
+
+    cipher_name = "ChaCha20-Poly1305"
+    key_sizes = (32,)
+    nonce_size = 12
+    tag_size = 16
+
+    @classmethod
+    def prepare(cls, key: bytes) -> _ChaCha20Poly1305:
+        return _ChaCha20Poly1305(key)
+
+    @classmethod
+    def decrypt_with(
+        cls, context: _ChaCha20Poly1305, nonce: bytes, ciphertext: bytes, tag: bytes
+    ) -> Optional[bytes]:
+        try:
+            return context.decrypt(nonce, ciphertext + tag, None)
+        except InvalidTag:
+            return None
+
+
+__all__: Tuple[str, ...] = ("ChaCha20Poly1305",)
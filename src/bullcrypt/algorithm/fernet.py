@@ -3,16 +3,67 @@ Wrapper around `cryptography` to decrypt Fernet ciphertexts.
 """
 
 import argparse
+import base64
+import binascii
 import functools
-from typing import Optional, Dict, Tuple, TYPE_CHECKING, Callable, Generator, List
+import logging
+import mmap
+import os
+import pathlib
+from typing import (
+    Optional,
+    Dict,
+    Tuple,
+    Callable,
+    Generator,
+    Iterator,
+    List,
+    Sequence,
+)
 
-from cryptography.fernet import Fernet as _Fernet
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import Fernet as _Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes, hmac
 
-from ..algorithm import Algorithm
+from .. import scoring, types, utils
+from ..algorithm import Algorithm, State, fernet_stream
+from .fernet_keyring import Keyring
 
+logger: logging.Logger = logging.getLogger(__name__)
 
-if TYPE_CHECKING:
-    from .. import types
+_VERSION: bytes = b"gA"
+_STREAM_SIZE: int = 64 * 1024 * 1024
+_HEADER_LENGTH: int = 25
+_TAG_LENGTH: int = 32
+# A token holds its header, at least one AES block, and its tag, encoded.
+_MIN_TOKEN_LENGTH: int = 100
+
+
+class FernetState(State):
+    """Worker state holding the keyring and the key to rekey with."""
+
+    __slots__ = ("keyring", "rekeyed")
+
+    def __init__(
+        self,
+        options: "types.Options",
+        validator: Optional[scoring.Validator],
+        keyring: Keyring,
+        rekeyed: Optional[_Fernet] = None,
+    ) -> None:
+        super().__init__(options, validator)
+        self.keyring: Keyring = keyring
+        self.rekeyed: Optional[_Fernet] = rekeyed
+
+
+def _mirrored(file_path: pathlib.Path, roots: Sequence[str]) -> pathlib.PurePath:
+    # Files found while recursing keep their path below the root argument.
+    absolute: str = os.path.abspath(file_path)
+    for root in sorted(roots, key=len, reverse=True):
+        if absolute.startswith(root.rstrip(os.sep) + os.sep):
+            return pathlib.PurePath(os.path.relpath(absolute, root))
+
+    return pathlib.PurePath(file_path.name)
 
 
 class Fernet(Algorithm):
@@ -34,6 +85,217 @@ class Fernet(Algorithm):
                 cls._decrypt_one, payload=payload, key=key, options=options
             )
 
+    @classmethod
+    def sniff(cls, prefix: bytes, options: "types.Options") -> bool:
+        encoded: bool = options.plaintext_encoding not in (None, "plain")
+        if options.mode != "raw" and encoded:
+            return super().sniff(prefix, options)
+
+        if not utils.is_ascii_compatible(options.encoding):
+            return True
+
+        # Tokens are read in their base64url form, even from raw files, and
+        # always start with the version byte. Lines need only one token, so
+        # a header line does not hide the tokens after it.
+        alphabet: bytes = utils.ALPHABETS["base64url"]
+        if options.mode == "line":
+            return any(
+                line.startswith(_VERSION) and utils.in_alphabet(line, alphabet)
+                for line in utils.prefix_lines(prefix)
+            )
+
+        return prefix.lstrip().startswith(_VERSION) and utils.in_alphabet(
+            prefix, alphabet
+        )
+
+    @classmethod
+    def plausible(cls, payload: bytes, options: "types.Options") -> bool:
+        token: bytes = payload.strip()
+        return (
+            len(token) >= _MIN_TOKEN_LENGTH
+            and token.startswith(_VERSION)
+            and utils.in_alphabet(token, utils.ALPHABETS["base64url"])
+        )
+
+    @classmethod
+    def setup(cls, options: "types.Options") -> FernetState:
+        if not isinstance(options.algorithm_options, dict):
+            raise ValueError("Algorithm options expected to be a dict")
+
+        keys: Sequence[str] = options.algorithm_options["key"]
+        keyring: Keyring = (
+            keys if isinstance(keys, Keyring) else Keyring.from_keys(keys)
+        )
+        for key_index in sorted(keyring.invalid):
+            logger.warning("Ignoring invalid Fernet key at position %d", key_index)
+
+        rekeyed: Optional[_Fernet] = None
+        rekey: Optional[str] = options.algorithm_options.get("rekey")
+        if rekey:
+            rekeyed = _Fernet(rekey.encode(options.encoding))
+
+        return FernetState(options, cls.validator(options), keyring, rekeyed)
+
+    @classmethod
+    def _signed_by(cls, state: FernetState, payload: bytes) -> Iterator[int]:
+        try:
+            token: bytes = base64.urlsafe_b64decode(payload)
+        except (binascii.Error, ValueError):
+            return
+
+        if len(token) < _HEADER_LENGTH + _TAG_LENGTH or token[0] != 0x80:
+            return
+
+        # Each key costs one HMAC, compared in constant time; only keys whose
+        # tag matches are handed to `cryptography` to decrypt.
+        signed: bytes = token[:-_TAG_LENGTH]
+        tag: bytes = token[-_TAG_LENGTH:]
+        for key_index, signing_key in state.keyring.signing_keys():
+            verifier = hmac.HMAC(signing_key, hashes.SHA256())
+            verifier.update(signed)
+            try:
+                verifier.verify(tag)
+            except InvalidSignature:
+                continue
+
+            yield key_index
+
+    @classmethod
+    def _candidates(
+        cls, state: FernetState, payload: bytes
+    ) -> Generator[Tuple[int, bytes], None, None]:
+        for key_index in cls._signed_by(state, payload):
+            try:
+                yield key_index, _Fernet(state.keyring[key_index]).decrypt(payload)
+            except InvalidToken:
+                continue
+
+    @classmethod
+    def decrypt_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List["types.DecryptionResult"]:
+        if not isinstance(state, FernetState):
+            raise ValueError("Fernet state expected; use Fernet.setup")
+
+        results: List[types.DecryptionResult] = []
+        for index, payload in enumerate(payloads):
+            match: Optional[Tuple[int, bytes]] = scoring.select(
+                cls._candidates(state, payload), state.validator
+            )
+            if match is not None:
+                results.append(types.DecryptionResult(index, *match))
+
+        return results
+
+    @classmethod
+    def decrypt_file(
+        cls, state: State, file_path: pathlib.Path
+    ) -> Optional[List["types.DecryptionResult"]]:
+        if not isinstance(state, FernetState):
+            raise ValueError("Fernet state expected; use Fernet.setup")
+
+        options = state.options
+        if options.mode != "raw" or not isinstance(options.algorithm_options, dict):
+            return None
+
+        output_directory: Optional[str] = options.algorithm_options.get("output_dir")
+        stream_size: int = options.algorithm_options.get("stream_size", _STREAM_SIZE)
+        size: int = file_path.stat().st_size
+        if output_directory is None or not size or size < stream_size:
+            return None
+
+        stream_keys: List[fernet_stream.StreamKey] = [
+            fernet_stream.StreamKey(
+                key_index, bytes(signing_key), state.keyring.encryption_key(key_index)
+            )
+            for key_index, signing_key in state.keyring.signing_keys()
+        ]
+        output_path: pathlib.Path = pathlib.Path(output_directory) / _mirrored(
+            file_path, options.algorithm_options.get("roots", ())
+        )
+        if output_path.exists():
+            # Also refuses to write over the token itself.
+            logger.warning("Not overwriting %s for %s", output_path, file_path)
+            return []
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                try:
+                    match = fernet_stream.verify(view, stream_keys)
+                    if match is None:
+                        return []
+
+                    fernet_stream.decrypt_to_file(view, *match, output_path)
+                except InvalidToken:
+                    logger.warning("Invalid Fernet token: %s", file_path)
+                    return []
+                except FileExistsError:
+                    logger.warning("Not overwriting %s for %s", output_path, file_path)
+                    return []
+
+        return [types.DecryptionResult(0, match[0].key_index, os.fsencode(output_path))]
+
+    @classmethod
+    def rewrites(cls, options: "types.Options") -> bool:
+        return isinstance(options.algorithm_options, dict) and bool(
+            options.algorithm_options.get("rekey")
+        )
+
+    @classmethod
+    def rewrite_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List[Optional[bytes]]:
+        if not isinstance(state, FernetState):
+            raise ValueError("Fernet state expected; use Fernet.setup")
+
+        if state.rekeyed is None:
+            raise ValueError("No new key to rekey with")
+
+        replacements: List[Optional[bytes]] = []
+        for payload in payloads:
+            try:
+                # Tokens already under the new key are kept, so rekeying
+                # again, such as after an interruption, is a no-op.
+                state.rekeyed.decrypt(payload)
+                replacements.append(None)
+                continue
+            except InvalidToken:
+                pass
+
+            replacement: Optional[bytes] = None
+            for key_index in cls._signed_by(state, payload):
+                try:
+                    # Rotation keeps each token's timestamp.
+                    replacement = MultiFernet(
+                        [state.rekeyed, _Fernet(state.keyring[key_index])]
+                    ).rotate(payload)
+                    break
+                except InvalidToken:
+                    continue
+
+            replacements.append(replacement)
+
+        return replacements
+
+    @classmethod
+    def key_count(cls, options: "types.Options") -> Optional[int]:
+        if not isinstance(options.algorithm_options, dict):
+            return None
+
+        return len(options.algorithm_options["key"]) or None
+
+    @classmethod
+    def restrict_keys(
+        cls, options: "types.Options", start: int, stop: int
+    ) -> "types.Options":
+        if not isinstance(options.algorithm_options, dict):
+            return options
+
+        algorithm_options = dict(options.algorithm_options)
+        algorithm_options["key"] = algorithm_options["key"][start:stop]
+        return options._replace(algorithm_options=algorithm_options)
+
     @classmethod
     def register_args(
         cls, algorithm_name: str, parser: argparse.ArgumentParser
@@ -46,26 +308,79 @@ class Fernet(Algorithm):
             default=[],
             help="A 32-byte key encoded as Base64URL",
         )
+        group.add_argument(
+            f"--{algorithm_name}.key-file",
+            dest=f"{algorithm_name}.key_file",
+            metavar="PATH",
+            help="A file of keys, one per line, tried after any given with "
+            f"--{algorithm_name}.key. Use - to read keys from standard input",
+        )
+        group.add_argument(
+            f"--{algorithm_name}.rekey",
+            dest=f"{algorithm_name}.rekey",
+            metavar="KEY",
+            help="Re-encrypt tokens in place under this key instead of printing "
+            "their plaintext",
+        )
+        group.add_argument(
+            f"--{algorithm_name}.output-dir",
+            dest=f"{algorithm_name}.output_dir",
+            metavar="DIR",
+            help="Stream large raw tokens, decrypting them to files in this "
+            "directory, at their paths below the arguments they were found in, "
+            "instead of printing their plaintext. Existing files are kept",
+        )
+        group.add_argument(
+            f"--{algorithm_name}.stream-size",
+            dest=f"{algorithm_name}.stream_size",
+            metavar="BYTES",
+            type=int,
+            default=_STREAM_SIZE,
+            help=f"Minimum size of raw tokens to stream with --{algorithm_name}.output-dir",
+        )
 
     @classmethod
     def extract_args(
         cls, algorithm_name: str, args: argparse.Namespace
     ) -> Optional[Dict]:
-        key: Optional[List[str]] = getattr(args, f"{algorithm_name}.key", None)
-        if not key:
-            raise ValueError(
-                "A Fernet key is required and must be 32 url-safe base64-encoded bytes."
-            )
+        key: Sequence[str] = [
+            k for k in getattr(args, f"{algorithm_name}.key", None) or () if k
+        ]
+        key_file: Optional[str] = getattr(args, f"{algorithm_name}.key_file", None)
+        if key_file is not None:
+            if key_file == "-" and getattr(args, "distributed", False):
+                # Each worker would read its own standard input.
+                raise ValueError(
+                    "Fernet keys cannot be read from standard input when "
+                    "distributed; use a file every worker can read."
+                )
+
+            try:
+                key = Keyring.from_file(key_file, key)
+            except OSError as e:
+                raise ValueError(f"Unable to read Fernet keys: {e}") from None
 
-        key = [k for k in key if k]
         if not key:
             raise ValueError(
                 "A Fernet key is required and must be 32 url-safe base64-encoded bytes."
             )
 
+        rekey: Optional[str] = getattr(args, f"{algorithm_name}.rekey", None)
+        if rekey is not None:
+            try:
+                _Fernet(rekey.encode(args.encoding))
+            except ValueError:
+                raise ValueError(
+                    "The new Fernet key must be 32 url-safe base64-encoded bytes."
+                ) from None
+
         return {
             "key": key,
+            "rekey": rekey,
+            "output_dir": getattr(args, f"{algorithm_name}.output_dir", None),
+            "roots": [os.path.abspath(file) for file in getattr(args, "files", ())],
+            "stream_size": getattr(args, f"{algorithm_name}.stream_size", _STREAM_SIZE),
         }
 
 
-__all__: Tuple[str, ...] = ("Fernet",)
+__all__: Tuple[str, ...] = ("Fernet", "FernetState")
@@ -0,0 +1,236 @@
+"""
+Holds Fernet keys packed into a single buffer of raw key bytes.
+
+A million keys take 32 MB, rather than a Python string and `Fernet` instance
+apiece, and are cheap to pickle for worker processes. Keys are decoded in
+bulk: a batch of keys is joined and decoded with one call.
+"""
+
+import base64
+import binascii
+import logging
+import sys
+from typing import (
+    IO,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+KEY_SIZE: int = 32
+_ENCODED_SIZE: int = 44
+_SIGNING_SIZE: int = 16
+_LOAD_BATCH: int = 65536
+_EMPTY_KEY: bytes = bytes(KEY_SIZE)
+
+
+def _decode_one(key: str) -> Optional[bytes]:
+    try:
+        raw: bytes = base64.urlsafe_b64decode(key)
+    except (binascii.Error, ValueError):
+        return None
+
+    return raw if len(raw) == KEY_SIZE else None
+
+
+def _decode(keys: Sequence[str]) -> List[Optional[bytes]]:
+    if keys and all(len(k) == _ENCODED_SIZE and k[-1] == "=" for k in keys):
+        # Padding cannot appear mid-input, so it is swapped for zero bits
+        # and the surplus byte of each key is sliced off.
+        try:
+            joined: bytes = base64.b64decode(
+                "".join(k[:-1] + "A" for k in keys), altchars=b"-_", validate=True
+            )
+        except binascii.Error:
+            pass
+        else:
+            stride: int = KEY_SIZE + 1
+            return [joined[i : i + KEY_SIZE] for i in range(0, len(joined), stride)]
+
+    return [_decode_one(k) for k in keys]
+
+
+class Keyring(Sequence[str]):
+    """Fernet keys, indexed by position and stored as raw bytes."""
+
+    __slots__ = ("raw", "invalid")
+
+    def __init__(self, raw: bytes = b"", invalid: Iterable[int] = ()) -> None:
+        """
+        Wraps packed keys.
+
+        :param raw: Concatenated 32-byte keys.
+        :param invalid: Positions holding placeholders for keys that were
+            invalid, which are never tried.
+        """
+
+        self.raw: bytes = raw
+        self.invalid: FrozenSet[int] = frozenset(invalid)
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str]) -> "Keyring":
+        """
+        Packs keys, keeping the positions of invalid keys so that the indices
+        of the others are unchanged.
+
+        :param keys: Keys encoded as Base64URL.
+        :return: Keyring of the keys.
+        """
+
+        packed: bytearray = bytearray()
+        invalid: List[int] = []
+        batch: List[str] = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= _LOAD_BATCH:
+                cls._extend(packed, invalid, batch)
+                batch = []
+
+        cls._extend(packed, invalid, batch)
+        return cls(bytes(packed), invalid)
+
+    @classmethod
+    def from_file(cls, path: str, keys: Iterable[str] = ()) -> "Keyring":
+        """
+        Streams keys from a file holding one key per line.
+
+        Blank lines are ignored. Invalid keys keep their positions, as in
+        `from_keys`, so key indices match the order keys were given in.
+
+        :param path: File to read, or "-" for standard input.
+        :param keys: Keys to place before those in the file.
+        :return: Keyring of the keys.
+        """
+
+        if path == "-":
+            return cls._read(sys.stdin, "standard input", keys)
+
+        with open(path, "r", encoding="ascii", errors="replace") as file:
+            return cls._read(file, path, keys)
+
+    @classmethod
+    def _read(cls, file: IO[str], name: str, keys: Iterable[str]) -> "Keyring":
+        packed: bytearray = bytearray()
+        invalid: List[int] = []
+        batch: List[str] = list(keys)
+        for line in file:
+            key: str = line.strip()
+            if not key:
+                continue
+
+            batch.append(key)
+            if len(batch) >= _LOAD_BATCH:
+                cls._extend(packed, invalid, batch)
+                batch = []
+
+        cls._extend(packed, invalid, batch)
+        if invalid:
+            logger.warning(
+                "Ignoring %d invalid Fernet keys from %s", len(invalid), name
+            )
+
+        return cls(bytes(packed), invalid)
+
+    @staticmethod
+    def _extend(packed: bytearray, invalid: List[int], batch: Sequence[str]) -> None:
+        for raw in _decode(batch):
+            if raw is None:
+                invalid.append(len(packed) // KEY_SIZE)
+                raw = _EMPTY_KEY
+
+            packed += raw
+
+    def __len__(self) -> int:
+        return len(self.raw) // KEY_SIZE
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "Keyring": ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "Keyring"]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("Keyrings can only be sliced contiguously")
+
+            return Keyring(
+                self.raw[start * KEY_SIZE : max(start, stop) * KEY_SIZE],
+                (i - start for i in self.invalid if start <= i < stop),
+            )
+
+        raw: bytes = self.key(index)
+        if index % len(self) in self.invalid:
+            # Placeholders are never valid keys, rather than all-zero ones.
+            return ""
+
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Keyring):
+            return self.raw == other.raw and self.invalid == other.invalid
+
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.raw, self.invalid))
+
+    def __repr__(self) -> str:
+        # Keys are secret, so only their number is shown.
+        return f"Keyring({len(self)} keys)"
+
+    def key(self, index: int) -> bytes:
+        """
+        Provides a raw key.
+
+        :param index: Position of the key.
+        :return: The 32 raw bytes of the key.
+        """
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("Keyring index out of range")
+
+        return self.raw[index * KEY_SIZE : (index + 1) * KEY_SIZE]
+
+    def encryption_key(self, index: int) -> bytes:
+        """
+        Provides the half of a key used for encryption.
+
+        :param index: Position of the key.
+        :return: The 16-byte AES key.
+        """
+
+        return self.key(index)[_SIGNING_SIZE:]
+
+    def signing_keys(self) -> Iterator[Tuple[int, memoryview]]:
+        """
+        Iterates over the halves of valid keys used for signing, without
+        copying them.
+
+        :return: Iterator of key indices and 16-byte HMAC keys.
+        """
+
+        raw: memoryview = memoryview(self.raw)
+        for index in range(len(self)):
+            if index not in self.invalid:
+                offset: int = index * KEY_SIZE
+                yield index, raw[offset : offset + _SIGNING_SIZE]
+
+
+__all__: Tuple[str, ...] = ("KEY_SIZE", "Keyring")
@@ -0,0 +1,191 @@
+"""
+Streams verification and decryption of Fernet tokens too large to hold in memory.
+
+Tokens are memory-mapped and decoded in blocks. The HMACs of every candidate
+key are computed in a single pass over the token, and only a verified token is
+decrypted, straight to a file, in a second pass.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import mmap
+import os
+import pathlib
+import string
+import tempfile
+from typing import IO, Generator, NamedTuple, Optional, Sequence, Tuple, Union
+
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+#: Encoded characters decoded at a time, a multiple of 4 so that blocks
+#: decode independently.
+_TEXT_BLOCK: int = 1 << 20
+
+_ENCODED_VERSION: bytes = b"gA"
+_HEADER_LENGTH: int = 25
+_IV_OFFSET: int = 9
+_TAG_LENGTH: int = 32
+_WHITESPACE: bytes = string.whitespace.encode("ascii")
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+class StreamKey(NamedTuple):
+    """Fernet key material, split into its signing and encryption halves."""
+
+    key_index: int
+    signing_key: bytes
+    encryption_key: bytes
+
+    @classmethod
+    def from_key(cls, key_index: int, key: bytes) -> "StreamKey":
+        """
+        Splits an encoded Fernet key.
+
+        :param key_index: Index of the key among those tried.
+        :param key: A 32-byte key encoded as Base64URL.
+        :return: The key's halves.
+        """
+
+        raw: bytes = base64.urlsafe_b64decode(key)
+        return cls(key_index, raw[:16], raw[16:])
+
+
+def _token_length(view: Buffer) -> Tuple[int, int]:
+    length: int = len(view)
+    while length and view[length - 1] in _WHITESPACE:
+        length -= 1
+
+    if not length or length % 4:
+        raise InvalidToken
+
+    padding_length: int = 0
+    while padding_length < 2 and view[length - 1 - padding_length] == ord("="):
+        padding_length += 1
+
+    return length, length // 4 * 3 - padding_length
+
+
+def _segments(
+    view: Buffer, length: int, body_length: int
+) -> Generator[Tuple[bytes, bytes], None, None]:
+    offset: int = 0
+    for start in range(0, length, _TEXT_BLOCK):
+        try:
+            block: bytes = base64.b64decode(
+                view[start : min(start + _TEXT_BLOCK, length)],
+                altchars=b"-_",
+                validate=True,
+            )
+        except binascii.Error:
+            raise InvalidToken from None
+
+        split: int = max(0, min(len(block), body_length - offset))
+        yield block[:split], block[split:]
+        offset += len(block)
+
+
+def verify(
+    view: Buffer, keys: Sequence[StreamKey]
+) -> Optional[Tuple[StreamKey, bytes]]:
+    """
+    Finds the key that signed a token, reading the token once.
+
+    :param view: Memory-mapped token, encoded as Base64URL.
+    :param keys: Keys to try.
+    :return: The matching key and the token's IV, or None if no key matches.
+    :raises InvalidToken: If the data is not a Fernet token.
+    """
+
+    length, decoded_length = _token_length(view)
+    body_length: int = decoded_length - _TAG_LENGTH
+    ciphertext_length: int = body_length - _HEADER_LENGTH
+    if ciphertext_length <= 0 or ciphertext_length % 16:
+        raise InvalidToken
+
+    if view[: len(_ENCODED_VERSION)] != _ENCODED_VERSION:
+        raise InvalidToken
+
+    macs = [hmac.new(key.signing_key, digestmod=hashlib.sha256) for key in keys]
+    header: bytes = b""
+    tag: bytes = b""
+    for body, tail in _segments(view, length, body_length):
+        if len(header) < _HEADER_LENGTH:
+            header += body[: _HEADER_LENGTH - len(header)]
+
+        for mac in macs:
+            mac.update(body)
+
+        tag += tail
+
+    for key, mac in zip(keys, macs):
+        if hmac.compare_digest(mac.digest(), tag):
+            return key, header[_IV_OFFSET:_HEADER_LENGTH]
+
+    return None
+
+
+def decrypt(view: Buffer, key: StreamKey, iv: bytes, output: IO[bytes]) -> None:
+    """
+    Decrypts a verified token, writing its plaintext as it is decrypted.
+
+    :param view: Memory-mapped token, encoded as Base64URL.
+    :param key: Key that verified the token.
+    :param iv: The token's IV.
+    :param output: Destination for the plaintext.
+    :return: None.
+    :raises InvalidToken: If the plaintext is incorrectly padded.
+    :raises FileExistsError: If the output file already exists.
+    """
+
+    length, decoded_length = _token_length(view)
+    decryptor = Cipher(algorithms.AES(key.encryption_key), modes.CBC(iv)).decryptor()
+    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+
+    skip: int = _HEADER_LENGTH
+    for body, _tail in _segments(view, length, decoded_length - _TAG_LENGTH):
+        if skip:
+            body, skip = body[skip:], max(0, skip - len(body))
+
+        output.write(unpadder.update(decryptor.update(body)))
+
+    try:
+        output.write(unpadder.update(decryptor.finalize()) + unpadder.finalize())
+    except ValueError:
+        raise InvalidToken from None
+
+
+def decrypt_to_file(
+    view: Buffer, key: StreamKey, iv: bytes, output_path: pathlib.Path
+) -> None:
+    """
+    Decrypts a verified token to a file, creating it only once complete.
+
+    :param view: Memory-mapped token, encoded as Base64URL.
+    :param key: Key that verified the token.
+    :param iv: The token's IV.
+    :param output_path: File to write the plaintext to.
+    :return: None.
+    :raises InvalidToken: If the plaintext is incorrectly padded.
+    :raises FileExistsError: If the output file already exists.
+    """
+
+    handle, temporary = tempfile.mkstemp(
+        prefix=f".{output_path.name}.", suffix=".tmp", dir=output_path.parent
+    )
+    try:
+        with os.fdopen(handle, "wb") as output:
+            decrypt(view, key, iv, output)
+
+        # Linking, unlike renaming, never replaces an existing file.
+        os.link(temporary, output_path)
+    finally:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+
+
+__all__: Tuple[str, ...] = ("StreamKey", "decrypt", "decrypt_to_file", "verify")
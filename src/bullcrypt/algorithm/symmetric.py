@@ -0,0 +1,370 @@
+"""
+Shared handling for raw symmetric ciphertexts with the IV or nonce embedded.
+
+Payloads are laid out as a nonce, a ciphertext, and, for authenticated
+ciphers, a tag. Their offsets are configurable; negative offsets count from
+the end of the payload. Bytes outside the three, such as a header before the
+nonce, are ignored. Each key is prepared once per worker as a reusable
+cipher context, and each key is tried against every unmatched payload of a
+batch before the next key.
+"""
+
+import argparse
+import base64
+import binascii
+import string
+from abc import abstractmethod
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from .. import scoring, types
+from ..algorithm import Algorithm, State
+
+#: A prepared key, such as a cipher object, reused across payloads.
+C = TypeVar("C")
+
+_HEX_DIGITS: FrozenSet[str] = frozenset(string.hexdigits)
+_URLSAFE: Dict[int, int] = str.maketrans("-_", "+/")
+
+
+def parse_key(text: str, sizes: Sequence[int]) -> Optional[bytes]:
+    """
+    Decodes a key given as hex or as standard or URL-safe base64.
+
+    Hex is preferred where a key is valid as both.
+
+    :param text: Encoded key.
+    :param sizes: Valid key sizes in bytes.
+    :return: The raw key, or None if it is not a valid key.
+    """
+
+    text = text.strip()
+    if len(text) % 2 == 0 and len(text) // 2 in sizes and _HEX_DIGITS.issuperset(text):
+        return bytes.fromhex(text)
+
+    try:
+        key: bytes = base64.b64decode(
+            text.translate(_URLSAFE) + "=" * (-len(text) % 4), validate=True
+        )
+    except (binascii.Error, ValueError):
+        return None
+
+    return key if len(key) in sizes else None
+
+
+class Layout(NamedTuple):
+    """Where the nonce, tag, and ciphertext sit within a payload."""
+
+    nonce_offset: int
+    nonce_size: int
+    tag_offset: int = 0
+    tag_size: int = 0
+    #: Start of the ciphertext, or None for the bytes following the nonce.
+    ciphertext_offset: Optional[int] = None
+
+    def split(self, payload: bytes) -> Optional[Tuple[bytes, bytes, bytes]]:
+        """
+        Divides a payload into its parts.
+
+        The ciphertext runs from its offset to the nonce, the tag, or the end
+        of the payload, whichever comes first. Without an offset, it is the
+        first bytes after the nonce that are not the tag, or, when nothing
+        follows the nonce but the tag, the last such bytes before it.
+
+        :param payload: Payload to divide.
+        :return: The nonce, ciphertext, and tag, or None if the payload is
+            too short to hold them.
+        """
+
+        length: int = len(payload)
+        regions: List[Tuple[int, int]] = []
+        for offset, size in (
+            (self.nonce_offset, self.nonce_size),
+            (self.tag_offset, self.tag_size),
+        ):
+            start: int = offset + length if offset < 0 else offset
+            if start < 0 or start + size > length:
+                return None
+
+            regions.append((start, start + size))
+
+        (nonce_start, nonce_stop), (tag_start, tag_stop) = regions
+        if tag_start < nonce_stop and nonce_start < tag_stop:
+            # Overlapping, so the payload is too short for both.
+            return None
+
+        # The spans of bytes around the nonce and tag.
+        gaps: List[Tuple[int, int]] = []
+        position: int = 0
+        for start, stop in sorted(
+            region for region in regions if region[1] > region[0]
+        ):
+            gaps.append((position, start))
+            position = stop
+
+        gaps.append((position, length))
+        ciphertext: Optional[Tuple[int, int]]
+        if self.ciphertext_offset is not None:
+            first: int = self.ciphertext_offset
+            first += length if first < 0 else 0
+            ciphertext = next(
+                ((first, stop) for start, stop in gaps if start <= first <= stop),
+                None,
+            )
+            if ciphertext is None:
+                # Inside the nonce or tag, or beyond the payload.
+                return None
+        else:
+            filled: List[Tuple[int, int]] = [gap for gap in gaps if gap[1] > gap[0]]
+            after: List[Tuple[int, int]] = [g for g in filled if g[0] >= nonce_stop]
+            before: List[Tuple[int, int]] = [g for g in filled if g[1] <= nonce_start]
+            if after:
+                ciphertext = after[0]
+            elif before:
+                ciphertext = before[-1]
+            else:
+                ciphertext = (nonce_stop, nonce_stop)
+
+        return (
+            payload[nonce_start:nonce_stop],
+            payload[ciphertext[0] : ciphertext[1]],
+            payload[tag_start:tag_stop],
+        )
+
+
+class SymmetricState(State, Generic[C]):
+    """Worker state holding a prepared context for each key."""
+
+    __slots__ = ("handler", "layout", "contexts")
+
+    def __init__(
+        self,
+        options: "types.Options",
+        validator: Optional[scoring.Validator],
+        handler: Type["Symmetric"],
+        layout: Layout,
+        contexts: Sequence[C],
+    ) -> None:
+        super().__init__(options, validator)
+        self.handler: Type["Symmetric"] = handler
+        self.layout: Layout = layout
+        self.contexts: Sequence[C] = contexts
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Cipher contexts cannot be pickled, so they are prepared anew.
+        return self.handler.setup, (self.options,)
+
+
+class Symmetric(Algorithm, Generic[C]):
+    """Base for plugins decrypting raw symmetric ciphertexts."""
+
+    #: Name shown in help and errors.
+    cipher_name: str = ""
+    #: Valid key sizes in bytes.
+    key_sizes: Tuple[int, ...] = ()
+    #: Size of the IV or nonce in bytes.
+    nonce_size: int = 0
+    #: Size of the authentication tag in bytes, or 0 when unauthenticated.
+    tag_size: int = 0
+
+    @classmethod
+    @abstractmethod
+    def prepare(cls, key: bytes) -> C:
+        """
+        Prepares a key for reuse across payloads.
+
+        :param key: Raw key.
+        :return: A context, such as a cipher object, for `decrypt_with`.
+        """
+
+    @classmethod
+    @abstractmethod
+    def decrypt_with(
+        cls, context: C, nonce: bytes, ciphertext: bytes, tag: bytes
+    ) -> Optional[bytes]:
+        """
+        Decrypts a payload's parts with a prepared key.
+
+        :param context: Prepared key from `prepare`.
+        :param nonce: IV or nonce.
+        :param ciphertext: Ciphertext.
+        :param tag: Authentication tag, if any.
+        :return: The plaintext, or None if the key is certainly wrong.
+        """
+
+    @classmethod
+    def layout(cls, options: "types.Options") -> Layout:
+        """
+        Provides where the nonce and tag sit within payloads.
+
+        :param options: Decryption options.
+        :return: The payload layout.
+        """
+
+        if not isinstance(options.algorithm_options, dict):
+            raise ValueError("Algorithm options expected to be a dict")
+
+        return Layout(
+            options.algorithm_options["nonce_offset"],
+            cls.nonce_size,
+            options.algorithm_options.get("tag_offset", 0),
+            cls.tag_size,
+            options.algorithm_options.get("ciphertext_offset"),
+        )
+
+    @classmethod
+    def setup(cls, options: "types.Options") -> SymmetricState:
+        layout: Layout = cls.layout(options)
+        keys: Sequence[bytes] = options.algorithm_options["key"]  # type: ignore[index]
+        contexts: List[C] = [cls.prepare(key) for key in keys]
+        return SymmetricState(options, cls.validator(options), cls, layout, contexts)
+
+    @classmethod
+    def plausible(cls, payload: bytes, options: "types.Options") -> bool:
+        return cls.layout(options).split(payload) is not None
+
+    @classmethod
+    def decrypt_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List["types.DecryptionResult"]:
+        if not isinstance(state, SymmetricState):
+            raise ValueError(
+                f"{cls.cipher_name} state expected; use {cls.__name__}.setup"
+            )
+
+        parts: Dict[int, Tuple[bytes, bytes, bytes]] = {}
+        for index, payload in enumerate(payloads):
+            split: Optional[Tuple[bytes, bytes, bytes]] = state.layout.split(payload)
+            if split is not None:
+                parts[index] = split
+
+        # Each key is tried against every still-unmatched payload at once.
+        matches: Dict[int, types.DecryptionResult] = {}
+        pending: List[int] = list(parts)
+        for key_index, context in enumerate(state.contexts):
+            if not pending:
+                break
+
+            decrypted: List[Tuple[int, bytes]] = []
+            for index in pending:
+                plaintext: Optional[bytes] = cls.decrypt_with(context, *parts[index])
+                if plaintext is not None:
+                    decrypted.append((index, plaintext))
+
+            valid: List[bool] = (
+                state.validator.check([plaintext for _index, plaintext in decrypted])
+                if state.validator is not None
+                else [True] * len(decrypted)
+            )
+            for (index, plaintext), passed in zip(decrypted, valid):
+                if passed:
+                    matches[index] = types.DecryptionResult(index, key_index, plaintext)
+
+            pending = [index for index in pending if index not in matches]
+
+        return [matches[index] for index in sorted(matches)]
+
+    @classmethod
+    def key_count(cls, options: "types.Options") -> Optional[int]:
+        if not isinstance(options.algorithm_options, dict):
+            return None
+
+        return len(options.algorithm_options["key"]) or None
+
+    @classmethod
+    def restrict_keys(
+        cls, options: "types.Options", start: int, stop: int
+    ) -> "types.Options":
+        if not isinstance(options.algorithm_options, dict):
+            return options
+
+        algorithm_options = dict(options.algorithm_options)
+        algorithm_options["key"] = algorithm_options["key"][start:stop]
+        return options._replace(algorithm_options=algorithm_options)
+
+    @classmethod
+    def register_args(
+        cls, algorithm_name: str, parser: argparse.ArgumentParser
+    ) -> None:
+        group = parser.add_argument_group(f"{cls.cipher_name} ({algorithm_name})")
+        sizes: str = "/".join(str(size * 8) for size in cls.key_sizes)
+        group.add_argument(
+            f"--{algorithm_name}.key",
+            dest=f"{algorithm_name}.key",
+            action="append",
+            default=[],
+            help=f"A {sizes}-bit key, encoded as hex or base64.",
+        )
+        group.add_argument(
+            f"--{algorithm_name}.nonce-offset",
+            dest=f"{algorithm_name}.nonce_offset",
+            type=int,
+            default=0,
+            help=f"Offset of the {cls.nonce_size}-byte IV or nonce. "
+            "Negative offsets count from the end.",
+        )
+        if cls.tag_size:
+            group.add_argument(
+                f"--{algorithm_name}.tag-offset",
+                dest=f"{algorithm_name}.tag_offset",
+                type=int,
+                default=-cls.tag_size,
+                help=f"Offset of the {cls.tag_size}-byte tag. Defaults to the end.",
+            )
+
+        group.add_argument(
+            f"--{algorithm_name}.ciphertext-offset",
+            dest=f"{algorithm_name}.ciphertext_offset",
+            type=int,
+            default=None,
+            help="Offset of the ciphertext, which runs up to the IV or nonce, "
+            "the tag, or the end. Defaults to the bytes following the IV or "
+            "nonce, so any header before it is skipped.",
+        )
+
+    @classmethod
+    def extract_args(
+        cls, algorithm_name: str, args: argparse.Namespace
+    ) -> Optional[Dict[str, Any]]:
+        keys: List[bytes] = []
+        for text in getattr(args, f"{algorithm_name}.key", None) or ():
+            key: Optional[bytes] = parse_key(text, cls.key_sizes)
+            if key is None:
+                sizes: str = ", ".join(str(size) for size in cls.key_sizes)
+                raise ValueError(
+                    f"{cls.cipher_name} keys must be {sizes} bytes, "
+                    "encoded as hex or base64."
+                )
+
+            keys.append(key)
+
+        if not keys:
+            raise ValueError(f"At least one {cls.cipher_name} key is required.")
+
+        algorithm_options: Dict[str, Any] = {
+            "key": keys,
+            "nonce_offset": getattr(args, f"{algorithm_name}.nonce_offset", 0),
+            "ciphertext_offset": getattr(
+                args, f"{algorithm_name}.ciphertext_offset", None
+            ),
+        }
+        if cls.tag_size:
+            algorithm_options["tag_offset"] = getattr(
+                args, f"{algorithm_name}.tag_offset", -cls.tag_size
+            )
+
+        return algorithm_options
+
+
+__all__: Tuple[str, ...] = ("Layout", "Symmetric", "SymmetricState", "parse_key")
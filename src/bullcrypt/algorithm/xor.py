@@ -0,0 +1,353 @@
+"""
+Recovers and applies single-byte and repeating-key XOR using NumPy.
+"""
+
+import argparse
+import functools
+from typing import (
+    Optional,
+    Dict,
+    Tuple,
+    List,
+    Sequence,
+    Any,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+from .. import scoring, types
+from ..algorithm import Algorithm, State
+
+_SAMPLE_SIZE: int = 1 << 13
+_DIVISOR_TOLERANCE: float = 0.95
+_MIN_BLOCKS: int = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _tables() -> Tuple["np.ndarray", "np.ndarray"]:
+    popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+        axis=1, dtype=np.float32
+    )
+    scores = np.array(scoring.ENGLISH_SCORES, dtype=np.float32)
+
+    # Shared by every thread, so guard against accidental writes.
+    popcount.flags.writeable = False
+    scores.flags.writeable = False
+    return popcount, scores
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ValueError(
+            "The XOR algorithm requires NumPy: pip install 'bullcrypt[xor]'"
+        )
+
+
+class Xor(Algorithm):
+    """Plugin for recovering and decrypting repeating-key XOR ciphertext."""
+
+    @classmethod
+    def estimate_key_lengths(
+        cls, payload: bytes, max_key_length: int = 40, candidates: int = 3
+    ) -> List[int]:
+        """
+        Estimates likely key lengths by normalized Hamming distance.
+
+        Consecutive key-sized blocks of the ciphertext are compared all at
+        once; the correct key length tends to produce the smallest mean
+        number of differing bits per byte.
+
+        :param payload: Ciphertext bytes.
+        :param max_key_length: Largest key length to consider.
+        :param candidates: Number of key lengths to return.
+        :return: Key lengths, most likely first.
+        """
+
+        popcount, _scores = _tables()
+        data = np.frombuffer(payload, dtype=np.uint8)[:_SAMPLE_SIZE]
+
+        distances: List[Tuple[float, int]] = []
+        # Require a few blocks per length so the estimate is not mostly noise.
+        limit: int = min(max_key_length, max(len(data) // _MIN_BLOCKS, 1))
+        for key_length in range(1, limit + 1):
+            rows: int = len(data) // key_length
+            if rows < 2:
+                break
+
+            blocks = data[: rows * key_length].reshape(rows, key_length)
+            distance: float = float(popcount[blocks[:-1] ^ blocks[1:]].mean())
+            distances.append((distance, key_length))
+
+        distances.sort()
+        return [key_length for _distance, key_length in distances[:candidates]] or [1]
+
+    @classmethod
+    def recover_key(cls, payload: bytes, key_length: int) -> Tuple[bytes, float]:
+        """
+        Recovers the most likely key of a given length.
+
+        Each key column is scored against all 256 candidate bytes in a single
+        array operation using an English character frequency table.
+
+        :param payload: Ciphertext bytes.
+        :param key_length: Length of the key to recover.
+        :return: The recovered key and its mean per-byte score.
+        """
+
+        _popcount, scores = _tables()
+        data = np.frombuffer(payload, dtype=np.uint8)[:_SAMPLE_SIZE]
+
+        rows: int = max(len(data) // key_length, 1)
+        blocks = np.resize(data, rows * key_length).reshape(rows, key_length)
+        candidates = np.arange(256, dtype=np.uint8)[:, None, None]
+
+        # Shape (256, key_length): total score of every candidate per column.
+        totals = scores[candidates ^ blocks[None, :, :]].sum(axis=1)
+        key = totals.argmax(axis=0)
+
+        score: float = float(totals[key, np.arange(key_length)].sum())
+        return key.astype(np.uint8).tobytes(), score / blocks.size
+
+    @classmethod
+    def _minimal_period(cls, key: bytes) -> bytes:
+        for period in range(1, len(key)):
+            if len(key) % period == 0 and key[:period] * (len(key) // period) == key:
+                return key[:period]
+
+        return key
+
+    @classmethod
+    def crack(
+        cls, payload: bytes, max_key_length: int = 40, candidates: int = 3
+    ) -> List[Tuple[bytes, float]]:
+        """
+        Recovers candidate keys for a ciphertext.
+
+        :param payload: Ciphertext bytes.
+        :param max_key_length: Largest key length to consider.
+        :param candidates: Number of key lengths to evaluate.
+        :return: Unique keys and their scores, best first.
+        """
+
+        if not payload:
+            return []
+
+        results: Dict[bytes, float] = {}
+        for key_length in cls.estimate_key_lengths(payload, max_key_length, candidates):
+            key, score = cls.recover_key(payload, key_length)
+
+            # Multiples of the true key length over-fit slightly; prefer the
+            # shortest divisor that explains the ciphertext nearly as well.
+            for divisor in range(1, key_length):
+                if key_length % divisor == 0:
+                    short_key, short_score = cls.recover_key(payload, divisor)
+                    if short_score >= score * _DIVISOR_TOLERANCE:
+                        key, score = short_key, short_score
+                        break
+
+            key = cls._minimal_period(key)
+            results[key] = max(score, results.get(key, score))
+
+        return sorted(results.items(), key=lambda item: (-item[1], len(item[0])))
+
+    @classmethod
+    def decrypt_one(cls, payload: bytes, key: bytes) -> bytes:
+        """
+        Applies a repeating key to a payload.
+
+        :param payload: Ciphertext bytes.
+        :param key: Repeating XOR key.
+        :return: Plaintext bytes.
+        """
+
+        data = np.frombuffer(payload, dtype=np.uint8)
+        stream = np.resize(np.frombuffer(key, dtype=np.uint8), len(data))
+        return (data ^ stream).tobytes()
+
+    @classmethod
+    def decrypt_many(cls, payloads: Sequence[bytes], key: bytes) -> List[bytes]:
+        """
+        Applies a repeating key to many payloads in one array operation.
+
+        Payloads are concatenated, and the key stream restarts at the
+        beginning of every payload.
+
+        :param payloads: Ciphertexts to decrypt.
+        :param key: Repeating XOR key.
+        :return: Plaintexts in the same order as `payloads`.
+        """
+
+        if not payloads:
+            return []
+
+        lengths = np.fromiter((len(p) for p in payloads), dtype=np.int64)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+
+        data = np.frombuffer(b"".join(payloads), dtype=np.uint8)
+        positions = np.arange(len(data), dtype=np.int64) - np.repeat(starts, lengths)
+        stream = np.frombuffer(key, dtype=np.uint8)[positions % len(key)]
+
+        plaintext: bytes = (data ^ stream).tobytes()
+        return [plaintext[start:end] for start, end in zip(starts, ends)]
+
+    @classmethod
+    def _crack_batch(
+        cls,
+        state: State,
+        payloads: Sequence[bytes],
+        algorithm_options: Dict[str, Any],
+    ) -> List["types.DecryptionResult"]:
+        results: List[types.DecryptionResult] = []
+        for index, payload in enumerate(payloads):
+            keys = cls.crack(
+                payload,
+                algorithm_options["max_key_length"],
+                algorithm_options["candidates"],
+            )
+            match: Optional[Tuple[int, bytes]] = scoring.select(
+                (
+                    (key_index, cls.decrypt_one(payload, key))
+                    for key_index, (key, _score) in enumerate(keys)
+                ),
+                state.validator,
+            )
+            if match is not None:
+                results.append(types.DecryptionResult(index, *match))
+
+        return results
+
+    @classmethod
+    def decrypt_batch(
+        cls, state: State, payloads: Sequence[bytes]
+    ) -> List["types.DecryptionResult"]:
+        _require_numpy()
+        if not isinstance(state.options.algorithm_options, dict):
+            raise ValueError("Algorithm options expected to be a dict")
+
+        keys: Sequence[bytes] = state.options.algorithm_options["key"]
+        if not keys:
+            return cls._crack_batch(state, payloads, state.options.algorithm_options)
+
+        # Try each key against every still-unmatched payload at once.
+        matches: Dict[int, types.DecryptionResult] = {}
+        pending: List[int] = list(range(len(payloads)))
+        for key_index, key in enumerate(keys):
+            if not pending:
+                break
+
+            plaintexts = cls.decrypt_many([payloads[i] for i in pending], key)
+            valid: List[bool] = (
+                state.validator.check(plaintexts)
+                if state.validator is not None
+                else [True] * len(plaintexts)
+            )
+
+            remaining: List[int] = []
+            for index, plaintext, passed in zip(pending, plaintexts, valid):
+                if passed:
+                    matches[index] = types.DecryptionResult(index, key_index, plaintext)
+                else:
+                    remaining.append(index)
+
+            pending = remaining
+
+        return [matches[index] for index in sorted(matches)]
+
+    @classmethod
+    def validator(cls, options: "types.Options") -> Optional[scoring.Validator]:
+        if (
+            options.validators
+            or not isinstance(options.algorithm_options, dict)
+            or options.algorithm_options.get("key")
+        ):
+            return super().validator(options)
+
+        # Recovered keys are only the likeliest, so their plaintexts must at
+        # least read as text; given keys are trusted as is.
+        return scoring.Pipeline((scoring.PrintableValidator(),))
+
+    @classmethod
+    def recovers_keys(cls, options: "types.Options") -> bool:
+        return isinstance(options.algorithm_options, dict) and not (
+            options.algorithm_options.get("key")
+        )
+
+    @classmethod
+    def cost(cls, options: "types.Options") -> float:
+        if not isinstance(options.algorithm_options, dict):
+            return super().cost(options)
+
+        if options.algorithm_options["key"]:
+            return float(len(options.algorithm_options["key"]))
+
+        # Recovery scores every key length, then decrypts each candidate.
+        return float(
+            options.algorithm_options["max_key_length"]
+            * options.algorithm_options["candidates"]
+        )
+
+    @classmethod
+    def plausible(cls, payload: bytes, options: "types.Options") -> bool:
+        return bool(payload)
+
+    @classmethod
+    def register_args(
+        cls, algorithm_name: str, parser: argparse.ArgumentParser
+    ) -> None:
+        group = parser.add_argument_group(f"XOR ({algorithm_name})")
+        group.add_argument(
+            f"--{algorithm_name}.key",
+            dest=f"{algorithm_name}.key",
+            action="append",
+            default=[],
+            help="A hex-encoded key. When omitted, keys are recovered "
+            "from each ciphertext.",
+        )
+        group.add_argument(
+            f"--{algorithm_name}.max-key-length",
+            dest=f"{algorithm_name}.max_key_length",
+            type=int,
+            default=40,
+            help="Largest key length to consider during recovery.",
+        )
+        group.add_argument(
+            f"--{algorithm_name}.candidates",
+            dest=f"{algorithm_name}.candidates",
+            type=int,
+            default=3,
+            help="Number of likely key lengths to attempt during recovery.",
+        )
+
+    @classmethod
+    def extract_args(
+        cls, algorithm_name: str, args: argparse.Namespace
+    ) -> Optional[Dict[str, Any]]:
+        _require_numpy()
+
+        keys: List[bytes] = []
+        for key in getattr(args, f"{algorithm_name}.key", None) or []:
+            try:
+                keys.append(bytes.fromhex(key))
+            except ValueError as e:
+                raise ValueError(f"An XOR key must be hex-encoded: {key}") from e
+
+        if any(not key for key in keys):
+            raise ValueError("An XOR key must not be empty.")
+
+        max_key_length: int = getattr(args, f"{algorithm_name}.max_key_length", 40)
+        candidates: int = getattr(args, f"{algorithm_name}.candidates", 3)
+        if max_key_length < 1 or candidates < 1:
+            raise ValueError("XOR key length and candidate limits must be positive.")
+
+        return {
+            "key": keys,
+            "max_key_length": max_key_length,
+            "candidates": candidates,
+        }
+
+
+__all__: Tuple[str, ...] = ("Xor",)
@@ -0,0 +1,140 @@
+"""
+Decrypts ciphertexts already in memory, without going through files.
+
+A `Decryptor` prepares an algorithm's state once and can be reused across
+calls; `decrypt` is a shorthand for one-off use. Results are returned in a
+compact form: an array of matched key indices alongside the plaintexts.
+"""
+
+import array
+from typing import (
+    TYPE_CHECKING,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from . import utils
+
+if TYPE_CHECKING:
+    from . import algorithm, types
+
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+#: Key index recorded for ciphertexts that no key decrypted.
+NO_MATCH: int = -1
+
+
+class Results:
+    """Decryption results aligned with the ciphertexts decrypted."""
+
+    __slots__ = ("key_indices", "plaintexts")
+
+    def __init__(self) -> None:
+        self.key_indices: array.array = array.array("q")
+        self.plaintexts: List[Optional[bytes]] = []
+
+    def __len__(self) -> int:
+        return len(self.key_indices)
+
+    def __getitem__(self, index: int) -> Optional[Tuple[int, bytes]]:
+        plaintext: Optional[bytes] = self.plaintexts[index]
+        if plaintext is None:
+            return None
+
+        return self.key_indices[index], plaintext
+
+    def __iter__(self) -> Iterator[Optional[Tuple[int, bytes]]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def matched(self) -> Generator[Tuple[int, int, bytes], None, None]:
+        """
+        Provides only the ciphertexts that were decrypted.
+
+        :return: Generator of ciphertext indices, key indices, and plaintexts.
+        """
+
+        for index, plaintext in enumerate(self.plaintexts):
+            if plaintext is not None:
+                yield index, self.key_indices[index], plaintext
+
+    def __repr__(self) -> str:
+        return f"Results({list(self)!r})"
+
+
+class Decryptor:
+    """Decrypts in-memory ciphertexts, reusing prepared state across calls."""
+
+    def __init__(
+        self,
+        handler: Union[str, Type["algorithm.Algorithm"]],
+        options: "types.Options",
+        batch_size: int = 256,
+    ) -> None:
+        """
+        Prepares an algorithm for decryption.
+
+        :param handler: Algorithm, or the name it is registered under.
+        :param options: Decryption options; only `algorithm_options` and
+            `validators` apply to in-memory ciphertexts.
+        :param batch_size: Number of ciphertexts passed to the algorithm at once.
+        """
+
+        self.handler: Type["algorithm.Algorithm"] = (
+            utils.get_algorithms()[handler].load()
+            if isinstance(handler, str)
+            else handler
+        )
+        self.state: "algorithm.State" = self.handler.setup(options)
+        self.batch_size: int = batch_size
+
+    def decrypt(self, buffers: Iterable[Buffer]) -> Results:
+        """
+        Decrypts ciphertexts.
+
+        :param buffers: Ciphertexts, as bytes, bytearrays, or memoryviews.
+        :return: Results in the order of the ciphertexts.
+        """
+
+        results: Results = Results()
+        payloads = (
+            buffer if isinstance(buffer, bytes) else bytes(buffer) for buffer in buffers
+        )
+        for batch in utils.batched(payloads, self.batch_size):
+            offset: int = len(results)
+            results.key_indices.extend([NO_MATCH] * len(batch))
+            results.plaintexts.extend([None] * len(batch))
+            for result in self.handler.decrypt_batch(self.state, batch):
+                results.key_indices[offset + result.index] = result.key_index
+                results.plaintexts[offset + result.index] = result.plaintext
+
+        return results
+
+
+def decrypt(
+    buffers: Iterable[Buffer],
+    handler: Union[str, Type["algorithm.Algorithm"]],
+    options: "types.Options",
+) -> Results:
+    """
+    Decrypts in-memory ciphertexts.
+
+    Prefer a `Decryptor` when decrypting repeatedly with the same options.
+
+    :param buffers: Ciphertexts, as bytes, bytearrays, or memoryviews.
+    :param handler: Algorithm, or the name it is registered under.
+    :param options: Decryption options.
+    :return: Results in the order of the ciphertexts.
+    """
+
+    return Decryptor(handler, options).decrypt(buffers)
+
+
+__all__: Tuple[str, ...] = ("Buffer", "Decryptor", "NO_MATCH", "Results", "decrypt")
@@ -0,0 +1,241 @@
+"""
+Records progress so interrupted runs can resume where they stopped.
+
+Progress is kept in an append-only journal of JSON lines. Recording progress
+only appends a short line, so it is cheap enough to do after every batch of
+payloads; resuming replays the journal and rewrites it compactly.
+"""
+
+import json
+import logging
+import os
+import pathlib
+import sys
+from types import TracebackType
+from typing import IO, Any, Dict, List, Optional, Set, Tuple, Type, Union
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Completed files, positions within files, finished ranges of split files,
+    and completed tasks.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path], fingerprint: Any) -> None:
+        self.path: pathlib.Path = pathlib.Path(path)
+        self.fingerprint: Any = fingerprint
+        self.completed: Set[str] = set()
+        self.positions: Dict[str, int] = {}
+        self.segments: Dict[str, List[Tuple[int, Optional[int]]]] = {}
+        self.tasks: Set[int] = set()
+        self._journal: Optional[IO[str]] = None
+
+    @classmethod
+    def open(
+        cls, path: Union[str, pathlib.Path], fingerprint: Any, resume: bool = False
+    ) -> "Checkpoint":
+        """
+        Opens a checkpoint for recording.
+
+        :param path: Journal location.
+        :param fingerprint: JSON-serializable description of the run, which
+            must match when resuming.
+        :param resume: Whether to continue from an existing journal rather
+            than start over.
+        :return: An open checkpoint.
+        """
+
+        checkpoint = cls(path, fingerprint)
+        if resume:
+            checkpoint._replay()
+
+        checkpoint._rewrite()
+        return checkpoint
+
+    def _replay(self) -> None:
+        if not self.path.exists():
+            raise ValueError(f"No checkpoint to resume from at {self.path}")
+
+        with open(self.path, "r", encoding="utf-8") as journal:
+            lines: List[str] = journal.readlines()
+
+        for number, line in enumerate(lines):
+            try:
+                record: List[Any] = json.loads(line)
+            except json.JSONDecodeError:
+                # An interrupted write can only truncate the final record.
+                if number == len(lines) - 1:
+                    break
+
+                raise ValueError(f"Corrupt checkpoint at {self.path}") from None
+
+            self._apply(record)
+
+    def _apply(self, record: List[Any]) -> None:
+        kind: str = record[0]
+        if kind == "run":
+            if record[1] != self.fingerprint:
+                raise ValueError(
+                    "The checkpoint was created by a run with different "
+                    "files or options"
+                )
+        elif kind == "position":
+            self.positions[record[1]] = record[2]
+        elif kind == "done":
+            self.completed.add(record[1])
+            self.positions.pop(record[1], None)
+            self.segments.pop(record[1], None)
+        elif kind == "segment":
+            self.segments.setdefault(record[1], []).append((record[2], record[3]))
+        elif kind == "task":
+            self.tasks.add(record[1])
+
+    def _rewrite(self) -> None:
+        temporary: pathlib.Path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as journal:
+            journal.write(json.dumps(["run", self.fingerprint]) + "\n")
+            for path in sorted(self.completed):
+                journal.write(json.dumps(["done", path]) + "\n")
+            for path, position in self.positions.items():
+                journal.write(json.dumps(["position", path, position]) + "\n")
+            for path, segments in self.segments.items():
+                for start, stop in segments:
+                    journal.write(json.dumps(["segment", path, start, stop]) + "\n")
+            for task_id in sorted(self.tasks):
+                journal.write(json.dumps(["task", task_id]) + "\n")
+
+        os.replace(temporary, self.path)
+        self._journal = open(  # pylint: disable=consider-using-with
+            self.path, "a", encoding="utf-8"
+        )
+
+    def _append(self, record: List[Any]) -> None:
+        if self._journal is None:
+            raise ValueError("Checkpoint is closed")
+
+        # Results are written before the progress that covers them.
+        sys.stdout.flush()
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+
+    def position(self, file_path: Union[str, pathlib.Path]) -> int:
+        """
+        Provides the position to resume a file from.
+
+        :param file_path: File being processed.
+        :return: Position to resume from, or 0 to start from the beginning.
+        """
+
+        return self.positions.get(str(file_path), 0)
+
+    def finished_segments(
+        self, file_path: Union[str, pathlib.Path]
+    ) -> Tuple[Tuple[int, Optional[int]], ...]:
+        """
+        Provides the ranges of a split file that were already processed.
+
+        :param file_path: File being processed.
+        :return: Start and stop offsets of each range, where a stop of None
+            is the end of the file.
+        """
+
+        return tuple(self.segments.get(str(file_path), ()))
+
+    def is_completed(self, file_path: Union[str, pathlib.Path]) -> bool:
+        """
+        Checks whether a file was fully processed.
+
+        :param file_path: File to check.
+        :return: Whether the file is complete.
+        """
+
+        return str(file_path) in self.completed
+
+    def record_position(
+        self, file_path: Union[str, pathlib.Path], position: int
+    ) -> None:
+        """
+        Records that a file was processed up to a position.
+
+        :param file_path: File being processed.
+        :param position: Position after the last processed payload.
+        :return: None.
+        """
+
+        self.positions[str(file_path)] = position
+        self._append(["position", str(file_path), position])
+
+    def record_completed(self, file_path: Union[str, pathlib.Path]) -> None:
+        """
+        Records that a file was fully processed.
+
+        :param file_path: Completed file.
+        :return: None.
+        """
+
+        self.completed.add(str(file_path))
+        self.positions.pop(str(file_path), None)
+        self.segments.pop(str(file_path), None)
+        self._append(["done", str(file_path)])
+
+    def record_segment(
+        self, file_path: Union[str, pathlib.Path], start: int, stop: Optional[int]
+    ) -> None:
+        """
+        Records that a range of a split file was processed, while other ranges
+        of it may still be in progress.
+
+        :param file_path: File the range belongs to.
+        :param start: Offset of the range.
+        :param stop: Offset after the range, or None for the end of the file.
+        :return: None.
+        """
+
+        self.segments.setdefault(str(file_path), []).append((start, stop))
+        self._append(["segment", str(file_path), start, stop])
+
+    def record_task(self, task_id: int) -> None:
+        """
+        Records that a distributed task, covering files and keys, completed.
+
+        :param task_id: Completed task.
+        :return: None.
+        """
+
+        self.tasks.add(task_id)
+        self._append(["task", task_id])
+
+    def close(self) -> None:
+        """
+        Flushes and closes the journal.
+
+        :return: None.
+        """
+
+        if self._journal is not None:
+            sys.stdout.flush()
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is KeyboardInterrupt:
+            logger.warning(
+                "Interrupted; resume with --resume --checkpoint %s", self.path
+            )
+
+        self.close()
+
+
+__all__: Tuple[str, ...] = ("Checkpoint",)
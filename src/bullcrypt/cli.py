@@ -3,10 +3,9 @@ Processes command-line inputs to trigger decryption.
 """
 
 import argparse
-from typing import Tuple, Type, TYPE_CHECKING, Sequence, Optional
-
-from . import utils, types
+from typing import Tuple, Type, TYPE_CHECKING, Sequence, Optional, List
 
+from . import scoring, utils, types
 
 if TYPE_CHECKING:
     # noinspection PyProtectedMember
@@ -105,6 +104,77 @@ def _add_plain_group(
     )
 
 
+def _add_validation_group(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group(
+        "Plaintext Validation",
+        description="Checks a decryption must pass to be accepted. When "
+        "several are given, all must pass. Without any, the algorithm's "
+        "defaults apply.",
+    )
+    group.add_argument(
+        "--printable",
+        type=float,
+        nargs="?",
+        const=0.95,
+        default=None,
+        metavar="RATIO",
+        help="Require a minimum ratio of printable ASCII characters.",
+    )
+    group.add_argument(
+        "--utf8",
+        action="store_true",
+        default=False,
+        help="Require plaintext to be valid UTF-8.",
+    )
+    group.add_argument(
+        "--english",
+        type=float,
+        nargs="?",
+        const=5.0,
+        default=None,
+        metavar="SCORE",
+        help="Require a minimum English character and bigram score.",
+    )
+    group.add_argument(
+        "--regex",
+        "--match",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Require plaintext to contain a match, such as 'flag\\{.*\\}'.",
+    )
+    group.add_argument(
+        "--magic",
+        action="append",
+        nargs="?",
+        const="any",
+        default=[],
+        choices=["any", *scoring.FILE_SIGNATURES],
+        help="Require plaintext to start with a known file signature.",
+    )
+
+
+def _extract_validators(args: argparse.Namespace) -> Tuple[scoring.Validator, ...]:
+    validators: List[scoring.Validator] = []
+    if args.printable is not None:
+        validators.append(scoring.PrintableValidator(args.printable))
+
+    if args.utf8:
+        validators.append(scoring.Utf8Validator())
+
+    if args.english is not None:
+        validators.append(scoring.EnglishValidator(args.english))
+
+    for pattern in args.regex:
+        validators.append(scoring.RegexValidator(pattern, args.encoding))
+
+    if args.magic:
+        kinds = None if "any" in args.magic else args.magic
+        validators.append(scoring.MagicValidator(kinds))
+
+    return tuple(validators)
+
+
 def _add_algorithm_group(parser: argparse.ArgumentParser) -> None:
     algorithms: EntryPoints = utils.get_algorithms()
     parser.add_argument(
@@ -126,9 +196,76 @@ def _main_parser(args: Optional[Sequence[str]] = None) -> argparse.ArgumentParse
         default=False,
         help="Recurse over directories.",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of workers. Use 0 for one per CPU.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("auto", "thread", "process"),
+        default="auto",
+        help="Run workers as threads or processes. Auto uses threads on "
+        "free-threaded Python builds and processes otherwise.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        help="Record progress to a file so an interrupted run can be resumed.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Skip work recorded as done in the checkpoint.",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        nargs="?",
+        const=1.0,
+        default=None,
+        metavar="SECONDS",
+        help="Keep running, polling every few seconds to decrypt new files "
+        "and lines appended to files. Runs serially.",
+    )
+    limit_group = parser.add_mutually_exclusive_group()
+    limit_group.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Stop once N plaintexts have been found.",
+    )
+    limit_group.add_argument(
+        "--first-match",
+        dest="limit",
+        action="store_const",
+        const=1,
+        help="Stop once a plaintext has been found. Combine with --match to "
+        "stop at the first plaintext matching a pattern.",
+    )
+    parser.add_argument(
+        "--max-memory",
+        metavar="SIZE",
+        default=None,
+        help="Budget for ciphertext and results held in memory, such as 2G. "
+        "Fewer files are processed at once to stay within it.",
+    )
+    parser.add_argument(
+        "--no-sniff",
+        dest="sniff",
+        action="store_false",
+        default=True,
+        help="Process every file found while recursing, even those whose "
+        "start cannot hold ciphertext.",
+    )
 
     _add_parsing_strategy_group(parser)
     _add_plain_group(parser, args)
+    _add_validation_group(parser)
     _add_algorithm_group(parser)
 
     parser.add_argument("files", nargs="+", help="Files to parse.")
@@ -137,17 +274,25 @@ def _main_parser(args: Optional[Sequence[str]] = None) -> argparse.ArgumentParse
 
 
 def parse(
-    cli_args: Optional[Sequence[str]] = None,
+    cli_args: Optional[Sequence[str]] = None, distributed: bool = False
 ) -> Tuple[Type["algorithm.Algorithm"], Sequence[str], types.Options]:
     """
     Parses CLI arguments and creates a `types.Options` instance.
 
     :param cli_args: Command-line arguments, passed to the parser.
+    :param distributed: Whether the arguments are shared by a coordinator
+        with its workers, which each parse them on their own host.
     :return: `types.Options` instance.
     """
 
     parser: argparse.ArgumentParser = _main_parser(cli_args)
     args: argparse.Namespace = parser.parse_args(cli_args)
+    args.distributed = distributed
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+
+    if args.jobs < 0:
+        parser.error("--jobs cannot be negative; use 0 for one per CPU")
 
     # noinspection PyTypeChecker
     mode: "types.FileParsingMode" = utils.get_truthy_attribute(
@@ -161,18 +306,56 @@ def parse(
         fallback="plain",
     )
 
+    max_memory: Optional[int] = None
+    if args.max_memory is not None:
+        try:
+            max_memory = utils.parse_size(args.max_memory)
+        except ValueError as e:
+            parser.error(f"--max-memory: {e}")
+
+        if distributed:
+            # Workers decrypt one task at a time, outside of any budget.
+            parser.error("--max-memory cannot be used when distributed")
+
     algorithm_handler: Type["algorithm.Algorithm"] = ALGORITHMS[args.algorithm].load()
-    return (
-        algorithm_handler,
-        args.files,
-        types.Options(
-            mode=mode,
-            plaintext_encoding=plaintext_encoding,
-            encoding=args.encoding,
-            recursive=args.recursive,
-            algorithm_options=algorithm_handler.extract_args(args.algorithm, args),
-        ),
+    options: types.Options = types.Options(
+        mode=mode,
+        plaintext_encoding=plaintext_encoding,
+        encoding=args.encoding,
+        recursive=args.recursive,
+        jobs=args.jobs,
+        checkpoint=args.checkpoint,
+        resume=args.resume,
+        sniff=args.sniff,
+        backend=args.backend,
+        watch=args.watch,
+        limit=args.limit,
+        max_memory=max_memory,
+        algorithm_options=algorithm_handler.extract_args(args.algorithm, args),
+        validators=_extract_validators(args),
     )
+    if args.watch is not None:
+        if args.watch <= 0:
+            parser.error("--watch requires a positive interval")
+
+        if algorithm_handler.rewrites(options):
+            parser.error("--watch cannot be used while rewriting files")
+
+        if max_memory is not None:
+            parser.error("--max-memory cannot be used with --watch")
+
+    if args.limit is not None:
+        if args.limit <= 0:
+            parser.error("--limit requires a positive count")
+
+        if algorithm_handler.rewrites(options):
+            parser.error("--limit cannot be used while rewriting files")
+
+        if distributed:
+            # Workers stop independently, so no shared count could be kept.
+            parser.error("--limit and --first-match cannot be used when distributed")
+
+    return algorithm_handler, args.files, options
 
 
 __all__: Tuple[str, ...] = ("parse",)
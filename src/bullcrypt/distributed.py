@@ -0,0 +1,558 @@
+"""
+Distributes decryption across processes and hosts.
+
+A coordinator splits the files to process, and optionally the key space,
+into tasks and leases them to workers over TCP or Unix sockets. Leases are
+renewed by worker heartbeats; tasks held by workers that disconnect or stop
+responding are handed out again. Workers must be able to read the same file
+paths as the coordinator, such as through shared storage.
+"""
+
+import argparse
+import collections
+import itertools
+import logging
+import os
+import pathlib
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+from . import checkpoint, cli, main as _main
+
+if TYPE_CHECKING:
+    from . import algorithm, types
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+COMMANDS: Tuple[str, ...] = ("coordinator", "worker")
+
+Address = Union[str, Tuple[str, int]]
+# File path, key index, plaintext, and the algorithm that matched, if named.
+ResultRecord = Tuple[str, int, bytes, Optional[str]]
+
+
+class Task(NamedTuple):
+    """A leased unit of work: a shard of files over a range of keys."""
+
+    task_id: int
+    files: Tuple[str, ...]
+    key_range: Optional[Tuple[int, int]] = None
+
+
+def parse_address(address: str) -> Address:
+    """
+    Parses a socket address.
+
+    :param address: Either HOST:PORT for TCP or a filesystem path for a Unix socket.
+    :return: An address accepted by `multiprocessing.connection`.
+    """
+
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in address:
+        return host, int(port)
+
+    return address
+
+
+def _authkey(authkey: Optional[str]) -> bytes:
+    # Messages are pickled, so unauthenticated peers could run arbitrary code.
+    authkey = authkey or os.environ.get("BULLCRYPT_AUTHKEY")
+    if not authkey:
+        raise ValueError(
+            "An authentication key is required; use --authkey or BULLCRYPT_AUTHKEY."
+        )
+
+    return authkey.encode("utf-8")
+
+
+class Coordinator:
+    """Leases tasks to workers and collects their results."""
+
+    def __init__(
+        self,
+        tasks: Sequence[Task],
+        cli_args: Sequence[str],
+        lease_timeout: float = 60.0,
+        result_handler: Optional[Callable[[ResultRecord], None]] = None,
+        progress: Optional[checkpoint.Checkpoint] = None,
+    ) -> None:
+        self.tasks: Dict[int, Task] = {task.task_id: task for task in tasks}
+        self.cli_args: List[str] = list(cli_args)
+        self.lease_timeout: float = lease_timeout
+        self.result_handler: Callable[[ResultRecord], None] = (
+            result_handler or _print_result
+        )
+
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: Deque[int] = collections.deque(self.tasks)
+        self._leases: Dict[int, Tuple[float, int]] = {}
+        self._progress: Optional[checkpoint.Checkpoint] = progress
+        self._completed: Set[int] = set()
+        if progress is not None:
+            self._completed.update(progress.tasks & self.tasks.keys())
+
+        self._finished: threading.Event = threading.Event()
+        self._connected: threading.Condition = threading.Condition()
+        self._connections: int = 0
+        if len(self._completed) == len(self.tasks):
+            self._finished.set()
+
+    @classmethod
+    def plan(
+        cls,
+        handler: Type["algorithm.Algorithm"],
+        files: Sequence[str],
+        options: "types.Options",
+        shard_size: int = 16,
+        key_shard_size: Optional[int] = None,
+    ) -> List[Task]:
+        """
+        Splits files, and optionally keys, into tasks.
+
+        :param handler: Algorithm to decrypt with.
+        :param files: Files and directories to process.
+        :param options: Decryption options.
+        :param shard_size: Maximum number of files per task.
+        :param key_shard_size: Maximum number of keys per task, if splitting keys.
+        :return: Tasks covering every file and key.
+        """
+
+        sniffer = _main._Sniffer(handler, options)
+        paths: List[str] = [
+            str(path) for file in files for path in _main._walk(file, options, sniffer)
+        ]
+        sniffer.report()
+
+        key_ranges: List[Optional[Tuple[int, int]]] = [None]
+        key_count: Optional[int] = handler.key_count(options)
+        # Files are rewritten whole, so their keys cannot be split.
+        if key_shard_size and key_count and not handler.rewrites(options):
+            key_ranges = [
+                (start, min(start + key_shard_size, key_count))
+                for start in range(0, key_count, key_shard_size)
+            ]
+
+        shards = [
+            tuple(paths[start : start + shard_size])
+            for start in range(0, len(paths), shard_size)
+        ]
+        return [
+            Task(task_id, shard, key_range)
+            for task_id, (shard, key_range) in enumerate(
+                itertools.product(shards, key_ranges)
+            )
+        ]
+
+    @property
+    def finished(self) -> bool:
+        """Whether every task has completed."""
+
+        return self._finished.is_set()
+
+    def _reap(self, now: float) -> None:
+        for task_id, (deadline, worker_id) in list(self._leases.items()):
+            if deadline < now:
+                logger.warning(
+                    "Lease on task %d by worker %d expired", task_id, worker_id
+                )
+                del self._leases[task_id]
+                self._pending.appendleft(task_id)
+
+    def acquire(self, worker_id: int) -> Optional[Task]:
+        """
+        Leases the next available task to a worker.
+
+        :param worker_id: Identifier of the requesting worker.
+        :return: A task, or None if none are currently available.
+        """
+
+        with self._lock:
+            now: float = time.monotonic()
+            self._reap(now)
+            while self._pending:
+                task_id: int = self._pending.popleft()
+                if task_id in self._completed:
+                    continue
+
+                self._leases[task_id] = (now + self.lease_timeout, worker_id)
+                return self.tasks[task_id]
+
+        return None
+
+    def renew(self, task_id: int, worker_id: int) -> None:
+        """
+        Extends a worker's lease on a task.
+
+        :param task_id: Leased task.
+        :param worker_id: Worker holding the lease.
+        :return: None.
+        """
+
+        with self._lock:
+            lease = self._leases.get(task_id)
+            if lease is not None and lease[1] == worker_id:
+                self._leases[task_id] = (
+                    time.monotonic() + self.lease_timeout,
+                    worker_id,
+                )
+
+    def complete(
+        self, task_id: int, worker_id: int, results: Sequence[ResultRecord]
+    ) -> bool:
+        """
+        Records a completed task, reporting its results once.
+
+        :param task_id: Completed task.
+        :param worker_id: Worker that completed it, which may no longer hold
+            the lease if the task was reassigned.
+        :param results: Decrypted results for the task.
+        :return: Whether this was the first completion of the task.
+        """
+
+        with self._lock:
+            if task_id in self._completed or task_id not in self.tasks:
+                logger.debug("Ignoring repeated task %d from %d", task_id, worker_id)
+                return False
+
+            self._completed.add(task_id)
+            self._leases.pop(task_id, None)
+
+            for result in results:
+                self.result_handler(result)
+
+            if self._progress is not None:
+                self._progress.record_task(task_id)
+
+            if len(self._completed) == len(self.tasks):
+                self._finished.set()
+
+        return True
+
+    def release(self, worker_id: int) -> None:
+        """
+        Returns every task leased by a worker to the queue.
+
+        :param worker_id: Worker that disconnected.
+        :return: None.
+        """
+
+        with self._lock:
+            for task_id, (_deadline, holder) in list(self._leases.items()):
+                if holder == worker_id:
+                    logger.warning(
+                        "Reassigning task %d from lost worker %d", task_id, worker_id
+                    )
+                    del self._leases[task_id]
+                    self._pending.appendleft(task_id)
+
+    def _serve_connection(self, connection: Connection, worker_id: int) -> None:
+        with self._connected:
+            self._connections += 1
+
+        try:
+            while True:
+                message = connection.recv()
+                kind: str = message[0]
+                if kind == "hello":
+                    connection.send(("config", self.cli_args))
+                    continue
+
+                if kind == "heartbeat":
+                    self.renew(message[1], worker_id)
+                    continue
+
+                if kind == "result":
+                    self.complete(message[1], worker_id, message[2])
+
+                if self.finished:
+                    connection.send(("done",))
+                    return
+
+                task: Optional[Task] = self.acquire(worker_id)
+                if task is None:
+                    connection.send(("wait", min(1.0, self.lease_timeout / 4)))
+                else:
+                    connection.send(("task", task))
+        except (EOFError, OSError):
+            logger.info("Worker %d disconnected", worker_id)
+        finally:
+            self.release(worker_id)
+            connection.close()
+            with self._connected:
+                self._connections -= 1
+                self._connected.notify_all()
+
+    def serve(self, address: Address, authkey: bytes) -> None:
+        """
+        Accepts workers until every task has completed.
+
+        :param address: Address to listen on.
+        :param authkey: Shared key workers must authenticate with.
+        :return: None.
+        """
+
+        with Listener(address, authkey=authkey) as listener:
+            accepting = threading.Thread(
+                target=self._accept, args=(listener,), daemon=True
+            )
+            accepting.start()
+            self._finished.wait()
+
+            # Let connected workers learn that the work is done.
+            with self._connected:
+                self._connected.wait_for(
+                    lambda: self._connections == 0, timeout=self.lease_timeout
+                )
+
+    def _accept(self, listener: Listener) -> None:
+        for worker_id in itertools.count():
+            try:
+                connection: Connection = listener.accept()
+            except (AuthenticationError, EOFError):
+                logger.warning("Rejected worker connection", exc_info=True)
+                continue
+            except OSError:
+                # The listener closes once every task has completed.
+                return
+
+            threading.Thread(
+                target=self._serve_connection,
+                args=(connection, worker_id),
+                daemon=True,
+            ).start()
+
+
+def _print_result(result: ResultRecord) -> None:
+    file_path, _key_index, plaintext, algorithm_name = result
+    if algorithm_name is not None:
+        print(
+            pathlib.Path(file_path), "->", f"{algorithm_name}:", plaintext, flush=True
+        )
+    else:
+        print(pathlib.Path(file_path), "->", plaintext, flush=True)
+
+
+def _run_task(
+    handler: Type["algorithm.Algorithm"],
+    options: "types.Options",
+    states: Dict[Optional[Tuple[int, int]], "algorithm.State"],
+    task: Task,
+) -> List[ResultRecord]:
+    state = states.get(task.key_range)
+    if state is None:
+        states.clear()
+        restricted = options
+        if task.key_range is not None:
+            restricted = handler.restrict_keys(options, *task.key_range)
+
+        state = states[task.key_range] = handler.setup(restricted)
+
+    offset: int = task.key_range[0] if task.key_range is not None else 0
+    results: List[ResultRecord] = []
+    for file_path in task.files:
+        # pylint: disable=broad-exception-caught
+        # noinspection PyBroadException
+        try:
+            for path, result in _main._decrypt_file(
+                handler, pathlib.Path(file_path), state
+            ):
+                results.append(
+                    (
+                        str(path),
+                        result.key_index + offset,
+                        result.plaintext,
+                        result.algorithm,
+                    )
+                )
+        except Exception:
+            logger.exception("Failed to process file: %s", file_path)
+
+    return results
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(
+        self, send: Callable[[Any], None], task_id: int, interval: float
+    ) -> None:
+        super().__init__(daemon=True)
+        self.send: Callable[[Any], None] = send
+        self.task_id: int = task_id
+        self.interval: float = interval
+        self.stopped: threading.Event = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.send(("heartbeat", self.task_id))
+            except (OSError, ValueError):
+                return
+
+
+def run_worker(address: Address, authkey: bytes, heartbeat: float = 10.0) -> None:
+    """
+    Processes tasks from a coordinator until it reports completion.
+
+    :param address: Address of the coordinator.
+    :param authkey: Shared key to authenticate with.
+    :param heartbeat: Seconds between lease renewals while processing a task.
+    :return: None.
+    """
+
+    with Client(address, authkey=authkey) as connection:
+        lock: threading.Lock = threading.Lock()
+
+        def send(message: Any) -> None:
+            with lock:
+                connection.send(message)
+
+        send(("hello",))
+        _kind, cli_args = connection.recv()
+        handler, _files, options = cli.parse(cli_args, distributed=True)
+        states: Dict[Optional[Tuple[int, int]], "algorithm.State"] = {}
+
+        message: Any = ("request",)
+        while True:
+            try:
+                send(message)
+                reply = connection.recv()
+            except (EOFError, OSError):
+                logger.warning("Lost connection to the coordinator")
+                return
+
+            if reply[0] == "done":
+                return
+
+            if reply[0] == "wait":
+                time.sleep(reply[1])
+                message = ("request",)
+                continue
+
+            task: Task = reply[1]
+            beat = _Heartbeat(send, task.task_id, heartbeat)
+            beat.start()
+            try:
+                results = _run_task(handler, options, states, task)
+            finally:
+                beat.stopped.set()
+
+            message = ("result", task.task_id, results)
+
+
+def _coordinator_main(args: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="bullcrypt coordinator",
+        allow_abbrev=False,
+        description="Leases work to bullcrypt workers. Remaining arguments "
+        "are the regular bullcrypt arguments, shared with every worker.",
+    )
+    parser.add_argument(
+        "--listen", required=True, help="HOST:PORT or Unix socket path."
+    )
+    parser.add_argument("--authkey", help="Shared key workers authenticate with.")
+    parser.add_argument(
+        "--shard-size", type=int, default=16, help="Maximum files per task."
+    )
+    parser.add_argument(
+        "--key-shard-size",
+        type=int,
+        default=None,
+        help="Maximum keys per task, splitting the key space across workers.",
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds without a heartbeat before a task is reassigned.",
+    )
+    distributed_args, cli_args = parser.parse_known_args(args)
+
+    handler, files, options = cli.parse(cli_args, distributed=True)
+    address: Address = parse_address(distributed_args.listen)
+    authkey: bytes = _authkey(distributed_args.authkey)
+    tasks: List[Task] = Coordinator.plan(
+        handler,
+        files,
+        options,
+        distributed_args.shard_size,
+        distributed_args.key_shard_size,
+    )
+
+    # Task identifiers are only stable for the same plan.
+    description: List[Any] = _main._fingerprint(
+        handler,
+        files,
+        options,
+        distributed_args.shard_size,
+        distributed_args.key_shard_size,
+        handler.key_count(options),
+    )
+    with _main._open_checkpoint(options, description) as progress:
+        coordinator = Coordinator(
+            tasks, cli_args, distributed_args.lease_timeout, progress=progress
+        )
+        coordinator.serve(address, authkey)
+
+
+def _worker_main(args: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="bullcrypt worker", description="Processes work from a coordinator."
+    )
+    parser.add_argument(
+        "--connect", required=True, help="Coordinator HOST:PORT or socket path."
+    )
+    parser.add_argument("--authkey", help="Shared key to authenticate with.")
+    parser.add_argument(
+        "--heartbeat",
+        type=float,
+        default=10.0,
+        help="Seconds between lease renewals.",
+    )
+    worker_args: argparse.Namespace = parser.parse_args(args)
+
+    address: Address = parse_address(worker_args.connect)
+    run_worker(address, _authkey(worker_args.authkey), worker_args.heartbeat)
+
+
+def main(args: Sequence[str]) -> None:
+    """
+    Runs a coordinator or worker.
+
+    :param args: Command-line arguments, starting with the command name.
+    :return: None.
+    """
+
+    command, *remaining = args
+    if command == "coordinator":
+        _coordinator_main(remaining)
+    elif command == "worker":
+        _worker_main(remaining)
+    else:
+        raise ValueError(f"Unknown command {command}")
+
+
+__all__: Tuple[str, ...] = (
+    "COMMANDS",
+    "Coordinator",
+    "Task",
+    "main",
+    "parse_address",
+    "run_worker",
+)
@@ -2,11 +2,32 @@
 Executes the program.
 """
 
+import concurrent.futures
+import contextlib
+import functools
 import logging
+import multiprocessing
+import os
 import pathlib
-from typing import TYPE_CHECKING, Type, Tuple, Callable, Generator, Optional, Sequence
+import sys
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Type,
+    Tuple,
+    Generator,
+    Optional,
+    Sequence,
+    List,
+    Iterable,
+    Set,
+    Dict,
+)
 
-from . import cli
+from . import checkpoint, cli, rewrite, schedule, utils
 
 if TYPE_CHECKING:
     from . import algorithm, types
@@ -14,52 +35,497 @@ if TYPE_CHECKING:
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+_BATCH_SIZE: int = 256
+_QUEUE_DEPTH: int = 4
+_SNIFF_SIZE: int = 4096
+_SPLIT_SIZE: int = 64 * 1024 * 1024
+_PACK_SIZE: int = 1024 * 1024
+_PACK_COUNT: int = 64
+
+# Thread-local so that each thread of the thread backend, like each process of
+# the process backend, prepares and uses its own state.
+_worker: threading.local = threading.local()
+
+
+def _rewrite_file(
+    handler: Type["algorithm.Algorithm"],
+    file_path: pathlib.Path,
+    state: "algorithm.State",
+) -> None:
+    replaced, total = rewrite.rewrite_file(
+        file_path,
+        state.options,
+        functools.partial(handler.rewrite_batch, state),
+        _BATCH_SIZE,
+    )
+    if replaced < total:
+        logger.warning(
+            "Left %d of %d payloads unchanged in %s", total - replaced, total, file_path
+        )
+
+    print(file_path, "-> rewrote", replaced, "of", total, flush=True)
+
 
 def _decrypt_file(
     handler: Type["algorithm.Algorithm"],
     file_path: pathlib.Path,
-    options: "types.Options",
-) -> Generator[
-    Tuple[pathlib.Path, Callable[[], Generator[Callable[[], bytes], None, None]]],
-    None,
-    None,
-]:
-    for payload in handler.extract_content(file_path, options):
-        yield file_path, handler.decrypt(payload, options)
+    state: "algorithm.State",
+    start: int = 0,
+    progress: Optional[Callable[[int], None]] = None,
+    stop: Optional[int] = None,
+    cancelled: Optional[Callable[[], None]] = None,
+) -> Generator[Tuple[pathlib.Path, "types.DecryptionResult"], None, None]:
+    if handler.rewrites(state.options):
+        _rewrite_file(handler, file_path, state)
+        return
 
+    direct: Optional[List["types.DecryptionResult"]] = None
+    if not start and stop is None:
+        direct = handler.decrypt_file(state, file_path)
 
-def _process_file(
-    handler: Type["algorithm.Algorithm"], file_path: str, options: "types.Options"
-) -> Generator[
-    Tuple[pathlib.Path, Callable[[], Generator[Callable[[], bytes], None, None]]],
-    None,
-    None,
-]:
+    if direct is not None:
+        for result in direct:
+            yield file_path, result
+
+        return
+
+    payloads = (
+        handler.extract_positioned_content(file_path, state.options, start)
+        if stop is None
+        else handler.extract_positioned_content(file_path, state.options, start, stop)
+    )
+    for batch in utils.batched(
+        payloads,
+        _BATCH_SIZE,
+        utils.batch_bytes(state.options.max_memory, state.options.jobs),
+        _payload_size,
+    ):
+        positions, ciphertexts = zip(*batch)
+        for result in handler.decrypt_batch(state, ciphertexts):
+            yield file_path, result
+
+        # Reached only once the consumer has handled the batch's results.
+        if progress is not None:
+            progress(positions[-1])
+
+        if cancelled is not None:
+            cancelled()
+
+
+def _payload_size(item: Tuple[int, bytes]) -> int:
+    return len(item[1])
+
+
+def _decrypt_tracked(
+    handler: Type["algorithm.Algorithm"],
+    file_path: pathlib.Path,
+    state: "algorithm.State",
+    progress: Optional[checkpoint.Checkpoint],
+) -> Generator[Tuple[pathlib.Path, "types.DecryptionResult"], None, None]:
+    if progress is None:
+        yield from _decrypt_file(handler, file_path, state)
+        return
+
+    if progress.is_completed(file_path):
+        return
+
+    yield from _decrypt_file(
+        handler,
+        file_path,
+        state,
+        progress.position(file_path),
+        functools.partial(progress.record_position, file_path),
+    )
+    progress.record_completed(file_path)
+
+
+class _Sniffer:
+    def __init__(
+        self, handler: Type["algorithm.Algorithm"], options: "types.Options"
+    ) -> None:
+        self.handler: Type["algorithm.Algorithm"] = handler
+        self.options: "types.Options" = options
+        self.skipped: int = 0
+
+    def __call__(self, file_path: pathlib.Path) -> bool:
+        if not self.options.sniff:
+            return True
+
+        try:
+            with open(file_path, "rb") as file:
+                prefix: bytes = file.read(_SNIFF_SIZE)
+        except OSError:
+            # Left for extraction to report.
+            return True
+
+        if self.handler.sniff(prefix, self.options):
+            return True
+
+        logger.debug("Skipping file that cannot contain ciphertext: %s", file_path)
+        self.skipped += 1
+        return False
+
+    def report(self) -> None:
+        if self.skipped:
+            logger.warning(
+                "Skipped %d files that cannot contain ciphertext; "
+                "use --no-sniff to process them",
+                self.skipped,
+            )
+
+
+def _walk(
+    file_path: str,
+    options: "types.Options",
+    sniffer: Optional[_Sniffer] = None,
+) -> Generator[pathlib.Path, None, None]:
     normalized_path: pathlib.Path = pathlib.Path(file_path)
     if normalized_path.is_file():
-        yield from _decrypt_file(handler, normalized_path, options)
+        yield normalized_path
     elif options.recursive and normalized_path.is_dir():
         for entry_path in normalized_path.rglob("*"):
-            # pylint: disable=broad-exception-caught
-            # noinspection PyBroadException
-            try:
-                yield from _decrypt_file(handler, entry_path, options)
-            except Exception:
-                logger.exception("Failed to process file: %s", entry_path)
+            if entry_path.is_file() and (sniffer is None or sniffer(entry_path)):
+                yield entry_path
 
 
-def _default_result_handler(
-    result: Tuple[pathlib.Path, "types.DecipherProcessingGroup"],
-) -> None:
-    file_path, result_generator = result
-    for result_entry in result_generator():
-        # noinspection PyBroadException
+def _process_file(
+    handler: Type["algorithm.Algorithm"],
+    file_path: str,
+    options: "types.Options",
+    state: Optional["algorithm.State"] = None,
+    progress: Optional[checkpoint.Checkpoint] = None,
+    sniffer: Optional[_Sniffer] = None,
+) -> Generator[Tuple[pathlib.Path, "types.DecryptionResult"], None, None]:
+    if state is None:
+        state = handler.setup(options)
+
+    normalized_path: pathlib.Path = pathlib.Path(file_path)
+    if normalized_path.is_file():
+        yield from _decrypt_tracked(handler, normalized_path, state, progress)
+        return
+
+    for entry_path in _walk(file_path, options, sniffer):
         # pylint: disable=broad-exception-caught
+        # noinspection PyBroadException
         try:
-            print(file_path, "->", result_entry())
-            break
+            yield from _decrypt_tracked(handler, entry_path, state, progress)
         except Exception:
-            logger.info("Failed deciphering %s", file_path, exc_info=True)
+            logger.exception("Failed to process file: %s", entry_path)
+
+
+def _default_result_handler(
+    result: Tuple[pathlib.Path, "types.DecryptionResult"],
+) -> None:
+    file_path, decryption = result
+    if decryption.algorithm is not None:
+        print(file_path, "->", f"{decryption.algorithm}:", decryption.plaintext)
+    else:
+        print(file_path, "->", decryption.plaintext)
+
+
+class _Limit:
+    def __init__(self, limit: Optional[int], cancel: Optional[Any] = None) -> None:
+        self.remaining: Optional[int] = limit
+        # A threading or multiprocessing event, set once the limit is reached.
+        self.cancel: Optional[Any] = cancel
+
+    @property
+    def reached(self) -> bool:
+        return self.remaining is not None and self.remaining <= 0
+
+    def report(self, result: Tuple[pathlib.Path, "types.DecryptionResult"]) -> bool:
+        if self.reached:
+            return False
+
+        _default_result_handler(result)
+        if self.remaining is not None:
+            self.remaining -= 1
+            if self.reached and self.cancel is not None:
+                self.cancel.set()
+
+        return True
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _initialize_worker(
+    handler: Type["algorithm.Algorithm"],
+    options: "types.Options",
+    cancel: Optional[Any] = None,
+) -> None:
+    _worker.prepared = handler, handler.setup(options)
+    _worker.cancel = cancel
+
+
+def _check_cancelled() -> None:
+    cancel: Optional[Any] = getattr(_worker, "cancel", None)
+    if cancel is not None and cancel.is_set():
+        raise _Cancelled
+
+
+def _process_in_worker(
+    file_path: str, start: int = 0, stop: Optional[int] = None
+) -> Tuple[str, Optional[List[Tuple[pathlib.Path, "types.DecryptionResult"]]]]:
+    prepared: Optional[Tuple[Type["algorithm.Algorithm"], "algorithm.State"]] = getattr(
+        _worker, "prepared", None
+    )
+    if prepared is None:
+        raise RuntimeError("Worker was not initialized")
+
+    handler, state = prepared
+    # pylint: disable=broad-exception-caught
+    # noinspection PyBroadException
+    try:
+        _check_cancelled()
+        return file_path, list(
+            _decrypt_file(
+                handler,
+                pathlib.Path(file_path),
+                state,
+                start,
+                stop=stop,
+                cancelled=_check_cancelled,
+            )
+        )
+    except _Cancelled:
+        # Left incomplete, as the limit was reached elsewhere.
+        return file_path, None
+    except Exception:
+        logger.exception("Failed to process file: %s", file_path)
+        return file_path, None
+
+
+def _process_task(
+    task: schedule.Task,
+) -> List[
+    Tuple[
+        schedule.Segment,
+        Optional[List[Tuple[pathlib.Path, "types.DecryptionResult"]]],
+    ]
+]:
+    return [(segment, _process_in_worker(*segment)[1]) for segment in task]
+
+
+class _Budget:
+    def __init__(self, limit: Optional[int]) -> None:
+        self.limit: Optional[int] = limit
+        self.reserved: Dict[concurrent.futures.Future, int] = {}
+        self.used: int = 0
+
+    def admits(self, size: int) -> bool:
+        # Work larger than the budget runs alone rather than never running.
+        return self.limit is None or not self.used or self.used + size <= self.limit
+
+    def reserve(self, future: concurrent.futures.Future, size: int) -> None:
+        self.reserved[future] = size
+        self.used += size
+
+    def release(self, futures: Iterable[concurrent.futures.Future]) -> None:
+        for future in futures:
+            self.used -= self.reserved.pop(future, 0)
+
+
+def _task_size(task: schedule.Task, sizes: Dict[str, int]) -> int:
+    total: int = 0
+    for segment in task:
+        stop: int = sizes.get(segment.path, 0) if segment.stop is None else segment.stop
+        total += max(0, stop - segment.start)
+
+    return total
+
+
+def _report(
+    futures: Iterable[concurrent.futures.Future],
+    tracker: schedule.Tracker,
+    progress: Optional[checkpoint.Checkpoint] = None,
+    limit: Optional[_Limit] = None,
+) -> None:
+    limit = limit or _Limit(None)
+    for future in futures:
+        if future.cancelled():
+            continue
+
+        for segment, results in future.result():
+            # Failed files, and those with unreported results, are left
+            # incomplete so that resuming retries them.
+            succeeded: bool = results is not None
+            for result in results or ():
+                succeeded = limit.report(result) and succeeded
+
+            completed: bool = tracker.finish(segment.path, succeeded)
+            if progress is None:
+                continue
+
+            if completed:
+                progress.record_completed(segment.path)
+            elif succeeded:
+                # Other ranges of the file are unfinished, so resuming skips
+                # only this one.
+                progress.record_segment(segment.path, segment.start, segment.stop)
+
+
+def _is_free_threaded() -> bool:
+    is_gil_enabled: Optional[Callable[[], bool]] = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _backend(options: "types.Options") -> "types.ExecutionBackend":
+    if options.backend == "auto":
+        # Threads only run in parallel without the GIL.
+        return "thread" if _is_free_threaded() else "process"
+
+    return options.backend
+
+
+def _executor(
+    handler: Type["algorithm.Algorithm"],
+    options: "types.Options",
+    jobs: int,
+    cancel: Optional[Any] = None,
+) -> concurrent.futures.Executor:
+    if _backend(options) == "thread":
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=jobs,
+            initializer=_initialize_worker,
+            initargs=(handler, options, cancel),
+        )
+
+    # Events are inherited by each process when it starts.
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_initialize_worker,
+        initargs=(handler, options, cancel),
+    )
+
+
+def _entries(
+    handler: Type["algorithm.Algorithm"],
+    files: Sequence[str],
+    options: "types.Options",
+    progress: Optional[checkpoint.Checkpoint] = None,
+) -> Generator[schedule.Entry, None, None]:
+    splittable: bool = handler.splittable(options)
+    sniffer: _Sniffer = _Sniffer(handler, options)
+    for file in files:
+        for entry_path in _walk(file, options, sniffer):
+            start: int = 0
+            finished: Tuple[Tuple[int, Optional[int]], ...] = ()
+            if progress is not None:
+                if progress.is_completed(entry_path):
+                    continue
+
+                start = progress.position(entry_path)
+                finished = progress.finished_segments(entry_path)
+
+            try:
+                size: int = entry_path.stat().st_size
+            except OSError:
+                # Left for extraction to report.
+                size = 0
+
+            yield schedule.Entry(str(entry_path), size, start, splittable, finished)
+
+    sniffer.report()
+
+
+def _recorded(
+    entries: Iterable[schedule.Entry], sizes: Dict[str, int]
+) -> Generator[schedule.Entry, None, None]:
+    for entry in entries:
+        sizes[entry.path] = entry.size
+        yield entry
+
+
+def _run_parallel(
+    handler: Type["algorithm.Algorithm"],
+    files: Sequence[str],
+    options: "types.Options",
+    progress: Optional[checkpoint.Checkpoint] = None,
+) -> None:
+    jobs: int = options.jobs or os.cpu_count() or 1
+    sizes: Dict[str, int] = {}
+    entries = _recorded(_entries(handler, files, options, progress), sizes)
+    tasks: Iterable[schedule.Task]
+    limit: _Limit
+    if options.limit is None:
+        tasks = schedule.plan(entries, _SPLIT_SIZE, _PACK_SIZE, _PACK_COUNT)
+        limit = _Limit(None)
+    else:
+        # Results are wanted soon, so work starts before the walk finishes.
+        tasks = schedule.stream(entries, _PACK_SIZE, _PACK_COUNT)
+        limit = _Limit(
+            options.limit,
+            (
+                threading.Event()
+                if _backend(options) == "thread"
+                else multiprocessing.Event()
+            ),
+        )
+
+    tracker: schedule.Tracker = schedule.Tracker()
+    budget: _Budget = _Budget(options.max_memory)
+    with _executor(handler, options, jobs, limit.cancel) as executor:
+        pending: Set[concurrent.futures.Future] = set()
+        for task in tasks:
+            size: int = _task_size(task, sizes)
+            # Tasks wait for queue space and for memory to be released.
+            while pending and (
+                len(pending) >= jobs * _QUEUE_DEPTH or not budget.admits(size)
+            ):
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                budget.release(done)
+                _report(done, tracker, progress, limit)
+
+            if limit.reached:
+                break
+
+            if budget.limit is not None and size > budget.limit:
+                logger.warning(
+                    "Processing %s alone as it exceeds --max-memory", task[0].path
+                )
+
+            tracker.add(task)
+            future: concurrent.futures.Future = executor.submit(_process_task, task)
+            budget.reserve(future, size)
+            pending.add(future)
+
+        if limit.reached:
+            for future in pending:
+                future.cancel()
+
+        _report(concurrent.futures.as_completed(pending), tracker, progress, limit)
+
+
+def _fingerprint(
+    handler: Type["algorithm.Algorithm"],
+    files: Sequence[str],
+    options: "types.Options",
+    *extra: Any,
+) -> List[Any]:
+    # Keys are left out so they are never written to the checkpoint.
+    return [
+        f"{handler.__module__}.{handler.__qualname__}",
+        list(files),
+        options.mode,
+        options.plaintext_encoding,
+        options.encoding,
+        options.recursive,
+        handler.rewrites(options),
+        *extra,
+    ]
+
+
+def _open_checkpoint(
+    options: "types.Options", description: List[Any]
+) -> ContextManager[Optional[checkpoint.Checkpoint]]:
+    if options.checkpoint is None:
+        return contextlib.nullcontext()
+
+    return checkpoint.Checkpoint.open(options.checkpoint, description, options.resume)
 
 
 def main(args: Optional[Sequence[str]] = None) -> None:
@@ -70,16 +536,52 @@ def main(args: Optional[Sequence[str]] = None) -> None:
     :return: None.
     """
 
+    if args is None:
+        args = sys.argv[1:]
+
+    if args and args[0] in ("coordinator", "worker"):
+        # Imported lazily as the distributed mode builds on this module.
+        # pylint: disable=import-outside-toplevel
+        from . import distributed
+
+        distributed.main(args)
+        return
+
     handler, files, options = cli.parse(args)
+    with _open_checkpoint(options, _fingerprint(handler, files, options)) as progress:
+        if options.watch is not None:
+            # Imported lazily as watching builds on this module.
+            # pylint: disable=import-outside-toplevel
+            from . import watch
 
-    for file in files:
-        # pylint: disable=broad-exception-caught
-        # noinspection PyBroadException
-        try:
-            for result in _process_file(handler, file, options):
-                _default_result_handler(result)
-        except Exception:
-            logger.exception("Failed to process file: %s", file)
+            watch.Watcher(handler, files, options, progress).run(options.watch)
+            return
+
+        if options.jobs != 1:
+            _run_parallel(handler, files, options, progress)
+            return
+
+        state: "algorithm.State" = handler.setup(options)
+        sniffer: _Sniffer = _Sniffer(handler, options)
+        limit: _Limit = _Limit(options.limit)
+        for file in files:
+            # pylint: disable=broad-exception-caught
+            # noinspection PyBroadException
+            try:
+                for result in _process_file(
+                    handler, file, options, state, progress, sniffer
+                ):
+                    limit.report(result)
+                    # Closing the generator stops reading and decrypting.
+                    if limit.reached:
+                        break
+            except Exception:
+                logger.exception("Failed to process file: %s", file)
+
+            if limit.reached:
+                break
+
+        sniffer.report()
 
 
 __all__: Tuple[str, ...] = ("main",)
@@ -0,0 +1,172 @@
+"""
+Rewrites ciphertext files in place, such as to rotate their keys.
+
+Files are written to a temporary file beside the original, which then
+atomically replaces it, so an interrupted rewrite leaves the original intact.
+Line files are streamed in batches rather than read into memory.
+"""
+
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import IO, TYPE_CHECKING, Callable, List, Optional, Sequence, Tuple
+
+from . import utils
+
+if TYPE_CHECKING:
+    from . import types
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+#: Produces a replacement for each payload, or None to keep one unchanged.
+Transform = Callable[[Sequence[bytes]], List[Optional[bytes]]]
+
+
+def _rewrite_raw(
+    file_path: pathlib.Path, output: IO[bytes], transform: Transform
+) -> Tuple[int, int]:
+    with open(file_path, "rb") as file:
+        content: bytes = file.read()
+
+    (replacement,) = transform([content])
+    if replacement is not None:
+        # Keep the line ending of a token saved as text.
+        content = replacement + content[len(content.rstrip(b"\r\n")) :]
+
+    output.write(content)
+    return int(replacement is not None), 1
+
+
+def _rewrite_chunked(
+    file_path: pathlib.Path,
+    output: IO[str],
+    transform: Transform,
+    options: "types.Options",
+) -> Tuple[int, int]:
+    with open(file_path, "r", encoding=options.encoding, newline="") as file:
+        content: str = file.read()
+
+    replacement: Optional[bytes] = None
+    # noinspection PyBroadException
+    # pylint: disable=broad-exception-caught
+    try:
+        payload: bytes = utils.decode_content(
+            "".join(content.splitlines()), options.plaintext_encoding, options.encoding
+        )
+        (replacement,) = transform([payload])
+    except Exception:
+        logger.exception("Failed to decode file: %s", file_path)
+
+    if replacement is not None:
+        ending: str = content[len(content.rstrip("\r\n")) :]
+        content = (
+            utils.encode_content(
+                replacement, options.plaintext_encoding, options.encoding
+            )
+            + ending
+        )
+
+    output.write(content)
+    return int(replacement is not None), 1
+
+
+def _rewrite_lines(
+    lines: Sequence[str], transform: Transform, options: "types.Options"
+) -> Tuple[List[str], int, int]:
+    indices: List[int] = [index for index, line in enumerate(lines) if line.strip()]
+    decoded: List[Optional[bytes]] = utils.decode_lines(
+        [lines[index].strip() for index in indices],
+        options.plaintext_encoding,
+        options.encoding,
+    )
+    indices = [index for index, payload in zip(indices, decoded) if payload is not None]
+    payloads: List[bytes] = [payload for payload in decoded if payload is not None]
+
+    rewritten: List[str] = list(lines)
+    count: int = 0
+    for index, replacement in zip(indices, transform(payloads) if payloads else ()):
+        if replacement is None:
+            continue
+
+        original: str = lines[index]
+        leading: str = original[: len(original) - len(original.lstrip())]
+        trailing: str = original[len(original.rstrip()) :]
+        rewritten[index] = (
+            leading
+            + utils.encode_content(
+                replacement, options.plaintext_encoding, options.encoding
+            )
+            + trailing
+        )
+        count += 1
+
+    return rewritten, count, len(payloads)
+
+
+def rewrite_file(
+    file_path: pathlib.Path,
+    options: "types.Options",
+    transform: Transform,
+    batch_size: int = 256,
+) -> Tuple[int, int]:
+    """
+    Replaces the payloads of a file, preserving its layout.
+
+    Lines without payloads, payloads that fail to decode, and payloads the
+    transform keeps are written back unchanged. The file is left untouched
+    when no payload is replaced.
+
+    :param file_path: File to rewrite.
+    :param options: Parsing options describing how payloads are stored.
+    :param transform: Produces replacements for a batch of payloads.
+    :param batch_size: Number of lines to transform at once in line mode.
+    :return: Number of payloads replaced and number of payloads found.
+    """
+
+    handle, temporary = tempfile.mkstemp(
+        prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent
+    )
+    try:
+        if options.mode == "raw":
+            with os.fdopen(handle, "wb") as output:
+                replaced, total = _rewrite_raw(file_path, output, transform)
+        elif options.mode == "chunked":
+            with os.fdopen(
+                handle, "w", encoding=options.encoding, newline=""
+            ) as text_output:
+                replaced, total = _rewrite_chunked(
+                    file_path, text_output, transform, options
+                )
+        elif options.mode == "line":
+            replaced = total = 0
+            with os.fdopen(
+                handle, "w", encoding=options.encoding, newline=""
+            ) as text_output:
+                with open(
+                    file_path, "r", encoding=options.encoding, newline=""
+                ) as file:
+                    for batch in utils.batched(file, batch_size):
+                        lines, batch_replaced, batch_total = _rewrite_lines(
+                            batch, transform, options
+                        )
+                        text_output.writelines(lines)
+                        replaced += batch_replaced
+                        total += batch_total
+        else:
+            os.close(handle)
+            raise ValueError(f"Unknown mode {options.mode}")
+
+        if replaced:
+            shutil.copymode(file_path, temporary)
+            os.replace(temporary, file_path)
+    finally:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+
+    return replaced, total
+
+
+__all__: Tuple[str, ...] = ("Transform", "rewrite_file")
@@ -0,0 +1,226 @@
+"""
+Plans parallel work from file sizes so that workers finish together.
+
+Small files are packed into shared tasks to spread dispatch overhead, large
+line files are split at line boundaries into byte ranges, and tasks are
+ordered largest first so no worker is left with a large file at the end.
+"""
+
+import pathlib
+from typing import Dict, Generator, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class Segment(NamedTuple):
+    """A file, or a byte range of one, decrypted as a unit."""
+
+    path: str
+    start: int = 0
+    stop: Optional[int] = None
+
+
+class Entry(NamedTuple):
+    """A file found by the walk, with what is known about it."""
+
+    path: str
+    size: int
+    start: int = 0
+    splittable: bool = False
+    #: Ranges already processed by an earlier run, which are skipped.
+    finished: Tuple[Tuple[int, Optional[int]], ...] = ()
+
+    @property
+    def remaining(self) -> int:
+        """Bytes left to process."""
+
+        return sum(
+            (self.size if stop is None else stop) - start for start, stop in _gaps(self)
+        )
+
+
+def _gaps(entry: Entry) -> List[Tuple[int, Optional[int]]]:
+    gaps: List[Tuple[int, Optional[int]]] = []
+    position: int = entry.start
+    for start, stop in sorted(entry.finished):
+        if start > position:
+            gaps.append((position, min(start, entry.size)))
+
+        position = max(position, entry.size if stop is None else stop)
+
+    if position < entry.size or not entry.finished:
+        gaps.append((position, None))
+
+    return gaps
+
+
+#: Segments processed together by one worker, in order.
+Task = Tuple[Segment, ...]
+
+
+def line_boundaries(
+    file_path: pathlib.Path, start: int, stop: int, step: int
+) -> List[int]:
+    """
+    Finds line boundaries roughly `step` bytes apart.
+
+    :param file_path: File to divide.
+    :param start: Offset of the first line to include.
+    :param stop: Offset after the last line to include.
+    :param step: Desired distance between boundaries.
+    :return: Offsets strictly between `start` and `stop`, each just after a newline.
+    """
+
+    boundaries: List[int] = []
+    with open(file_path, "rb") as file:
+        target: int = start + step
+        while target < stop:
+            file.seek(target - 1)
+            file.readline()
+            boundary: int = file.tell()
+            if boundary >= stop:
+                break
+
+            boundaries.append(boundary)
+            target = boundary + step
+
+    return boundaries
+
+
+def _split(entry: Entry, split_size: int) -> List[Segment]:
+    segments: List[Segment] = []
+    for start, stop in _gaps(entry):
+        edges: List[int] = [start]
+        end: int = entry.size if stop is None else stop
+        if entry.splittable and end - start > split_size:
+            edges.extend(
+                line_boundaries(pathlib.Path(entry.path), start, end, split_size)
+            )
+
+        stops: List[Optional[int]] = [*edges[1:], stop]
+        segments.extend(Segment(entry.path, *edge) for edge in zip(edges, stops))
+
+    return segments
+
+
+def _sized_tasks(
+    entries: Iterable[Entry], split_size: int, pack_size: int, pack_count: int
+) -> Generator[Tuple[int, Task], None, None]:
+    packed: List[Segment] = []
+    packed_size: int = 0
+    for entry in entries:
+        # Partly finished files are only processed where they are unfinished.
+        if entry.finished or entry.remaining >= pack_size:
+            for segment in _split(entry, split_size):
+                stop: int = entry.size if segment.stop is None else segment.stop
+                yield stop - segment.start, (segment,)
+
+            continue
+
+        if packed and (
+            packed_size + entry.remaining > pack_size or len(packed) >= pack_count
+        ):
+            yield packed_size, tuple(packed)
+            packed, packed_size = [], 0
+
+        packed.append(Segment(entry.path, entry.start))
+        packed_size += entry.remaining
+
+    if packed:
+        yield packed_size, tuple(packed)
+
+
+def plan(
+    entries: Iterable[Entry],
+    split_size: int,
+    pack_size: int,
+    pack_count: int,
+) -> List[Task]:
+    """
+    Divides files into tasks, largest first.
+
+    :param entries: Files to process.
+    :param split_size: Size above which splittable files are divided into
+        ranges of about this many bytes.
+    :param pack_size: Size below which files are packed together, up to this
+        many bytes per task.
+    :param pack_count: Maximum number of files packed into a task.
+    :return: Tasks ordered by decreasing size.
+    """
+
+    sized: List[Tuple[int, Task]] = list(
+        _sized_tasks(
+            sorted(entries, key=lambda item: item.remaining, reverse=True),
+            split_size,
+            pack_size,
+            pack_count,
+        )
+    )
+    sized.sort(key=lambda item: item[0], reverse=True)
+    return [task for _size, task in sized]
+
+
+def stream(
+    entries: Iterable[Entry], pack_size: int, pack_count: int
+) -> Generator[Task, None, None]:
+    """
+    Divides files into tasks as they are found, without waiting for every
+    file to order them, such as when only the first results are wanted.
+
+    Files are not split, so each is complete once its task is.
+
+    :param entries: Files to process.
+    :param pack_size: Size below which files are packed together, up to this
+        many bytes per task.
+    :param pack_count: Maximum number of files packed into a task.
+    :return: Generator of tasks in the order files are found.
+    """
+
+    whole = (entry._replace(splittable=False) for entry in entries)
+    for _size, task in _sized_tasks(whole, 0, pack_size, pack_count):
+        yield task
+
+
+class Tracker:
+    """Tracks the segments of each file to tell when the file is complete."""
+
+    def __init__(self, tasks: Iterable[Task] = ()) -> None:
+        self.remaining: Dict[str, int] = {}
+        self.failed: Set[str] = set()
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task: Task) -> None:
+        """
+        Registers a task's segments.
+
+        :param task: Task about to be processed.
+        :return: None.
+        """
+
+        for segment in task:
+            self.remaining[segment.path] = self.remaining.get(segment.path, 0) + 1
+
+    def finish(self, path: str, succeeded: bool) -> bool:
+        """
+        Records that a segment of a file has been processed.
+
+        :param path: File the segment belongs to.
+        :param succeeded: Whether the segment was processed without failing.
+        :return: Whether every segment of the file has now succeeded.
+        """
+
+        if not succeeded:
+            self.failed.add(path)
+
+        self.remaining[path] -= 1
+        return not self.remaining[path] and path not in self.failed
+
+
+__all__: Tuple[str, ...] = (
+    "Entry",
+    "Segment",
+    "Task",
+    "Tracker",
+    "line_boundaries",
+    "plan",
+    "stream",
+)
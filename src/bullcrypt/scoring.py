@@ -0,0 +1,284 @@
+"""
+Validates candidate plaintexts to separate meaningful decryptions from noise.
+"""
+
+import codecs
+import itertools
+import re
+import string
+from abc import abstractmethod
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+
+# Relative frequency (percent) of characters in English text.
+# fmt: off
+ENGLISH_FREQUENCY: Dict[str, float] = {
+    "a": 8.2, "b": 1.5, "c": 2.8, "d": 4.3, "e": 12.7, "f": 2.2, "g": 2.0,
+    "h": 6.1, "i": 7.0, "j": 0.15, "k": 0.77, "l": 4.0, "m": 2.4, "n": 6.7,
+    "o": 7.5, "p": 1.9, "q": 0.095, "r": 6.0, "s": 6.3, "t": 9.1, "u": 2.8,
+    "v": 0.98, "w": 2.4, "x": 0.15, "y": 2.0, "z": 0.074, " ": 13.0,
+}
+
+ENGLISH_BIGRAMS: Tuple[bytes, ...] = (
+    b"th", b"he", b"in", b"er", b"an", b"re", b"on", b"at", b"en", b"nd",
+    b"ti", b"es", b"or", b"te", b"of", b"ed", b"is", b"it", b"al", b"ar",
+    b"st", b"to", b"nt", b"ng", b"se", b"ha", b"as", b"ou", b"io", b"le",
+)
+
+FILE_SIGNATURES: Dict[str, Tuple[bytes, ...]] = {
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "gif": (b"GIF87a", b"GIF89a"),
+    "pdf": (b"%PDF-",),
+    "zip": (b"PK\x03\x04", b"PK\x05\x06"),
+    "gzip": (b"\x1f\x8b\x08",),
+    "bzip2": (b"BZh",),
+    "xz": (b"\xfd7zXZ\x00",),
+    "7z": (b"7z\xbc\xaf\x27\x1c",),
+    "elf": (b"\x7fELF",),
+    "sqlite": (b"SQLite format 3\x00",),
+}
+# fmt: on
+
+_PRINTABLE: bytes = string.printable.encode("ascii")
+_MAX_BATCH: int = 64
+
+
+def _english_scores() -> Tuple[float, ...]:
+    table: List[float] = [-10.0] * 256
+    for byte in _PRINTABLE:
+        table[byte] = 0.5
+
+    for character, frequency in ENGLISH_FREQUENCY.items():
+        table[ord(character)] = frequency
+        table[ord(character.upper())] = frequency
+
+    return tuple(table)
+
+
+ENGLISH_SCORES: Tuple[float, ...] = _english_scores()
+
+
+class Validator:
+    """Checks whether candidate plaintexts are plausible."""
+
+    #: Relative cost per candidate, used to run cheap checks first.
+    cost: int = 0
+
+    @abstractmethod
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        """
+        Validates a batch of candidate plaintexts.
+
+        :param candidates: Candidate plaintexts.
+        :return: Whether each candidate passed, in order.
+        """
+
+
+class PrintableValidator(Validator):
+    """Requires a minimum ratio of printable ASCII characters."""
+
+    cost = 1
+
+    def __init__(self, ratio: float = 0.95) -> None:
+        self.ratio: float = ratio
+
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        return [
+            len(c) - len(c.translate(None, _PRINTABLE)) >= self.ratio * len(c)
+            for c in candidates
+        ]
+
+
+class Utf8Validator(Validator):
+    """Requires candidates to be valid UTF-8."""
+
+    cost = 2
+
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        decoder = codecs.getdecoder("utf-8")
+        results: List[bool] = []
+        for candidate in candidates:
+            try:
+                decoder(candidate)
+                results.append(True)
+            except UnicodeDecodeError:
+                results.append(False)
+
+        return results
+
+
+class EnglishValidator(Validator):
+    """Requires a minimum English unigram and bigram score."""
+
+    cost = 4
+
+    def __init__(self, threshold: float = 5.0) -> None:
+        self.threshold: float = threshold
+
+    @classmethod
+    def unigram_scores(cls, candidates: Sequence[bytes]) -> List[float]:
+        """
+        Computes the mean character frequency score of each candidate.
+
+        :param candidates: Candidate plaintexts.
+        :return: Mean per-byte score of each candidate.
+        """
+
+        lengths: List[int] = [max(len(c), 1) for c in candidates]
+        if np is None:
+            return [
+                sum(map(ENGLISH_SCORES.__getitem__, c)) / n
+                for c, n in zip(candidates, lengths)
+            ]
+
+        # Score every candidate in a single pass over their concatenation.
+        data = np.frombuffer(b"".join(candidates), dtype=np.uint8)
+        segments = np.repeat(
+            np.arange(len(candidates)),
+            np.fromiter(map(len, candidates), dtype=np.int64),
+        )
+        totals = np.bincount(
+            segments,
+            weights=np.asarray(ENGLISH_SCORES, dtype=np.float64)[data],
+            minlength=len(candidates),
+        )
+        return (totals / np.asarray(lengths)).tolist()
+
+    @classmethod
+    def scores(cls, candidates: Sequence[bytes]) -> List[float]:
+        """
+        Computes English scores for candidates.
+
+        :param candidates: Candidate plaintexts.
+        :return: Score of each candidate; higher is more English-like.
+        """
+
+        results: List[float] = []
+        for candidate, unigram in zip(candidates, cls.unigram_scores(candidates)):
+            lowered: bytes = candidate.lower()
+            bigrams: int = sum(map(lowered.count, ENGLISH_BIGRAMS))
+            results.append(unigram + 10.0 * bigrams / max(len(candidate), 1))
+
+        return results
+
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        return [score >= self.threshold for score in self.scores(candidates)]
+
+
+class RegexValidator(Validator):
+    """Requires candidates to contain a match for a pattern."""
+
+    cost = 3
+
+    def __init__(self, pattern: Union[str, bytes], encoding: str = "utf-8") -> None:
+        if isinstance(pattern, str):
+            pattern = pattern.encode(encoding)
+
+        self.pattern: Pattern[bytes] = re.compile(pattern, re.DOTALL)
+
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        search = self.pattern.search
+        return [search(candidate) is not None for candidate in candidates]
+
+
+class MagicValidator(Validator):
+    """Requires candidates to start with a known file signature."""
+
+    def __init__(self, kinds: Optional[Iterable[str]] = None) -> None:
+        self.signatures: Tuple[bytes, ...] = tuple(
+            itertools.chain.from_iterable(
+                FILE_SIGNATURES[kind] for kind in (kinds or FILE_SIGNATURES)
+            )
+        )
+
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        return [candidate.startswith(self.signatures) for candidate in candidates]
+
+
+class Pipeline(Validator):
+    """Requires candidates to pass every validator, cheapest first."""
+
+    def __init__(self, validators: Sequence[Validator]) -> None:
+        self.validators: Tuple[Validator, ...] = tuple(
+            sorted(validators, key=lambda validator: validator.cost)
+        )
+
+    def check(self, candidates: Sequence[bytes]) -> List[bool]:
+        results: List[bool] = [True] * len(candidates)
+        remaining: List[int] = list(range(len(candidates)))
+
+        for validator in self.validators:
+            if not remaining:
+                break
+
+            passed = validator.check([candidates[i] for i in remaining])
+            for index, valid in zip(remaining, passed):
+                results[index] = valid
+
+            remaining = [index for index in remaining if results[index]]
+
+        return results
+
+
+def select(
+    candidates: Iterable[Tuple[int, bytes]], validator: Optional[Validator]
+) -> Optional[Tuple[int, bytes]]:
+    """
+    Finds the first candidate passing validation.
+
+    Candidates are consumed lazily in geometrically growing batches, so the
+    first candidate is checked immediately and the key search can stop as
+    soon as a candidate passes while later batches still amortize validation.
+
+    :param candidates: Key indices and candidate plaintexts.
+    :param validator: Validator to apply, or None to accept the first candidate.
+    :return: The first passing key index and plaintext, or None.
+    """
+
+    iterator = iter(candidates)
+    if validator is None:
+        return next(iterator, None)
+
+    size: int = 1
+    while True:
+        batch: List[Tuple[int, bytes]] = list(itertools.islice(iterator, size))
+        if not batch:
+            return None
+
+        plaintexts: List[bytes] = [plaintext for _index, plaintext in batch]
+        for candidate, valid in zip(batch, validator.check(plaintexts)):
+            if valid:
+                return candidate
+
+        size = min(size * 2, _MAX_BATCH)
+
+
+__all__: Tuple[str, ...] = (
+    "ENGLISH_BIGRAMS",
+    "ENGLISH_FREQUENCY",
+    "ENGLISH_SCORES",
+    "EnglishValidator",
+    "FILE_SIGNATURES",
+    "MagicValidator",
+    "Pipeline",
+    "PrintableValidator",
+    "RegexValidator",
+    "Utf8Validator",
+    "Validator",
+    "select",
+)
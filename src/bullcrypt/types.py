@@ -11,10 +11,14 @@ from typing import (
     Callable,
     Generator,
     Any,
+    TYPE_CHECKING,
 )
 
 from typing import TypeAlias
 
+if TYPE_CHECKING:
+    from . import scoring
+
 # fmt: off
 FileParsingMode: TypeAlias = Union[
     Literal["line"], Literal["chunked"], Literal["raw"]
@@ -25,6 +29,10 @@ PlaintextEncoding: TypeAlias = Union[
     Literal["base32hex"], Literal["base16"], Literal["plain"]
 ]
 
+ExecutionBackend: TypeAlias = Union[
+    Literal["auto"], Literal["thread"], Literal["process"]
+]
+
 DecipherProcessingGroup: TypeAlias = Callable[
     [], Generator[Callable[[], bytes], None, None]
 ]
@@ -39,10 +47,49 @@ class Options(NamedTuple):
     encoding: str = "utf-8"
     recursive: bool = False
     algorithm_options: Optional[Any] = None
+    validators: Tuple["scoring.Validator", ...] = ()
+    jobs: int = 1
+    checkpoint: Optional[str] = None
+    resume: bool = False
+    sniff: bool = True
+    backend: ExecutionBackend = "auto"
+    watch: Optional[float] = None
+    limit: Optional[int] = None
+    max_memory: Optional[int] = None
+
+
+class DecryptionResult:
+    """A decrypted payload and the key that decrypted it."""
+
+    __slots__ = ("index", "key_index", "plaintext", "algorithm")
+
+    def __init__(
+        self,
+        index: int,
+        key_index: int,
+        plaintext: bytes,
+        algorithm: Optional[str] = None,
+    ) -> None:
+        self.index: int = index
+        self.key_index: int = key_index
+        self.plaintext: bytes = plaintext
+        # Set when several algorithms were tried, naming the one that matched.
+        self.algorithm: Optional[str] = algorithm
+
+    def __repr__(self) -> str:
+        algorithm: str = (
+            "" if self.algorithm is None else f", algorithm={self.algorithm!r}"
+        )
+        return (
+            f"DecryptionResult(index={self.index}, key_index={self.key_index}, "
+            f"plaintext={self.plaintext!r}{algorithm})"
+        )
 
 
 __all__: Tuple[str, ...] = (
     "DecipherProcessingGroup",
+    "DecryptionResult",
+    "ExecutionBackend",
     "Options",
     "PlaintextEncoding",
     "FileParsingMode",
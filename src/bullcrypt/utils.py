@@ -3,8 +3,11 @@ General utilities
 """
 
 import base64
+import itertools
 import logging
+import os
 import pathlib
+import string
 from importlib.metadata import entry_points
 from typing import (
     Any,
@@ -17,6 +20,9 @@ from typing import (
     Optional,
     TYPE_CHECKING,
     Generator,
+    Iterable,
+    Iterator,
+    List,
 )
 
 if TYPE_CHECKING:
@@ -62,6 +68,119 @@ def get_truthy_attribute(obj: Any, options: Sequence[T], fallback: U) -> Union[T
     return fallback
 
 
+V = TypeVar("V")
+
+
+def batched(
+    iterable: Iterable[V],
+    size: int,
+    max_bytes: Optional[int] = None,
+    weigh: Callable[[V], int] = len,  # type: ignore[assignment]
+) -> Iterator[List[V]]:
+    """
+    Groups items from an iterable into lists of up to `size` items.
+
+    :param iterable: Items to group.
+    :param size: Maximum number of items per group.
+    :param max_bytes: Bytes after which a group is ended early, if any. A
+        single item larger than this forms a group by itself.
+    :param weigh: Measures the bytes an item holds.
+    :return: Iterator of groups.
+    """
+
+    iterator: Iterator[V] = iter(iterable)
+    if max_bytes is None:
+        while True:
+            batch: List[V] = list(itertools.islice(iterator, size))
+            if not batch:
+                return
+
+            yield batch
+
+    group: List[V] = []
+    weight: int = 0
+    for item in iterator:
+        group.append(item)
+        weight += weigh(item)
+        if len(group) >= size or weight >= max_bytes:
+            yield group
+            group, weight = [], 0
+
+    if group:
+        yield group
+
+
+def batch_bytes(max_memory: Optional[int], jobs: Optional[int]) -> Optional[int]:
+    """
+    Provides the bytes of ciphertext each worker may batch under a memory budget.
+
+    :param max_memory: Budget in bytes for in-flight work, if any.
+    :param jobs: Number of workers, or None for one per CPU.
+    :return: Bytes per batch, or None when unbounded.
+    """
+
+    if max_memory is None:
+        return None
+
+    # Half of each worker's share, as results may be as large as ciphertexts.
+    workers: int = jobs or os.cpu_count() or 1
+    return max(1, max_memory // (2 * workers))
+
+
+_SIZE_UNITS: Dict[str, int] = {
+    "": 1,
+    "K": 1 << 10,
+    "M": 1 << 20,
+    "G": 1 << 30,
+    "T": 1 << 40,
+}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parses a size in bytes, such as "512M" or "2G", using binary units.
+
+    :param text: A number, optionally followed by K, M, G, or T and then B.
+    :return: Number of bytes.
+    """
+
+    normalized: str = text.strip().upper()
+    if normalized.endswith("IB"):
+        normalized = normalized[:-2]
+    elif normalized.endswith("B"):
+        normalized = normalized[:-1]
+
+    unit: str = normalized[-1:] if normalized[-1:] in _SIZE_UNITS else ""
+    try:
+        value: float = float(normalized[: len(normalized) - len(unit)])
+    except ValueError:
+        raise ValueError(f"Invalid size: {text}") from None
+
+    if not 0 < value < float("inf"):
+        raise ValueError(f"Size must be a positive number: {text}")
+
+    return max(1, int(value * _SIZE_UNITS[unit]))
+
+
+def attempt_all(
+    attempts: Iterable[Callable[[], bytes]],
+) -> Generator[Tuple[int, bytes], None, None]:
+    """
+    Runs decryption attempts, skipping those that fail.
+
+    :param attempts: Callables that each attempt a decryption.
+    :return: Generator of attempt indices and their output.
+    """
+
+    for index, attempt in enumerate(attempts):
+        # noinspection PyBroadException
+        # pylint: disable=broad-exception-caught
+        try:
+            yield index, attempt()
+        except Exception:
+            logger.info("Failed decryption attempt %d", index, exc_info=True)
+
+
 DECODERS: Dict[str, Callable[[str], bytes]] = {
     "base64": base64.b64decode,
     "base64url": base64.urlsafe_b64decode,
@@ -91,36 +210,218 @@ def decode_content(
     return DECODERS[plaintext_encoding](content)
 
 
-def extract_content(
+_PADDING: bytes = b"=" + string.whitespace.encode("ascii")
+
+ALPHABETS: Dict[str, bytes] = {
+    "base64": (string.ascii_letters + string.digits + "+/").encode("ascii"),
+    "base64url": (string.ascii_letters + string.digits + "-_").encode("ascii"),
+    "base32": (string.ascii_uppercase + "234567").encode("ascii"),
+    "base32hex": (string.digits + "ABCDEFGHIJKLMNOPQRSTUV").encode("ascii"),
+    "base16": (string.digits + "ABCDEF").encode("ascii"),
+}
+
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    "base64": base64.b64encode,
+    "base64url": base64.urlsafe_b64encode,
+    "base32": base64.b32encode,
+    "base32hex": base64.b32hexencode,
+    "base16": base64.b16encode,
+}
+
+
+def decode_lines(
+    lines: Sequence[str],
+    plaintext_encoding: Optional["types.PlaintextEncoding"],
+    encoding: str,
+) -> List[Optional[bytes]]:
+    """
+    Decodes many lines, each holding one payload, logging those that fail.
+
+    :param lines: Stripped lines to decode.
+    :param plaintext_encoding: Encoding to decode using.
+    :param encoding: Encoding to use when converting from a string to bytes plainly.
+    :return: Bytes for each line, or None where a line failed to decode.
+    """
+
+    decoded: List[Optional[bytes]] = []
+    for line in lines:
+        # noinspection PyBroadException
+        # pylint: disable=broad-exception-caught
+        try:
+            decoded.append(decode_content(line, plaintext_encoding, encoding))
+        except Exception:
+            logger.exception("Failed to decode line: %s", line)
+            decoded.append(None)
+
+    return decoded
+
+
+def encode_content(
+    content: bytes,
+    plaintext_encoding: Optional["types.PlaintextEncoding"],
+    encoding: str,
+) -> str:
+    """
+    Encodes bytes as text, reversing `decode_content`.
+
+    :param content: Bytes to encode.
+    :param plaintext_encoding: Encoding to encode using.
+    :param encoding: Encoding to use when converting from bytes to a string plainly.
+    :return: Text that `decode_content` decodes to `content`.
+    """
+
+    if plaintext_encoding is None or plaintext_encoding == "plain":
+        return content.decode(encoding)
+
+    return ENCODERS[plaintext_encoding](content).decode("ascii")
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    """
+    Checks whether an encoding represents ASCII text as ASCII bytes.
+
+    :param encoding: Name of the encoding.
+    :return: Whether ASCII characters can be matched in encoded bytes.
+    """
+
+    try:
+        return "\n".encode(encoding) == b"\n"
+    except LookupError:
+        return False
+
+
+def in_alphabet(content: bytes, alphabet: bytes) -> bool:
+    """
+    Checks whether encoded text only uses an alphabet, padding, and whitespace.
+
+    :param content: ASCII-compatible encoded text.
+    :param alphabet: Characters allowed.
+    :return: Whether every byte is allowed.
+    """
+
+    return not content.translate(None, alphabet + _PADDING)
+
+
+def prefix_lines(prefix: bytes) -> List[bytes]:
+    """
+    Splits the start of a file into its non-blank lines.
+
+    :param prefix: Leading bytes of the file.
+    :return: Lines without surrounding whitespace. The last may be cut short.
+    """
+
+    return [line for line in (part.strip() for part in prefix.split(b"\n")) if line]
+
+
+def plausible_content(
+    prefix: bytes,
+    mode: "types.FileParsingMode",
+    plaintext_encoding: Optional["types.PlaintextEncoding"],
+    encoding: str,
+) -> bool:
+    """
+    Checks whether the start of a file could hold payloads for the parsing options.
+
+    Only text modes are checked against the alphabet of the plaintext
+    encoding, besides padding and whitespace. In line mode, a single such
+    line suffices, so headers and comments do not hide the payloads after
+    them; in chunked mode, every byte must belong to the alphabet.
+
+    :param prefix: Leading bytes of the file.
+    :param mode: Mode to extract using (raw, chunked, or line).
+    :param plaintext_encoding: Encoding used to decode non-plaintext strings.
+    :param encoding: Encoding of the file's text.
+    :return: Whether the file may hold payloads.
+    """
+
+    if mode == "raw" or not is_ascii_compatible(encoding):
+        return True
+
+    alphabet: Optional[bytes] = ALPHABETS.get(plaintext_encoding or "plain")
+    if alphabet is None:
+        return True
+
+    if mode == "line":
+        return any(in_alphabet(line, alphabet) for line in prefix_lines(prefix))
+
+    return in_alphabet(prefix, alphabet)
+
+
+def _extract_lines(
+    file_path: pathlib.Path, encoding: str, start: int, stop: Optional[int] = None
+) -> Generator[Tuple[int, str], None, None]:
+    if not is_ascii_compatible(encoding):
+        # Newlines cannot be found in the raw bytes, so rely on the text
+        # layer, whose positions are opaque but valid to seek to.
+        with open(file_path, "r", encoding=encoding) as text_file:
+            text_file.seek(start)
+            for line in iter(text_file.readline, ""):
+                text_position: int = text_file.tell()
+                yield text_position, line.strip()
+                # Opaque positions are only comparable for equality.
+                if text_position == stop:
+                    return
+
+        return
+
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        position: int = start
+        for raw_line in file:
+            position += len(raw_line)
+            try:
+                yield position, raw_line.decode(encoding).strip()
+            except UnicodeDecodeError:
+                logger.exception("Failed to decode line in %s", file_path)
+
+            if stop is not None and position >= stop:
+                return
+
+
+def extract_positioned_content(
     file_path: pathlib.Path,
     mode: "types.FileParsingMode",
     plaintext_encoding: Optional["types.PlaintextEncoding"],
     encoding: str,
-) -> Generator[bytes, None, None]:
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Generator[Tuple[int, bytes], None, None]:
     """
-    Extracts content from a file path.
+    Extracts content from a file path along with resumable positions.
 
-    Modes:
-    - raw: Reads the file as raw and returns the content.
-    - chunked: Joins the file's lines, reconstructing it, and decode as needed.
-    - line: Processes each line as a separate ciphertext. Otherwise, identical to "chunked".
+    Each payload is paired with the position just after it. Positions are
+    opaque: passing one back as `start` continues with the next payload, and
+    passing one as `stop` ends with its payload. For ASCII-compatible
+    encodings, line positions are byte offsets, so any line boundary may be
+    used. Files holding a single ciphertext (raw and chunked) are skipped
+    entirely for any nonzero `start` and ignore `stop`.
 
     :param file_path: Path to file for parsing.
     :param mode: Mode to extract using (raw, chunked, or line).
     :param plaintext_encoding: Encoding to decode non-plaintext strings using.
     :param encoding: Encoding to use for direct encoding from string to bytes.
-    :return: Generator of decoded bytes.
+    :param start: Position to resume from.
+    :param stop: Position to end at, or None to read to the end of the file.
+    :return: Generator of positions and decoded bytes.
     """
 
     if mode == "raw":
+        if start:
+            return
+
         with open(file_path, "rb") as file:
-            yield file.read()
+            content: bytes = file.read()
+            yield len(content), content
     elif mode == "chunked":
+        if start:
+            return
+
         # noinspection PyBroadException
         # pylint: disable=broad-exception-caught
         try:
             with open(file_path, "r", encoding=encoding) as file:
-                yield decode_content(
+                yield 1, decode_content(
                     "".join(file.read().splitlines()),
                     plaintext_encoding,
                     encoding,
@@ -131,21 +432,63 @@ def extract_content(
         # noinspection PyBroadException
         # pylint: disable=broad-exception-caught
         try:
-            with open(file_path, "r", encoding=encoding) as file:
-                for line in file:
-                    line = line.strip()
-
-                    if line:
-                        # noinspection PyBroadException
-                        # pylint: disable=broad-exception-caught
-                        try:
-                            yield decode_content(line, plaintext_encoding, encoding)
-                        except Exception:
-                            logger.exception("Failed to decode line: %s", line)
+            for position, line in _extract_lines(file_path, encoding, start, stop):
+                if line:
+                    # noinspection PyBroadException
+                    # pylint: disable=broad-exception-caught
+                    try:
+                        yield position, decode_content(
+                            line, plaintext_encoding, encoding
+                        )
+                    except Exception:
+                        logger.exception("Failed to decode line: %s", line)
         except Exception:
             logger.exception("Failed to decode file: %s", file_path)
     else:
         raise ValueError(f"Unknown mode {mode}")
 
 
-__all__: Tuple[str, ...] = ("get_algorithms", "get_truthy_attribute")
+def extract_content(
+    file_path: pathlib.Path,
+    mode: "types.FileParsingMode",
+    plaintext_encoding: Optional["types.PlaintextEncoding"],
+    encoding: str,
+) -> Generator[bytes, None, None]:
+    """
+    Extracts content from a file path.
+
+    Modes:
+    - raw: Reads the file as raw and returns the content.
+    - chunked: Joins the file's lines, reconstructing it, and decode as needed.
+    - line: Processes each line as a separate ciphertext. Otherwise, identical to "chunked".
+
+    :param file_path: Path to file for parsing.
+    :param mode: Mode to extract using (raw, chunked, or line).
+    :param plaintext_encoding: Encoding to decode non-plaintext strings using.
+    :param encoding: Encoding to use for direct encoding from string to bytes.
+    :return: Generator of decoded bytes.
+    """
+
+    for _position, content in extract_positioned_content(
+        file_path, mode, plaintext_encoding, encoding
+    ):
+        yield content
+
+
+__all__: Tuple[str, ...] = (
+    "ALPHABETS",
+    "attempt_all",
+    "batch_bytes",
+    "batched",
+    "decode_lines",
+    "encode_content",
+    "extract_content",
+    "extract_positioned_content",
+    "get_algorithms",
+    "get_truthy_attribute",
+    "in_alphabet",
+    "is_ascii_compatible",
+    "parse_size",
+    "plausible_content",
+    "prefix_lines",
+)
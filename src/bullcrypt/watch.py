@@ -0,0 +1,260 @@
+"""
+Watches files and directories, decrypting new files and appended lines.
+
+Each poll stats every watched file. Files whose size, modification time, and
+inode are unchanged are not opened. Line files are read from the offset where
+the previous poll stopped, up to their last complete line, so a line still
+being written is decrypted once finished; where positions cannot be chosen,
+such as in wide encodings, they are only read once they end with a complete
+line. Files holding a single ciphertext are decrypted again whenever they
+change. Files rejected by sniffing are sniffed again once their size changes.
+"""
+
+import logging
+import os
+import pathlib
+import sys
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Generator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+from . import checkpoint
+from . import main as _main
+
+if TYPE_CHECKING:
+    from . import algorithm, types
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+_TAIL_BLOCK: int = 64 * 1024
+
+
+class FileState(NamedTuple):
+    """What is known about a watched file as of the last poll."""
+
+    inode: int
+    size: int
+    mtime_ns: int
+    position: int = 0
+
+
+def _last_boundary(file_path: pathlib.Path, start: int, size: int) -> int:
+    with open(file_path, "rb") as file:
+        end: int = size
+        while end > start:
+            offset: int = max(start, end - _TAIL_BLOCK)
+            file.seek(offset)
+            index: int = file.read(end - offset).rfind(b"\n")
+            if index >= 0:
+                return offset + index + 1
+
+            end = offset
+
+    return start
+
+
+def _ends_with_line(file_path: pathlib.Path, size: int, encoding: str) -> bool:
+    # Encoded after another newline so that no byte order mark is included.
+    newline: bytes = "\n\n".encode(encoding)[len("\n".encode(encoding)) :]
+    if size < len(newline):
+        return False
+
+    with open(file_path, "rb") as file:
+        file.seek(size - len(newline))
+        return file.read(len(newline)) == newline
+
+
+class Watcher:
+    """Decrypts what is new in watched files each time it polls."""
+
+    def __init__(
+        self,
+        handler: Type["algorithm.Algorithm"],
+        files: Sequence[str],
+        options: "types.Options",
+        progress: Optional[checkpoint.Checkpoint] = None,
+    ) -> None:
+        self.handler: Type["algorithm.Algorithm"] = handler
+        self.files: Sequence[str] = files
+        self.options: "types.Options" = options
+        self.progress: Optional[checkpoint.Checkpoint] = progress
+        self.state: "algorithm.State" = handler.setup(options)
+        self.sniffer: _main._Sniffer = _main._Sniffer(handler, options)
+        self.known: Dict[str, FileState] = {}
+        self.rejected: Dict[str, Tuple[int, int]] = {}
+
+    def _scan(self) -> Generator[Tuple[str, os.stat_result, bool], None, None]:
+        for file in self.files:
+            try:
+                file_stat: os.stat_result = os.stat(file)
+            except OSError:
+                continue
+
+            if not os.path.isdir(file):
+                yield file, file_stat, False
+            elif self.options.recursive:
+                yield from self._scan_directory(file)
+
+    def _scan_directory(
+        self, directory: str
+    ) -> Generator[Tuple[str, os.stat_result, bool], None, None]:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._scan_directory(entry.path)
+                elif entry.is_file():
+                    yield entry.path, entry.stat(), True
+            except OSError:
+                continue
+
+    def _sniff(self, path: str, file_stat: os.stat_result) -> bool:
+        # Empty files are sniffed once they have content to judge, and
+        # rejected ones again once they grow or are replaced.
+        identity: Tuple[int, int] = (file_stat.st_ino, file_stat.st_size)
+        if not file_stat.st_size or self.rejected.get(path) == identity:
+            return False
+
+        if self.sniffer(pathlib.Path(path)):
+            self.rejected.pop(path, None)
+            return True
+
+        self.rejected[path] = identity
+        return False
+
+    def _initial(self, path: str, file_stat: os.stat_result) -> FileState:
+        position: int = 0
+        if self.progress is not None:
+            if self.progress.is_completed(path):
+                # Completed files are only processed again once they change.
+                return FileState(
+                    file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+                )
+
+            position = self.progress.position(path)
+
+        return FileState(file_stat.st_ino, 0, 0, position)
+
+    def _decrypt(
+        self, path: str, previous: FileState, current: FileState
+    ) -> Generator[Tuple[pathlib.Path, "types.DecryptionResult"], None, None]:
+        file_path: pathlib.Path = pathlib.Path(path)
+        if self.options.mode != "line":
+            yield from _main._decrypt_file(self.handler, file_path, self.state)
+            if self.progress is not None:
+                self.progress.record_completed(path)
+
+            return
+
+        start: int = previous.position
+        if current.inode != previous.inode or current.size < start:
+            # Replaced or truncated, so read it anew.
+            start = 0
+
+        def advance(position: int) -> None:
+            self.known[path] = self.known[path]._replace(position=position)
+            if self.progress is not None:
+                self.progress.record_position(path, position)
+
+        self.known[path] = current._replace(position=start)
+        if not self.handler.splittable(self.options):
+            # No stop can be given, so a line still being written is left
+            # until the file ends with it complete.
+            if _ends_with_line(file_path, current.size, self.options.encoding):
+                yield from _main._decrypt_file(
+                    self.handler, file_path, self.state, start, advance
+                )
+
+            return
+
+        stop: int = _last_boundary(file_path, start, current.size)
+        if stop > start:
+            yield from _main._decrypt_file(
+                self.handler, file_path, self.state, start, advance, stop
+            )
+            advance(stop)
+
+    def poll(
+        self,
+    ) -> Generator[Tuple[pathlib.Path, "types.DecryptionResult"], None, None]:
+        """
+        Decrypts files created, and lines appended, since the last poll.
+
+        :return: Generator of file paths and decryption results.
+        """
+
+        seen: Dict[str, FileState] = {}
+        for path, file_stat, found in self._scan():
+            previous: Optional[FileState] = self.known.get(path)
+            if previous is None:
+                if found and not self._sniff(path, file_stat):
+                    continue
+
+                previous = self._initial(path, file_stat)
+
+            current: FileState = FileState(
+                file_stat.st_ino,
+                file_stat.st_size,
+                file_stat.st_mtime_ns,
+                previous.position,
+            )
+            self.known[path] = previous
+            if current != previous:
+                # pylint: disable=broad-exception-caught
+                # noinspection PyBroadException
+                try:
+                    yield from self._decrypt(path, previous, current)
+                except Exception:
+                    logger.exception("Failed to process file: %s", path)
+
+                self.known[path] = self.known[path]._replace(
+                    inode=current.inode, size=current.size, mtime_ns=current.mtime_ns
+                )
+
+            seen[path] = self.known[path]
+
+        # Forget deleted files, so ones created in their place are read anew.
+        self.known = seen
+
+    def run(self, interval: float, stop: Optional[threading.Event] = None) -> None:
+        """
+        Polls until interrupted or the result limit is reached, printing
+        results as they are found.
+
+        :param interval: Seconds to wait between polls.
+        :param stop: Event that ends watching once set.
+        :return: None.
+        """
+
+        stop = stop or threading.Event()
+        limit = _main._Limit(self.options.limit)
+        try:
+            while True:
+                for result in self.poll():
+                    limit.report(result)
+                    if limit.reached:
+                        break
+
+                sys.stdout.flush()
+                if limit.reached or stop.wait(interval):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.sniffer.report()
+
+
+__all__: Tuple[str, ...] = ("FileState", "Watcher")
@@ -0,0 +1,246 @@
+import argparse
+import io
+import pathlib
+import pickle
+from unittest import mock
+
+import pytest
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import bullcrypt.main
+from bullcrypt import algorithm, types
+from bullcrypt.algorithm import aes
+
+KEY: bytes = bytes(range(16))
+WRONG_KEY: bytes = bytes(16)
+
+
+def _cbc(plaintext: bytes, key: bytes = KEY, iv: bytes = b"\x01" * 16) -> bytes:
+    padder = padding.PKCS7(128).padder()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    padded: bytes = padder.update(plaintext) + padder.finalize()
+    return iv + encryptor.update(padded) + encryptor.finalize()
+
+
+def _gcm(plaintext: bytes, key: bytes = KEY, nonce: bytes = b"\x02" * 12) -> bytes:
+    return nonce + AESGCM(key).encrypt(nonce, plaintext, None)
+
+
+def _options(handler, *arguments: str) -> types.Options:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    handler.register_args("cipher", parser)
+    return types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options=handler.extract_args("cipher", parser.parse_args(arguments)),
+    )
+
+
+@pytest.mark.parametrize(
+    "plaintext", [b"", b"short", b"exactly sixteen!", b"spans several blocks " * 5]
+)
+def test_cbc_decrypt(plaintext: bytes):
+    context = aes.AesCbc.prepare(KEY)
+    ciphertext: bytes = _cbc(plaintext)
+
+    assert aes.AesCbc.decrypt_with(context, ciphertext[:16], ciphertext[16:], b"") == (
+        plaintext
+    )
+
+
+def test_cbc_padding_reject():
+    context = aes.AesCbc.prepare(KEY)
+    ciphertext: bytes = _cbc(b"plaintext")
+
+    assert aes.AesCbc.decrypt_with(context, ciphertext[:16], b"", b"") is None
+    assert aes.AesCbc.decrypt_with(context, ciphertext[:16], b"x" * 17, b"") is None
+
+    # An IV equal to the decrypted block zeroes it, which is invalid padding.
+    iv: bytes = aes.AesCbc.prepare(KEY).update(ciphertext[16:])
+    assert aes.AesCbc.decrypt_with(context, iv, ciphertext[16:], b"") is None
+
+
+def test_cbc_batch_key_trials():
+    options = _options(
+        aes.AesCbc, f"--cipher.key={WRONG_KEY.hex()}", f"--cipher.key={KEY.hex()}"
+    )
+    state = aes.AesCbc.setup(options)
+    payloads = [_cbc(b"first plaintext"), b"too short", _cbc(b"second", WRONG_KEY)]
+
+    with mock.patch.object(
+        aes.AesCbc, "prepare", side_effect=aes.AesCbc.prepare
+    ) as prepare:
+        restored = pickle.loads(pickle.dumps(state))
+
+    results = aes.AesCbc.decrypt_batch(restored, payloads)
+
+    # Keys are prepared once per worker, not per payload.
+    assert prepare.call_count == 2
+    assert [(r.index, r.key_index, r.plaintext) for r in results] == [
+        (0, 1, b"first plaintext"),
+        (2, 0, b"second"),
+    ]
+
+
+def test_gcm_batch_key_trials():
+    options = _options(
+        aes.AesGcm, f"--cipher.key={WRONG_KEY.hex()}", f"--cipher.key={KEY.hex()}"
+    )
+    state = aes.AesGcm.setup(options)
+    payloads = [_gcm(b"first"), _gcm(b"second")[:-1] + b"\x00", _gcm(b"", WRONG_KEY)]
+
+    results = aes.AesGcm.decrypt_batch(state, payloads)
+
+    assert [(r.index, r.key_index, r.plaintext) for r in results] == [
+        (0, 1, b"first"),
+        (2, 0, b""),
+    ]
+
+
+def test_gcm_layout():
+    nonce: bytes = b"\x03" * 12
+    sealed: bytes = AESGCM(KEY).encrypt(nonce, b"tag first", None)
+    # Nonce, then tag, then ciphertext.
+    payload: bytes = nonce + sealed[-16:] + sealed[:-16]
+    options = _options(
+        aes.AesGcm, f"--cipher.key={KEY.hex()}", "--cipher.tag-offset=12"
+    )
+
+    results = aes.AesGcm.decrypt_batch(aes.AesGcm.setup(options), [payload])
+
+    assert [r.plaintext for r in results] == [b"tag first"]
+    assert aes.AesGcm.plausible(payload, options)
+    assert not aes.AesGcm.plausible(payload[:27], options)
+
+
+def test_cbc_trailing_iv():
+    ciphertext: bytes = _cbc(b"iv last")
+    options = _options(
+        aes.AesCbc, f"--cipher.key={KEY.hex()}", "--cipher.nonce-offset=-16"
+    )
+
+    results = aes.AesCbc.decrypt_batch(
+        aes.AesCbc.setup(options), [ciphertext[16:] + ciphertext[:16]]
+    )
+
+    assert [r.plaintext for r in results] == [b"iv last"]
+
+
+def test_header_layout():
+    header: bytes = b"HDR!"
+    cbc = _options(aes.AesCbc, f"--cipher.key={KEY.hex()}", "--cipher.nonce-offset=4")
+    gcm = _options(aes.AesGcm, f"--cipher.key={KEY.hex()}", "--cipher.nonce-offset=4")
+
+    assert [
+        r.plaintext
+        for r in aes.AesCbc.decrypt_batch(
+            aes.AesCbc.setup(cbc), [header + _cbc(b"after a header")]
+        )
+    ] == [b"after a header"]
+    assert [
+        r.plaintext
+        for r in aes.AesGcm.decrypt_batch(
+            aes.AesGcm.setup(gcm), [header + _gcm(b"after a header")]
+        )
+    ] == [b"after a header"]
+
+
+def test_ciphertext_offset():
+    ciphertext: bytes = _cbc(b"iv last")
+    options = _options(
+        aes.AesCbc,
+        f"--cipher.key={KEY.hex()}",
+        "--cipher.nonce-offset=-16",
+        "--cipher.ciphertext-offset=2",
+    )
+
+    results = aes.AesCbc.decrypt_batch(
+        aes.AesCbc.setup(options), [b"v1" + ciphertext[16:] + ciphertext[:16]]
+    )
+
+    assert [r.plaintext for r in results] == [b"iv last"]
+
+
+def test_cbc_validator():
+    binary: bytes = bytes(range(256))
+    single = _options(aes.AesCbc, f"--cipher.key={KEY.hex()}")
+    several = _options(
+        aes.AesCbc, f"--cipher.key={WRONG_KEY.hex()}", f"--cipher.key={KEY.hex()}"
+    )
+
+    # A single key's plaintext is kept even when binary.
+    assert aes.AesCbc.validator(single) is None
+    assert [
+        r.plaintext
+        for r in aes.AesCbc.decrypt_batch(aes.AesCbc.setup(single), [_cbc(binary)])
+    ] == [binary]
+
+    # Several keys default to printable text, even once split across workers.
+    assert aes.AesCbc.validator(aes.AesCbc.restrict_keys(several, 1, 2)) is not None
+    assert not aes.AesCbc.decrypt_batch(aes.AesCbc.setup(several), [_cbc(binary)])
+
+    assert (
+        aes.AesCbc.validator(types.Options(mode="raw", plaintext_encoding=None)) is None
+    )
+
+
+def test_aes_raw(tmp_path: pathlib.Path):
+    (tmp_path / "cbc").write_bytes(_cbc(b"flag{cbc}"))
+    (tmp_path / "gcm").write_bytes(_gcm(b"flag{gcm}"))
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        for name in ("cbc", "gcm"):
+            bullcrypt.main.main(
+                [
+                    "--raw",
+                    f"--aes-{name}.key={KEY.hex()}",
+                    f"aes-{name}",
+                    str(tmp_path / name),
+                ]
+            )
+
+    result: str = mock_stdout.getvalue()
+    assert "flag{cbc}" in result and "flag{gcm}" in result
+
+
+@pytest.mark.parametrize(
+    "arguments,message",
+    [
+        ([], "At least one AES-GCM key is required."),
+        (
+            ["--cipher.key=abcd"],
+            "AES-GCM keys must be 16, 24, 32 bytes, encoded as hex or base64.",
+        ),
+    ],
+)
+def test_invalid_args(arguments: list, message: str):
+    with pytest.raises(ValueError) as e:
+        _options(aes.AesGcm, *arguments)
+
+    assert e.value.args[0] == message
+
+
+def test_invalid_options():
+    options = types.Options(mode="raw", plaintext_encoding=None)
+
+    with pytest.raises(ValueError):
+        aes.AesGcm.setup(options)
+
+    with pytest.raises(ValueError):
+        aes.AesGcm.decrypt_batch(algorithm.State(options, None), [])
+
+    assert aes.AesGcm.key_count(options) is None
+    assert aes.AesGcm.restrict_keys(options, 0, 1) is options
+
+
+def test_key_space():
+    options = _options(
+        aes.AesGcm, f"--cipher.key={WRONG_KEY.hex()}", f"--cipher.key={KEY.hex()}"
+    )
+    restricted = aes.AesGcm.restrict_keys(options, 1, 2)
+
+    assert aes.AesGcm.key_count(options) == 2
+    assert restricted.algorithm_options["key"] == [KEY]
+    assert options.algorithm_options["key"] == [WRONG_KEY, KEY]
@@ -1,4 +1,6 @@
 import argparse
+import pickle
+from typing import Callable, Generator
 
 from bullcrypt import algorithm, types
 
@@ -23,3 +25,55 @@ def test_register_args() -> None:
 
 def test_extract_args() -> None:
     assert algorithm.Algorithm.extract_args("algorithm", argparse.Namespace()) is None
+
+
+def test_v1_compatibility() -> None:
+    class LegacyAlgorithm(algorithm.Algorithm):
+        @classmethod
+        def _decryption_group(
+            cls, payload: bytes, options: "types.Options"
+        ) -> Generator[Callable[[], bytes], None, None]:
+            def fail() -> bytes:
+                raise ValueError("Wrong key")
+
+            yield fail
+            yield lambda: payload.upper()
+
+    options = types.Options(mode="raw", plaintext_encoding=None)
+    results = LegacyAlgorithm.decrypt_batch(
+        LegacyAlgorithm.setup(options), [b"a", b"b"]
+    )
+
+    assert [(r.index, r.key_index, r.plaintext) for r in results] == [
+        (0, 1, b"A"),
+        (1, 1, b"B"),
+    ]
+
+
+def test_decryption_result_pickle() -> None:
+    result = types.DecryptionResult(1, 2, b"plaintext")
+    restored = pickle.loads(pickle.dumps(result))
+
+    assert (restored.index, restored.key_index, restored.plaintext) == (
+        1,
+        2,
+        b"plaintext",
+    )
+    assert repr(restored) == (
+        "DecryptionResult(index=1, key_index=2, plaintext=b'plaintext')"
+    )
+    assert not hasattr(restored, "__dict__")
+
+
+def test_key_space() -> None:
+    options = types.Options(mode="raw", plaintext_encoding=None)
+
+    assert algorithm.Algorithm.key_count(options) is None
+    assert algorithm.Algorithm.restrict_keys(options, 0, 1) is options
+
+
+def test_cost_hints() -> None:
+    options = types.Options(mode="raw", plaintext_encoding=None)
+
+    assert algorithm.Algorithm.cost(options) == 1
+    assert algorithm.Algorithm.plausible(b"", options)
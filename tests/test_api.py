@@ -0,0 +1,32 @@
+from cryptography.fernet import Fernet as _Fernet
+
+import bullcrypt
+from bullcrypt import api, types
+from bullcrypt.algorithm import fernet
+
+KEYS = [_Fernet.generate_key().decode() for _ in range(2)]
+OPTIONS = types.Options(
+    mode="raw", plaintext_encoding=None, algorithm_options={"key": KEYS}
+)
+
+
+def test_decrypt_buffers():
+    token: bytes = _Fernet(KEYS[1]).encrypt(b"secret")
+    buffers = [token, bytearray(token), memoryview(token), b"invalid"]
+
+    results = bullcrypt.decrypt(buffers, "fernet", OPTIONS)
+    assert len(results) == 4
+    assert results.key_indices.tolist() == [1, 1, 1, api.NO_MATCH]
+    assert list(results) == [(1, b"secret")] * 3 + [None]
+    assert list(results.matched()) == [(index, 1, b"secret") for index in range(3)]
+    assert repr(results).startswith("Results([(1, b'secret')")
+
+
+def test_decryptor_batches():
+    tokens = [_Fernet(KEYS[index % 2]).encrypt(b"%d" % index) for index in range(5)]
+
+    decryptor = bullcrypt.Decryptor(fernet.Fernet, OPTIONS, batch_size=2)
+    results = decryptor.decrypt(iter(tokens))
+    assert results.key_indices.tolist() == [0, 1, 0, 1, 0]
+    assert results.plaintexts == [b"0", b"1", b"2", b"3", b"4"]
+    assert len(decryptor.decrypt([])) == 0
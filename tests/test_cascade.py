@@ -0,0 +1,255 @@
+import argparse
+import io
+import pathlib
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from cryptography.fernet import Fernet as _Fernet
+
+import bullcrypt.main
+from bullcrypt import types
+from bullcrypt.algorithm import cascade, fernet, xor
+
+KEY: bytes = _Fernet.generate_key()
+PLAINTEXT: bytes = (
+    b"It was the best of times, it was the worst of times, it was the age of "
+    b"wisdom, it was the age of foolishness, it was the epoch of belief, it "
+    b"was the epoch of incredulity, it was the season of Light, it was the "
+    b"season of Darkness, it was the spring of hope, it was the winter of "
+    b"despair, we had everything before us, we had nothing before us."
+)
+
+
+def _options(**algorithm_options) -> types.Options:
+    return types.Options(
+        mode="raw", plaintext_encoding=None, algorithm_options=algorithm_options
+    )
+
+
+def _arguments(*arguments: str) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument("--encoding", default="utf-8")
+    fernet.Fernet.register_args("fernet", parser)
+    xor.Xor.register_args("xor", parser)
+    cascade.Cascade.register_args("any", parser)
+    return parser.parse_args(arguments)
+
+
+def test_algorithms():
+    names = [name for name, _handler in cascade._algorithms()]
+
+    assert "fernet" in names and "xor" in names
+    assert "any" not in names
+
+
+def test_cascade_raw(tmp_path: pathlib.Path):
+    (tmp_path / "fernet").write_bytes(_Fernet(KEY).encrypt(b"fernet plaintext"))
+    (tmp_path / "xor").write_bytes(xor.Xor.decrypt_one(PLAINTEXT, b"bullcrypt"))
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            [
+                "--raw",
+                "--recursive",
+                f"--fernet.key={KEY.decode()}",
+                "any",
+                "--any.recover",
+                str(tmp_path),
+            ]
+        )
+
+    result: str = mock_stdout.getvalue()
+    assert f"{tmp_path / 'fernet'} -> fernet: b'fernet plaintext'" in result
+    assert f"{tmp_path / 'xor'} -> xor: " in result
+    assert "it was the age of wisdom" in result
+
+
+def test_cost_order():
+    options = _options(
+        fernet=fernet.Fernet.extract_args(
+            "fernet", _arguments(f"--fernet.key={KEY.decode()}")
+        ),
+        xor=xor.Xor.extract_args("xor", _arguments()),
+    )
+    state = cascade.Cascade.setup(options)
+
+    # A single Fernet key is cheaper than recovering XOR keys.
+    assert [name for name, _handler, _state in state.algorithms] == ["fernet", "xor"]
+    assert cascade.Cascade.cost(options) == 1 + 40 * 3
+    assert xor.Xor.cost(_options(**{"key": [b"a", b"b"]})) == 2
+    assert xor.Xor.cost(options._replace(algorithm_options=None)) == 1
+
+
+def test_decrypt_batch():
+    options = _options(
+        fernet=fernet.Fernet.extract_args(
+            "fernet", _arguments(f"--fernet.key={KEY.decode()}")
+        ),
+        xor=xor.Xor.extract_args("xor", _arguments("--xor.key=1337")),
+    )
+    state = cascade.Cascade.setup(options)
+    payloads = [
+        xor.Xor.decrypt_one(b"hello there", b"\x13\x37"),
+        _Fernet(KEY).encrypt(b"token"),
+        b"",
+    ]
+
+    with mock.patch.object(
+        fernet.Fernet, "decrypt_batch", wraps=fernet.Fernet.decrypt_batch
+    ) as decrypt_batch:
+        results = cascade.Cascade.decrypt_batch(state, payloads)
+
+    # Only the payload shaped like a token reaches Fernet.
+    assert decrypt_batch.call_args.args[1] == [payloads[1]]
+    assert [(r.index, r.key_index, r.plaintext, r.algorithm) for r in results] == [
+        (0, 0, b"hello there", "xor"),
+        (1, 0, b"token", "fernet"),
+    ]
+    assert repr(results[1]) == (
+        "DecryptionResult(index=1, key_index=0, plaintext=b'token', algorithm='fernet')"
+    )
+
+
+def test_sniff():
+    options = _options(
+        fernet=fernet.Fernet.extract_args(
+            "fernet", _arguments(f"--fernet.key={KEY.decode()}")
+        )
+    )
+
+    assert cascade.Cascade.sniff(b"gAAAAA", options)
+    assert not cascade.Cascade.sniff(b"\x00\x01", options)
+
+
+def test_decrypt_file(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "token"
+    test_file.write_bytes(_Fernet(KEY).encrypt(b"streamed"))
+    fernet_options = fernet.Fernet.extract_args(
+        "fernet",
+        _arguments(
+            f"--fernet.key={KEY.decode()}",
+            f"--fernet.output-dir={tmp_path / 'out'}",
+            "--fernet.stream-size=1",
+        ),
+    )
+    (tmp_path / "out").mkdir()
+    state = cascade.Cascade.setup(_options(fernet=fernet_options))
+
+    results = cascade.Cascade.decrypt_file(state, test_file)
+
+    assert results is not None and results[0].algorithm == "fernet"
+    assert (tmp_path / "out" / "token").read_bytes() == b"streamed"
+
+    # Streamed but unmatched, so not read again in full.
+    test_file.write_bytes(b"not a token" * 20)
+    assert cascade.Cascade.decrypt_file(state, test_file) == []
+
+    unstreamed = cascade.Cascade.setup(
+        _options(fernet={**fernet_options, "output_dir": None})
+    )
+    assert cascade.Cascade.decrypt_file(unstreamed, test_file) is None
+
+
+def test_rekey(tmp_path: pathlib.Path):
+    new_key: bytes = _Fernet.generate_key()
+    test_file: pathlib.Path = tmp_path / "tokens"
+    xored: bytes = xor.Xor.decrypt_one(b"unrelated", b"\x42").hex().encode()
+    test_file.write_bytes(_Fernet(KEY).encrypt(b"secret") + b"\n" + xored + b"\n")
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            [
+                "--line",
+                "--plain",
+                f"--fernet.key={KEY.decode()}",
+                f"--fernet.rekey={new_key.decode()}",
+                "any",
+                str(test_file),
+            ]
+        )
+
+    # Tokens are rewritten rather than their plaintext printed.
+    assert "secret" not in mock_stdout.getvalue()
+    assert "rewrote 1 of 2" in mock_stdout.getvalue()
+    token, rest = test_file.read_bytes().split(b"\n", 1)
+    assert _Fernet(new_key).decrypt(token) == b"secret" and rest == xored + b"\n"
+
+    options = _options(
+        fernet=fernet.Fernet.extract_args(
+            "fernet",
+            _arguments(
+                f"--fernet.key={KEY.decode()}", f"--fernet.rekey={new_key.decode()}"
+            ),
+        ),
+        xor=xor.Xor.extract_args("xor", _arguments()),
+    )
+    (replacement,) = cascade.Cascade.rewrite_batch(
+        cascade.Cascade.setup(options), [_Fernet(KEY).encrypt(b"again")]
+    )
+    assert cascade.Cascade.rewrites(options)
+    assert replacement is not None
+    assert _Fernet(new_key).decrypt(replacement) == b"again"
+
+    with pytest.raises(ValueError):
+        cascade.Cascade.rewrite_batch(xor.Xor.setup(_options()), [])
+
+
+def test_extract_args():
+    # Fernet requires a key and XOR key recovery must be asked for.
+    with pytest.raises(ValueError) as e:
+        cascade.Cascade.extract_args("any", _arguments())
+
+    assert e.value.args[0].startswith("No algorithm could be configured for any")
+
+    algorithm_options = cascade.Cascade.extract_args("any", _arguments("--any.recover"))
+    assert algorithm_options is not None and list(algorithm_options) == ["xor"]
+
+    algorithm_options = cascade.Cascade.extract_args(
+        "any", _arguments(f"--fernet.key={KEY.decode()}", "--xor.key=1337")
+    )
+    assert algorithm_options is not None
+    assert list(algorithm_options) == ["fernet", "xor"]
+
+    with mock.patch.object(xor, "np", None):
+        with pytest.raises(ValueError):
+            cascade.Cascade.extract_args("any", _arguments("--any.recover"))
+
+
+def test_unmatched_tokens(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "tokens.txt"
+    tokens: list = [_Fernet(_Fernet.generate_key()).encrypt(b"other") for _ in range(5)]
+    test_file.write_bytes(b"\n".join(tokens) + b"\n")
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            ["--line", "--plain", "any", f"--fernet.key={KEY.decode()}", str(test_file)]
+        )
+
+    # Tokens under other keys are not mistaken for XOR ciphertexts.
+    assert " -> " not in mock_stdout.getvalue()
+
+
+def test_invalid_state():
+    state = xor.Xor.setup(_options())
+
+    with pytest.raises(ValueError):
+        cascade.Cascade.decrypt_batch(state, [])
+
+    with pytest.raises(ValueError):
+        cascade.Cascade.decrypt_file(state, pathlib.Path("missing"))
+
+    with pytest.raises(ValueError):
+        cascade.Cascade.setup(types.Options(mode="raw", plaintext_encoding=None))
+
+
+def test_plausible():
+    token: bytes = _Fernet(KEY).encrypt(b"")
+
+    assert fernet.Fernet.plausible(token + b"\n", _options())
+    assert not fernet.Fernet.plausible(token[:-4], _options())
+    assert not fernet.Fernet.plausible(b"hA" + token[2:], _options())
+    assert not fernet.Fernet.plausible(token[:-1] + b"+", _options())
+    assert not xor.Xor.plausible(b"", _options())
@@ -0,0 +1,86 @@
+import io
+import os
+import pathlib
+from unittest import mock
+
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+
+import bullcrypt.main
+from bullcrypt import types
+from bullcrypt.algorithm import chacha20
+
+KEY: bytes = os.urandom(32)
+
+
+def test_chacha20_raw(tmp_path: pathlib.Path):
+    nonce: bytes = os.urandom(12)
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(
+        nonce + ChaCha20Poly1305(KEY).encrypt(nonce, b"flag{chacha}", None)
+    )
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            [
+                "--raw",
+                f"--chacha20-poly1305.key={os.urandom(32).hex()}",
+                f"--chacha20-poly1305.key={KEY.hex()}",
+                "chacha20-poly1305",
+                str(test_file),
+            ]
+        )
+
+    assert mock_stdout.getvalue() == f"{test_file} -> b'flag{{chacha}}'\n"
+
+
+def test_header_layout():
+    nonce: bytes = os.urandom(12)
+    sealed: bytes = ChaCha20Poly1305(KEY).encrypt(nonce, b"after a header", None)
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options={"key": [KEY], "nonce_offset": 4, "tag_offset": -16},
+    )
+
+    results = chacha20.ChaCha20Poly1305.decrypt_batch(
+        chacha20.ChaCha20Poly1305.setup(options), [b"HDR!" + nonce + sealed]
+    )
+
+    assert [r.plaintext for r in results] == [b"after a header"]
+
+
+def test_first_key_matches():
+    nonce: bytes = bytes(12)
+    payload: bytes = nonce + ChaCha20Poly1305(KEY).encrypt(nonce, b"plaintext", None)
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options={
+            "key": [KEY, bytes(32)],
+            "nonce_offset": 0,
+            "tag_offset": -16,
+        },
+    )
+
+    results = chacha20.ChaCha20Poly1305.decrypt_batch(
+        chacha20.ChaCha20Poly1305.setup(options), [payload, payload]
+    )
+
+    assert [(r.index, r.key_index) for r in results] == [(0, 0), (1, 0)]
+
+
+def test_tampered():
+    nonce: bytes = bytes(12)
+    sealed: bytes = ChaCha20Poly1305(KEY).encrypt(nonce, b"plaintext", None)
+    context = chacha20.ChaCha20Poly1305.prepare(KEY)
+
+    assert (
+        chacha20.ChaCha20Poly1305.decrypt_with(
+            context, nonce, sealed[:-16], sealed[-16:]
+        )
+        == b"plaintext"
+    )
+    assert (
+        chacha20.ChaCha20Poly1305.decrypt_with(context, nonce, sealed[:-16], bytes(16))
+        is None
+    )
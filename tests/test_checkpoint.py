@@ -0,0 +1,251 @@
+import io
+import json
+import logging
+import pathlib
+from typing import Callable, Generator, List
+from unittest import mock
+
+import pytest
+
+import bullcrypt.main
+from bullcrypt import algorithm, checkpoint, distributed, types
+
+# noinspection SpellCheckingInspection
+TOKEN: bytes = (
+    b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+    b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+    b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+    b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5"
+)
+
+# noinspection SpellCheckingInspection
+KEY: str = "--fernet.key=eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE="
+
+
+class UpperAlgorithm(algorithm.Algorithm):
+    @classmethod
+    def _decryption_group(
+        cls, payload: bytes, options: "types.Options"
+    ) -> Generator[Callable[[], bytes], None, None]:
+        yield payload.upper
+
+
+class CountingAlgorithm(UpperAlgorithm):
+    @classmethod
+    def extract_content(
+        cls, file_path: pathlib.Path, options: "types.Options"
+    ) -> Generator[bytes, None, None]:
+        yield from (b"a", b"b", b"c")
+
+
+def test_journal(tmp_path: pathlib.Path):
+    path: pathlib.Path = tmp_path / "checkpoint"
+    with checkpoint.Checkpoint.open(path, ["run"]) as progress:
+        progress.record_position("a", 10)
+        progress.record_completed("b")
+        progress.record_task(3)
+        progress.record_segment("a", 20, 30)
+        progress.record_segment("c", 0, None)
+
+    with pytest.raises(ValueError):
+        progress.record_task(4)
+
+    with open(path, "a", encoding="utf-8") as journal:
+        journal.write('["position", "a", 2')
+
+    resumed = checkpoint.Checkpoint.open(path, ["run"], resume=True)
+    assert resumed.position("a") == 10
+    assert resumed.position("b") == 0
+    assert resumed.is_completed("b")
+    assert not resumed.is_completed("a")
+    assert resumed.tasks == {3}
+    assert resumed.finished_segments("a") == ((20, 30),)
+    assert resumed.finished_segments("b") == ()
+    resumed.record_completed("a")
+    resumed.close()
+    resumed.close()
+
+    # Resuming compacts the journal and drops the truncated record.
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        ["run", ["run"]],
+        ["done", "b"],
+        ["position", "a", 10],
+        ["segment", "a", 20, 30],
+        ["segment", "c", 0, None],
+        ["task", 3],
+        ["done", "a"],
+    ]
+
+    with pytest.raises(ValueError):
+        checkpoint.Checkpoint.open(path, ["other run"], resume=True)
+
+    with pytest.raises(ValueError):
+        checkpoint.Checkpoint.open(tmp_path / "missing", ["run"], resume=True)
+
+    path.write_text('["run", ["run"]\n["done", "a"]\n')
+    with pytest.raises(ValueError):
+        checkpoint.Checkpoint.open(path, ["run"], resume=True)
+
+
+def test_interrupt_warning(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture):
+    with caplog.at_level(logging.WARNING):
+        with pytest.raises(KeyboardInterrupt):
+            with checkpoint.Checkpoint.open(tmp_path / "checkpoint", []):
+                raise KeyboardInterrupt
+
+    assert "--resume" in caplog.text
+
+
+def test_resume_lines(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(b"one\ntwo\nthree\n")
+    options = types.Options(mode="line", plaintext_encoding="plain")
+    path: pathlib.Path = tmp_path / "checkpoint"
+
+    seen: List[bytes] = []
+    with mock.patch.object(bullcrypt.main, "_BATCH_SIZE", 1):
+        with pytest.raises(KeyboardInterrupt):
+            with checkpoint.Checkpoint.open(path, []) as progress:
+                for _path, result in bullcrypt.main._process_file(
+                    UpperAlgorithm, str(test_file), options, progress=progress
+                ):
+                    if seen:
+                        raise KeyboardInterrupt
+
+                    seen.append(result.plaintext)
+
+        with checkpoint.Checkpoint.open(path, [], resume=True) as progress:
+            for _path, result in bullcrypt.main._process_file(
+                UpperAlgorithm, str(test_file), options, progress=progress
+            ):
+                seen.append(result.plaintext)
+
+            assert progress.is_completed(test_file)
+            assert not list(
+                bullcrypt.main._process_file(
+                    UpperAlgorithm, str(test_file), options, progress=progress
+                )
+            )
+
+    assert seen == [b"ONE", b"TWO", b"THREE"]
+
+
+def test_resume_custom_extraction(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.touch()
+    options = types.Options(mode="raw", plaintext_encoding=None)
+
+    assert [
+        payload
+        for _position, payload in CountingAlgorithm.extract_positioned_content(
+            test_file, options, start=1
+        )
+    ] == [b"b", b"c"]
+    assert list(UpperAlgorithm.extract_content(test_file, options)) == [b""]
+
+
+def test_resume_main(tmp_path: pathlib.Path):
+    files: pathlib.Path = tmp_path / "files"
+    files.mkdir()
+    for index in range(3):
+        (files / f"token-{index}").write_bytes(TOKEN)
+
+    path: pathlib.Path = tmp_path / "checkpoint"
+    args: List[str] = [
+        f"--checkpoint={path}",
+        "--raw",
+        "--recursive",
+        KEY,
+        "fernet",
+        str(files),
+    ]
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(args)
+        bullcrypt.main.main(["--resume", *args])
+        bullcrypt.main.main(["--resume", "--jobs=2", *args])
+
+    # noinspection SpellCheckingInspection
+    assert mock_stdout.getvalue().count("ABCDEFGHIJKLMNOPQRSTUVWXYZ") == 3
+
+    # Files left incomplete are processed in parallel when resuming.
+    done: str = json.dumps(["done", str(files / "token-0")]) + "\n"
+    path.write_text(path.read_text().replace(done, ""))
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(["--resume", "--jobs=2", *args])
+
+    # noinspection SpellCheckingInspection
+    assert mock_stdout.getvalue().count("ABCDEFGHIJKLMNOPQRSTUVWXYZ") == 1
+
+    with pytest.raises(SystemExit):
+        bullcrypt.main.main(["--resume", "--raw", KEY, "fernet", str(files)])
+
+
+def test_resume_segments(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(b"".join(b"line %d\n" % index for index in range(10)))
+    path: pathlib.Path = tmp_path / "checkpoint"
+    options = types.Options(
+        mode="line", plaintext_encoding="plain", jobs=2, backend="thread"
+    )
+    failing: bool = True
+
+    class FailingAlgorithm(UpperAlgorithm):
+        @classmethod
+        def _decryption_group(
+            cls, payload: bytes, options: "types.Options"
+        ) -> Generator[Callable[[], bytes], None, None]:
+            if failing and payload.endswith(b"9"):
+                raise OSError("Failed")
+
+            yield payload.upper
+
+    with mock.patch.multiple(bullcrypt.main, _SPLIT_SIZE=20, _PACK_SIZE=1):
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            with checkpoint.Checkpoint.open(path, []) as progress:
+                bullcrypt.main._run_parallel(
+                    FailingAlgorithm, [str(test_file)], options, progress
+                )
+
+            assert "LINE 0" in mock_stdout.getvalue()
+            failing = False
+            mock_stdout.seek(0)
+            mock_stdout.truncate()
+
+            with checkpoint.Checkpoint.open(path, [], resume=True) as progress:
+                bullcrypt.main._run_parallel(
+                    FailingAlgorithm, [str(test_file)], options, progress
+                )
+
+            assert progress.is_completed(test_file)
+
+    # Only the range that failed is decrypted again.
+    assert "LINE 9" in mock_stdout.getvalue()
+    assert "LINE 0" not in mock_stdout.getvalue()
+
+
+def test_coordinator_resume(tmp_path: pathlib.Path):
+    path: pathlib.Path = tmp_path / "checkpoint"
+    tasks = [distributed.Task(0, ("a",)), distributed.Task(1, ("b",))]
+    results: list = []
+
+    with checkpoint.Checkpoint.open(path, []) as progress:
+        coordinator = distributed.Coordinator(
+            tasks, [], result_handler=results.append, progress=progress
+        )
+        assert coordinator.acquire(worker_id=1) == tasks[0]
+        assert coordinator.complete(0, 1, [("a", 0, b"x")])
+
+    with checkpoint.Checkpoint.open(path, [], resume=True) as progress:
+        coordinator = distributed.Coordinator(
+            tasks, [], result_handler=results.append, progress=progress
+        )
+        assert coordinator.acquire(worker_id=1) == tasks[1]
+        assert coordinator.complete(1, 1, [])
+        assert coordinator.finished
+
+    with checkpoint.Checkpoint.open(path, [], resume=True) as progress:
+        assert distributed.Coordinator(tasks, [], progress=progress).finished
+
+    assert results == [("a", 0, b"x")]
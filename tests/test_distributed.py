@@ -0,0 +1,358 @@
+import io
+import multiprocessing
+import pathlib
+import threading
+from multiprocessing.connection import Client
+from unittest import mock
+
+import pytest
+
+import bullcrypt.main
+from bullcrypt import distributed, types
+from bullcrypt.algorithm import fernet
+
+# noinspection SpellCheckingInspection
+TOKEN: bytes = (
+    b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+    b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+    b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+    b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5"
+)
+
+# noinspection SpellCheckingInspection
+KEYS = [
+    "--fernet.key=57ndyQKDwbYrkLKXkT0zPBaIpyfSNktkaWk7HOz_WC8=",
+    "--fernet.key=b_aUzNmDOHKF2A7rO7wVZzMF3_CDTui7obSLtthYmUk=",
+    "--fernet.key=eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE=",
+]
+
+
+AUTHKEY: bytes = b"secret"
+
+
+def _write_tokens(directory: pathlib.Path, count: int) -> None:
+    for index in range(count):
+        (directory / f"token-{index}").write_bytes(TOKEN)
+
+
+def test_parse_address():
+    assert distributed.parse_address("127.0.0.1:9000") == ("127.0.0.1", 9000)
+    assert distributed.parse_address("/tmp/bullcrypt.sock") == "/tmp/bullcrypt.sock"
+    assert distributed.parse_address("relative.sock") == "relative.sock"
+
+
+def test_authkey(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("BULLCRYPT_AUTHKEY", raising=False)
+    # Unix sockets are no exception, as messages are pickled.
+    with pytest.raises(ValueError):
+        distributed._authkey(None)
+
+    with pytest.raises(ValueError):
+        distributed.main(["worker", "--connect=socket"])
+
+    assert distributed._authkey("secret") == AUTHKEY
+
+    monkeypatch.setenv("BULLCRYPT_AUTHKEY", "environment")
+    assert distributed._authkey(None) == b"environment"
+
+
+def test_plan(tmp_path: pathlib.Path):
+    _write_tokens(tmp_path, 3)
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        recursive=True,
+        algorithm_options={"key": ["a", "b", "c"]},
+    )
+
+    tasks = distributed.Coordinator.plan(
+        fernet.Fernet, [str(tmp_path)], options, shard_size=2, key_shard_size=2
+    )
+
+    assert [(len(t.files), t.key_range) for t in tasks] == [
+        (2, (0, 2)),
+        (2, (2, 3)),
+        (1, (0, 2)),
+        (1, (2, 3)),
+    ]
+    assert [
+        t.key_range
+        for t in distributed.Coordinator.plan(fernet.Fernet, [str(tmp_path)], options)
+    ] == [None]
+
+
+def test_leases():
+    results = []
+    tasks = [distributed.Task(0, ("a",)), distributed.Task(1, ("b",))]
+    coordinator = distributed.Coordinator(
+        tasks, [], lease_timeout=60, result_handler=results.append
+    )
+
+    assert coordinator.acquire(worker_id=1) == tasks[0]
+    assert coordinator.acquire(worker_id=2) == tasks[1]
+    assert coordinator.acquire(worker_id=3) is None
+
+    # A lost worker's tasks are handed out again.
+    coordinator.release(worker_id=1)
+    assert coordinator.acquire(worker_id=3) == tasks[0]
+
+    assert coordinator.complete(0, 3, [("a", 0, b"x", None)])
+    assert not coordinator.complete(0, 1, [("a", 0, b"y", None)])
+    assert not coordinator.complete(5, 1, [])
+    assert not coordinator.finished
+
+    # Leases that are not renewed expire.
+    coordinator.lease_timeout = -1
+    coordinator.renew(1, 2)
+    assert coordinator.acquire(worker_id=4) == tasks[1]
+    coordinator.renew(1, 4)
+
+    # A task completed by a worker whose lease expired is not handed out again.
+    coordinator.release(worker_id=4)
+    assert coordinator.complete(1, 2, [])
+    assert coordinator.acquire(worker_id=5) is None
+    assert coordinator.finished
+    assert results == [("a", 0, b"x", None)]
+    assert distributed.Coordinator([], []).finished
+
+
+def _serve(coordinator: distributed.Coordinator, address: str) -> threading.Thread:
+    thread = threading.Thread(
+        target=coordinator.serve, args=(address, AUTHKEY), daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def test_worker_processes(tmp_path: pathlib.Path):
+    files: pathlib.Path = tmp_path / "files"
+    files.mkdir()
+    _write_tokens(files, 4)
+    address: str = str(tmp_path / "socket")
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        coordinator = threading.Thread(
+            target=bullcrypt.main.main,
+            args=(
+                [
+                    "coordinator",
+                    f"--listen={address}",
+                    f"--authkey={AUTHKEY.decode()}",
+                    "--shard-size=1",
+                    "--key-shard-size=2",
+                    "--raw",
+                    "--recursive",
+                    *KEYS,
+                    "fernet",
+                    str(files),
+                ],
+            ),
+        )
+        coordinator.start()
+
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(
+                target=distributed.main,
+                args=(
+                    [
+                        "worker",
+                        f"--connect={address}",
+                        f"--authkey={AUTHKEY.decode()}",
+                        "--heartbeat=0.05",
+                    ],
+                ),
+            )
+            for _ in range(2)
+        ]
+
+        while not pathlib.Path(address).exists():
+            coordinator.join(0.01)
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join(60)
+            assert worker.exitcode == 0
+
+        coordinator.join(60)
+        assert not coordinator.is_alive()
+
+    # noinspection SpellCheckingInspection
+    assert mock_stdout.getvalue().count("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") == 4
+
+
+def test_dead_worker_reassigned(tmp_path: pathlib.Path):
+    _write_tokens(tmp_path, 1)
+    address: str = str(tmp_path / "socket")
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        recursive=True,
+        algorithm_options={"key": [k.split("=", 1)[1] for k in KEYS]},
+    )
+    results = []
+    coordinator = distributed.Coordinator(
+        distributed.Coordinator.plan(fernet.Fernet, [str(tmp_path)], options),
+        ["--raw", "--recursive", *KEYS, "fernet", str(tmp_path)],
+        lease_timeout=5,
+        result_handler=results.append,
+    )
+    thread = _serve(coordinator, address)
+    while not pathlib.Path(address).exists():
+        thread.join(0.01)
+
+    # This worker takes the only task, then disappears without finishing it.
+    with Client(address, authkey=AUTHKEY) as connection:
+        connection.send(("hello",))
+        assert connection.recv()[0] == "config"
+        connection.send(("request",))
+        assert connection.recv()[0] == "task"
+
+    bullcrypt.main.main(
+        [
+            "worker",
+            f"--connect={address}",
+            f"--authkey={AUTHKEY.decode()}",
+            "--heartbeat=0.05",
+        ]
+    )
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert [
+        (key_index, plaintext[:3]) for _path, key_index, plaintext, _name in results
+    ] == [(2, b"ABC")]
+
+
+def test_worker_lost_coordinator(tmp_path: pathlib.Path):
+    address: str = str(tmp_path / "socket")
+    coordinator = distributed.Coordinator(
+        [distributed.Task(0, ())], ["--raw", *KEYS, "fernet", "missing"]
+    )
+
+    def close_after_config(connection, worker_id):
+        del worker_id
+        connection.recv()
+        connection.send(("config", coordinator.cli_args))
+        connection.close()
+        coordinator._finished.set()
+
+    with mock.patch.object(coordinator, "_serve_connection", close_after_config):
+        thread = _serve(coordinator, address)
+        while not pathlib.Path(address).exists():
+            thread.join(0.01)
+
+        distributed.run_worker(address, AUTHKEY)
+        thread.join(10)
+
+
+def test_idle_worker_and_rejected_connection(tmp_path: pathlib.Path):
+    address: str = str(tmp_path / "socket")
+    started = threading.Event()
+
+    def slow_task(*args):
+        del args
+        started.set()
+        # Outlive several heartbeats while the other worker waits.
+        threading.Event().wait(0.3)
+        return []
+
+    coordinator = distributed.Coordinator(
+        [distributed.Task(0, ())], ["--raw", *KEYS, "fernet", "missing"]
+    )
+    thread = threading.Thread(
+        target=coordinator.serve, args=(address, AUTHKEY), daemon=True
+    )
+    thread.start()
+    while not pathlib.Path(address).exists():
+        thread.join(0.01)
+
+    with pytest.raises(multiprocessing.AuthenticationError):
+        Client(address, authkey=b"wrong")
+
+    with mock.patch.object(distributed, "_run_task", slow_task):
+        busy = threading.Thread(
+            target=distributed.run_worker, args=(address, AUTHKEY, 0.05)
+        )
+        busy.start()
+        started.wait(10)
+        distributed.run_worker(address, AUTHKEY)
+        busy.join(10)
+
+    thread.join(10)
+    assert coordinator.finished
+
+
+def test_run_task(tmp_path: pathlib.Path):
+    _write_tokens(tmp_path, 1)
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options={"key": [k.split("=", 1)[1] for k in KEYS]},
+    )
+    states = {}
+    files = (str(tmp_path / "token-0"), str(tmp_path / "missing"))
+
+    results = distributed._run_task(
+        fernet.Fernet, options, states, distributed.Task(0, files, (1, 3))
+    )
+    assert [key_index for _path, key_index, _plaintext, _name in results] == [2]
+    assert list(states) == [(1, 3)]
+
+    assert (
+        distributed._run_task(
+            fernet.Fernet, options, states, distributed.Task(1, files, (0, 1))
+        )
+        == []
+    )
+    assert list(states) == [(0, 1)]
+
+
+def test_heartbeat():
+    sent = []
+
+    def send(message):
+        sent.append(message)
+        if len(sent) == 2:
+            raise OSError("Closed")
+
+    heartbeat = distributed._Heartbeat(send, 7, 0.01)
+    heartbeat.start()
+    heartbeat.join(10)
+
+    assert sent == [("heartbeat", 7), ("heartbeat", 7)]
+
+
+def test_unknown_command():
+    with pytest.raises(ValueError):
+        distributed.main(["unknown"])
+
+
+@pytest.mark.parametrize("limit", ["--limit=1", "--first-match"])
+def test_limit_rejected(tmp_path: pathlib.Path, limit: str):
+    with pytest.raises(SystemExit):
+        distributed.main(
+            [
+                "coordinator",
+                f"--listen={tmp_path / 'socket'}",
+                f"--authkey={AUTHKEY.decode()}",
+                limit,
+                "--raw",
+                *KEYS,
+                "fernet",
+                str(tmp_path),
+            ]
+        )
+
+    assert not (tmp_path / "socket").exists()
+
+
+def test_print_result():
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        distributed._print_result(("a", 0, b"x", "fernet"))
+        distributed._print_result(("b", 0, b"y", None))
+
+    # Named like results printed by a single host.
+    assert mock_stdout.getvalue().splitlines() == ["a -> fernet: b'x'", "b -> b'y'"]
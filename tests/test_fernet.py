@@ -1,13 +1,18 @@
 import argparse
+import base64
+import hmac
 import io
 import pathlib
 from unittest import mock
 
 import pytest
+from cryptography.fernet import Fernet as _Fernet
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
+import bullcrypt.cli
 import bullcrypt.main
-from bullcrypt import types
-from bullcrypt.algorithm import fernet
+from bullcrypt import algorithm, types, utils
+from bullcrypt.algorithm import fernet, fernet_keyring
 
 
 def test_fernet_raw(tmp_path: pathlib.Path):
@@ -284,3 +289,294 @@ def test_invalid_args():
             pass
 
     assert e.value.args[0] == "Algorithm options expected to be a dict"
+
+
+def test_fernet_decrypt_batch():
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        # noinspection SpellCheckingInspection
+        algorithm_options={
+            "key": [
+                "not-a-key",
+                "57ndyQKDwbYrkLKXkT0zPBaIpyfSNktkaWk7HOz_WC8=",
+                "eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE=",
+            ]
+        },
+    )
+    state = fernet.Fernet.setup(options)
+
+    # noinspection SpellCheckingInspection
+    results = fernet.Fernet.decrypt_batch(
+        state,
+        [
+            b"invalid",
+            b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+            b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+            b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+            b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5",
+        ],
+    )
+
+    assert len(state.keyring) == 3 and state.keyring.invalid == {0}
+    assert [(r.index, r.key_index) for r in results] == [(1, 2)]
+
+    with pytest.raises(ValueError):
+        fernet.Fernet.setup(types.Options(mode="raw", plaintext_encoding=None))
+
+    with pytest.raises(ValueError):
+        fernet.Fernet.decrypt_batch(algorithm.Algorithm.setup(options), [b"invalid"])
+
+
+def test_fernet_line_parallel(tmp_path: pathlib.Path):
+    for name in ("first", "second"):
+        with open(tmp_path / name, "wb") as file:
+            # noinspection SpellCheckingInspection
+            file.write(
+                b"gAAAAABo7pkfKtJjd-uivjf9HgdiEE"
+                b"PsNNV5sh--5oQ0NVEB86hOokPix6AI"
+                b"PLFJIxrW1TQjmzq3b4sXxlOQh3Rhnb"
+                b"y1pvKwxer2wUZTIGO2EtYbL0Ppn-Q=\n"
+            )
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        # noinspection SpellCheckingInspection
+        bullcrypt.main.main(
+            [
+                "--line",
+                "--plain",
+                "--jobs=2",
+                "--recursive",
+                "--fernet.key=8KAadjX51CrZ5NCX0JVKculskzYmkHYE3C_f8N4clpo=",
+                "fernet",
+                str(tmp_path),
+            ]
+        )
+
+    result: str = mock_stdout.getvalue()
+    # noinspection SpellCheckingInspection
+    assert result.count("ABCDEFGHIJKLMNOPQRSTUVWXYZ") == 2
+
+
+def test_fernet_v1_interface():
+    # noinspection SpellCheckingInspection
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options={"key": ["eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE="]},
+    )
+
+    # noinspection SpellCheckingInspection
+    attempts = list(
+        fernet.Fernet.decrypt(
+            b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+            b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+            b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+            b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5",
+            options,
+        )()
+    )
+
+    # noinspection SpellCheckingInspection
+    assert [attempt() for attempt in attempts] == [
+        b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    ]
+
+
+def test_fernet_key_space():
+    options = types.Options(
+        mode="raw", plaintext_encoding=None, algorithm_options={"key": ["a", "b"]}
+    )
+
+    assert fernet.Fernet.key_count(options) == 2
+    restricted = fernet.Fernet.restrict_keys(options, 1, 2)
+    assert restricted.algorithm_options == {"key": ["b"]}
+    assert options.algorithm_options == {"key": ["a", "b"]}
+
+    unconfigured = options._replace(algorithm_options=None)
+    assert fernet.Fernet.key_count(unconfigured) is None
+    assert fernet.Fernet.restrict_keys(unconfigured, 0, 1) is unconfigured
+
+
+def test_fernet_sniff():
+    def options(mode: str, plaintext_encoding: str = "plain", encoding: str = "utf-8"):
+        # noinspection PyTypeChecker
+        return types.Options(
+            mode=mode,  # type: ignore[arg-type]
+            plaintext_encoding=plaintext_encoding,  # type: ignore[arg-type]
+            encoding=encoding,
+        )
+
+    # noinspection SpellCheckingInspection
+    token: bytes = b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b="
+    assert fernet.Fernet.sniff(token, options("raw"))
+    assert fernet.Fernet.sniff(b"\n\n" + token + b"\n" + token, options("line"))
+    assert not fernet.Fernet.sniff(b"\x89PNG\r\n", options("raw"))
+    assert not fernet.Fernet.sniff(b"gAAAAAB\x00\xff", options("raw"))
+    assert not fernet.Fernet.sniff(b"", options("chunked"))
+    assert fernet.Fernet.sniff(b"\x00", options("line", encoding="utf-16"))
+    assert fernet.Fernet.sniff(b"Z0FBQUFB", options("line", "base64"))
+    assert not fernet.Fernet.sniff(b"\x89PNG", options("line", "base64"))
+
+    # A header line does not hide the tokens after it, even cut short.
+    header: bytes = b"# exported tokens\n"
+    assert fernet.Fernet.sniff(header + token[:10], options("line"))
+    assert not fernet.Fernet.sniff(header + b"\n", options("line"))
+    assert not fernet.Fernet.sniff(header + token, options("raw"))
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_fernet_rekey(tmp_path: pathlib.Path, jobs: str):
+    # noinspection SpellCheckingInspection
+    old_key: str = "8KAadjX51CrZ5NCX0JVKculskzYmkHYE3C_f8N4clpo="
+    new_key: bytes = _Fernet.generate_key()
+    old, new = _Fernet(old_key), _Fernet(new_key)
+
+    tokens = [old.encrypt_at_time(b"first", 1000), old.encrypt_at_time(b"second", 2000)]
+    unrelated: bytes = _Fernet(_Fernet.generate_key()).encrypt(b"other")
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(b"\n".join([tokens[0], b"", unrelated, tokens[1]]) + b"\n")
+
+    args = [
+        "--line",
+        "--plain",
+        f"--jobs={jobs}",
+        f"--fernet.key={old_key}",
+        f"--fernet.rekey={new_key.decode()}",
+        "fernet",
+        str(test_file),
+    ]
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(args)
+
+    if jobs == "1":
+        assert "rewrote 2 of 3" in mock_stdout.getvalue()
+
+    lines = test_file.read_bytes().split(b"\n")
+    assert lines[1:3] == [b"", unrelated]
+    assert new.decrypt(lines[0]) == b"first"
+    assert new.extract_timestamp(lines[0]) == 1000
+    assert new.extract_timestamp(lines[3]) == 2000
+
+    # Rekeying again leaves the file untouched.
+    bullcrypt.main.main(args)
+    assert test_file.read_bytes().split(b"\n") == lines
+
+
+def test_fernet_rekey_args():
+    args = argparse.Namespace(
+        **{"encoding": "utf-8", "fernet.key": ["key"], "fernet.rekey": "invalid"}
+    )
+    with pytest.raises(ValueError):
+        fernet.Fernet.extract_args("fernet", args)
+
+    state = fernet.Fernet.setup(
+        types.Options(
+            mode="raw", plaintext_encoding=None, algorithm_options={"key": []}
+        )
+    )
+    assert not fernet.Fernet.rewrites(state.options)
+    with pytest.raises(ValueError):
+        fernet.Fernet.rewrite_batch(state, [b""])
+
+    with pytest.raises(ValueError):
+        fernet.Fernet.rewrite_batch(algorithm.State(state.options, None), [b""])
+
+    assert algorithm.Algorithm.rewrite_batch(state, [b"", b""]) == [None, None]
+    assert not algorithm.Algorithm.rewrites(state.options)
+
+
+def test_key_file(tmp_path: pathlib.Path):
+    key: bytes = _Fernet.generate_key()
+    (tmp_path / "keys").write_bytes(
+        b"\n".join(_Fernet.generate_key() for _ in range(5)) + b"\n" + key + b"\n"
+    )
+    (tmp_path / "tokens").write_bytes(
+        _Fernet(key).encrypt(b"plaintext") + b"\n" + b"gAAAAAB" + b"\n"
+    )
+    args = ["--line", "--plain", "fernet", str(tmp_path / "tokens")]
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main([f"--fernet.key-file={tmp_path / 'keys'}", *args])
+
+    assert "b'plaintext'" in mock_stdout.getvalue()
+
+    with mock.patch("sys.stdin", io.StringIO(key.decode())):
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            bullcrypt.main.main(["--fernet.key-file=-", *args])
+
+    assert "b'plaintext'" in mock_stdout.getvalue()
+
+    with pytest.raises(ValueError):
+        bullcrypt.main.main([f"--fernet.key-file={tmp_path / 'missing'}", *args])
+
+    # Workers parse the arguments themselves, each with its own stdin.
+    with pytest.raises(ValueError) as e:
+        bullcrypt.cli.parse(["--fernet.key-file=-", *args], distributed=True)
+
+    assert "standard input" in e.value.args[0]
+
+
+def test_key_file_positions(tmp_path: pathlib.Path):
+    key: bytes = _Fernet.generate_key()
+    (tmp_path / "keys").write_bytes(b"invalid\n" + key + b"\n")
+    (tmp_path / "tokens").write_bytes(_Fernet(key).encrypt(b"plaintext") + b"\n")
+
+    _handler, _files, options = bullcrypt.cli.parse(
+        [
+            f"--fernet.key={_Fernet.generate_key().decode()}",
+            f"--fernet.key-file={tmp_path / 'keys'}",
+            "--line",
+            "--plain",
+            "fernet",
+            str(tmp_path / "tokens"),
+        ]
+    )
+    results = fernet.Fernet.decrypt_batch(
+        fernet.Fernet.setup(options), [_Fernet(key).encrypt(b"plaintext")]
+    )
+
+    # The invalid key keeps its place, so the index counts every key given.
+    assert [(r.key_index, r.plaintext) for r in results] == [(2, b"plaintext")]
+    assert options.algorithm_options["key"][1] == ""
+
+    # The generic path never tries the placeholder as an all-zero key.
+    zero: str = base64.urlsafe_b64encode(bytes(32)).decode()
+    options = options._replace(
+        algorithm_options={"key": fernet_keyring.Keyring.from_keys(["invalid"])}
+    )
+    token: bytes = _Fernet(zero).encrypt(b"zero")
+    assert not list(utils.attempt_all(fernet.Fernet.decrypt(token, options)()))
+
+
+def test_malformed_tokens():
+    key: bytes = _Fernet.generate_key()
+    options = types.Options(
+        mode="raw", plaintext_encoding=None, algorithm_options={"key": [key.decode()]}
+    )
+    raw_key: bytes = base64.urlsafe_b64decode(key)
+
+    # A correctly signed token whose plaintext is not padded.
+    iv: bytes = bytes(16)
+    encryptor = Cipher(algorithms.AES(raw_key[16:]), modes.CBC(iv)).encryptor()
+    body: bytes = b"\x80" + bytes(8) + iv + encryptor.update(bytes(16))
+    unpadded: bytes = body + hmac.digest(raw_key[:16], body, "sha256")
+
+    assert not fernet.Fernet.decrypt_batch(
+        fernet.Fernet.setup(options),
+        [
+            b"!",
+            base64.urlsafe_b64encode(b"\x80" * 10),
+            base64.urlsafe_b64encode(unpadded),
+        ],
+    )
+
+    rekeyed = options._replace(
+        algorithm_options={
+            "key": [key.decode()],
+            "rekey": _Fernet.generate_key().decode(),
+        }
+    )
+    assert fernet.Fernet.rewrite_batch(
+        fernet.Fernet.setup(rekeyed), [base64.urlsafe_b64encode(unpadded)]
+    ) == [None]
@@ -0,0 +1,68 @@
+import base64
+import io
+import pathlib
+import pickle
+from unittest import mock
+
+import pytest
+from cryptography.fernet import Fernet as _Fernet
+
+from bullcrypt.algorithm import fernet_keyring
+
+KEYS = [_Fernet.generate_key().decode() for _ in range(5)]
+
+
+def test_from_keys():
+    # Small batches mix keys decoded together with ones decoded alone.
+    with mock.patch.object(fernet_keyring, "_LOAD_BATCH", 2):
+        keyring = fernet_keyring.Keyring.from_keys(
+            [KEYS[0], "not-a-key", KEYS[1], KEYS[2], "!" * 43 + "=", KEYS[3]]
+        )
+
+    assert len(keyring) == 6
+    assert keyring.invalid == {1, 4}
+    assert keyring[0] == KEYS[0] and keyring[-1] == KEYS[3]
+    assert keyring.key(2) == base64.urlsafe_b64decode(KEYS[1])
+    assert keyring.encryption_key(3) == base64.urlsafe_b64decode(KEYS[2])[16:]
+    assert [index for index, _key in keyring.signing_keys()] == [0, 2, 3, 5]
+    assert [bytes(key) for _index, key in keyring.signing_keys()][0] == (
+        base64.urlsafe_b64decode(KEYS[0])[:16]
+    )
+    assert list(keyring)[::2] == [KEYS[0], KEYS[1], ""]
+    assert keyring[1] == keyring[-2] == ""
+    assert repr(keyring) == "Keyring(6 keys)"
+    assert pickle.loads(pickle.dumps(keyring)) == keyring
+    assert hash(keyring) == hash(pickle.loads(pickle.dumps(keyring)))
+    assert keyring != list(keyring)
+
+    with pytest.raises(IndexError):
+        keyring.key(6)
+
+
+def test_slice():
+    keyring = fernet_keyring.Keyring.from_keys([KEYS[0], "invalid", *KEYS[1:]])
+
+    assert list(keyring[1:3]) == [keyring[1], KEYS[1]]
+    assert keyring[1:3].invalid == {0}
+    assert keyring[2:].invalid == frozenset()
+    assert not keyring[4:2]
+
+    with pytest.raises(ValueError):
+        _ = keyring[::2]
+
+
+def test_from_file(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture):
+    path: pathlib.Path = tmp_path / "keys"
+    path.write_text(f"{KEYS[1]}\n\n  {KEYS[2]}  \ninvalid\n{KEYS[3]}\n")
+
+    with mock.patch.object(fernet_keyring, "_LOAD_BATCH", 2):
+        keyring = fernet_keyring.Keyring.from_file(str(path), ["invalid", KEYS[0]])
+
+    # Invalid keys, given or read, keep their positions.
+    assert list(keyring) == ["", *KEYS[:3], "", KEYS[3]]
+    assert keyring.invalid == {0, 4}
+    assert "Ignoring 2 invalid Fernet keys" in caplog.text
+    assert "invalid\n" not in caplog.text
+
+    with mock.patch("sys.stdin", io.StringIO("\n".join(KEYS))):
+        assert list(fernet_keyring.Keyring.from_file("-")) == KEYS
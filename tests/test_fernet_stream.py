@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import hmac
+import io
+import os
+import pathlib
+from unittest import mock
+
+import pytest
+from cryptography.fernet import Fernet as _Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import bullcrypt.main
+import bullcrypt.types
+from bullcrypt import algorithm
+from bullcrypt.algorithm import fernet, fernet_stream
+
+KEYS = [_Fernet.generate_key() for _ in range(3)]
+STREAM_KEYS = [fernet_stream.StreamKey.from_key(i, key) for i, key in enumerate(KEYS)]
+
+
+@pytest.mark.parametrize("length", [0, 1, 15, 16, 17, 1000])
+def test_stream_decrypt(length: int):
+    plaintext: bytes = os.urandom(length)
+    token: bytes = _Fernet(KEYS[2]).encrypt(plaintext) + b"\n"
+
+    # Small blocks exercise headers, bodies, and tags that span blocks.
+    with mock.patch.object(fernet_stream, "_TEXT_BLOCK", 8):
+        match = fernet_stream.verify(token, STREAM_KEYS)
+        assert match is not None
+        assert match[0] == STREAM_KEYS[2]
+
+        output = io.BytesIO()
+        fernet_stream.decrypt(token, *match, output)
+
+    assert output.getvalue() == plaintext
+    assert fernet_stream.verify(token, STREAM_KEYS[:2]) is None
+
+
+def test_stream_invalid_tokens():
+    token: bytes = _Fernet(KEYS[0]).encrypt(b"payload")
+    for invalid in (
+        b"",
+        token[:-1],
+        token[:-4],
+        token[:8] + b"!" + token[9:],
+        b"Z" + token[1:],
+    ):
+        with pytest.raises(InvalidToken):
+            fernet_stream.verify(invalid, STREAM_KEYS)
+
+
+def test_stream_invalid_padding(tmp_path: pathlib.Path):
+    key = STREAM_KEYS[0]
+    iv: bytes = bytes(16)
+    encryptor = Cipher(algorithms.AES(key.encryption_key), modes.CBC(iv)).encryptor()
+    body: bytes = (
+        b"\x80" + bytes(8) + iv + encryptor.update(bytes(16)) + encryptor.finalize()
+    )
+    token: bytes = base64.urlsafe_b64encode(
+        body + hmac.new(key.signing_key, body, hashlib.sha256).digest()
+    )
+
+    match = fernet_stream.verify(token, STREAM_KEYS)
+    assert match == (key, iv)
+    with pytest.raises(InvalidToken):
+        fernet_stream.decrypt_to_file(token, *match, tmp_path / "plaintext")
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_stream_main(tmp_path: pathlib.Path):
+    tokens: pathlib.Path = tmp_path / "tokens"
+    tokens.mkdir()
+    output: pathlib.Path = tmp_path / "output"
+    output.mkdir()
+
+    plaintext: bytes = os.urandom(4096)
+    (tokens / "large").write_bytes(_Fernet(KEYS[1]).encrypt(plaintext))
+    (tokens / "foreign").write_bytes(
+        _Fernet(_Fernet.generate_key()).encrypt(bytes(2048))
+    )
+    (tokens / "invalid").write_bytes(b"gAAAAA" * 200)
+    (tokens / "small").write_bytes(_Fernet(KEYS[1]).encrypt(b"small"))
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            [
+                "--raw",
+                "--recursive",
+                *(f"--fernet.key={key.decode()}" for key in KEYS),
+                f"--fernet.output-dir={output}",
+                "--fernet.stream-size=1024",
+                "fernet",
+                str(tokens),
+            ]
+        )
+
+    assert (output / "large").read_bytes() == plaintext
+    assert [path.name for path in output.iterdir()] == ["large"]
+    assert str(output / "large") in mock_stdout.getvalue()
+    assert "b'small'" in mock_stdout.getvalue()
+
+    with pytest.raises(ValueError):
+        fernet.Fernet.decrypt_file(algorithm.State(None, None), tokens / "large")
+
+
+def test_stream_mirrors_paths(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture):
+    tokens: pathlib.Path = tmp_path / "tokens"
+    for name in ("a", "b"):
+        (tokens / name).mkdir(parents=True)
+        (tokens / name / "blob").write_bytes(
+            _Fernet(KEYS[0]).encrypt(name.encode() * 2048)
+        )
+
+    arguments = [
+        "--raw",
+        "--recursive",
+        f"--fernet.key={KEYS[0].decode()}",
+        "--fernet.stream-size=1024",
+    ]
+    with mock.patch("sys.stdout", new_callable=io.StringIO):
+        bullcrypt.main.main(
+            [
+                *arguments,
+                f"--fernet.output-dir={tmp_path / 'out'}",
+                "fernet",
+                str(tokens),
+            ]
+        )
+
+    assert (tmp_path / "out" / "a" / "blob").read_bytes() == b"a" * 2048
+    assert (tmp_path / "out" / "b" / "blob").read_bytes() == b"b" * 2048
+
+    # Neither earlier output nor the tokens themselves are overwritten.
+    ciphertext: bytes = (tokens / "a" / "blob").read_bytes()
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        for output in (tmp_path / "out", tokens):
+            bullcrypt.main.main(
+                [*arguments, f"--fernet.output-dir={output}", "fernet", str(tokens)]
+            )
+
+    assert not mock_stdout.getvalue()
+    assert (tokens / "a" / "blob").read_bytes() == ciphertext
+    assert (tmp_path / "out" / "a" / "blob").read_bytes() == b"a" * 2048
+    assert caplog.text.count("Not overwriting") == 4
+
+
+def test_stream_existing_output(tmp_path: pathlib.Path):
+    token: bytes = _Fernet(KEYS[0]).encrypt(b"plaintext")
+    match = fernet_stream.verify(token, STREAM_KEYS)
+    assert match is not None
+    (tmp_path / "plaintext").write_bytes(b"kept")
+
+    with pytest.raises(FileExistsError):
+        fernet_stream.decrypt_to_file(token, *match, tmp_path / "plaintext")
+
+    assert (tmp_path / "plaintext").read_bytes() == b"kept"
+    assert [path.name for path in tmp_path.iterdir()] == ["plaintext"]
+
+
+def test_stream_output_created_meanwhile(tmp_path: pathlib.Path):
+    (tmp_path / "token").write_bytes(_Fernet(KEYS[0]).encrypt(bytes(2048)))
+    options = bullcrypt.types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options={
+            "key": [KEYS[0].decode()],
+            "output_dir": str(tmp_path / "out"),
+            "stream_size": 1024,
+            "roots": [str(tmp_path / "elsewhere")],
+        },
+    )
+
+    with mock.patch.object(
+        fernet_stream, "decrypt_to_file", side_effect=FileExistsError
+    ):
+        assert (
+            fernet.Fernet.decrypt_file(fernet.Fernet.setup(options), tmp_path / "token")
+            == []
+        )
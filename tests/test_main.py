@@ -1,10 +1,19 @@
+import concurrent.futures
+import io
 import pathlib
+import sys
+import threading
 from typing import Callable, Generator
 from unittest import mock
 
+import pytest
+from cryptography.fernet import Fernet
+
 import bullcrypt.__main__
+import bullcrypt.cli
 import bullcrypt.main
-from bullcrypt import types, algorithm
+from bullcrypt import types, algorithm, distributed, schedule
+from bullcrypt.algorithm import fernet
 
 
 def test_main() -> None:
@@ -62,3 +71,356 @@ def test_decryption_directory_error(tmp_path: pathlib.Path) -> None:
         types.Options(mode="raw", plaintext_encoding=None, recursive=True),
     ):
         pass
+
+
+def test_worker(tmp_path: pathlib.Path) -> None:
+    test_path: pathlib.Path = tmp_path / "test"
+    test_path.write_bytes(b"payload")
+    (tmp_path / "directory").mkdir()
+
+    class UpperAlgorithm(algorithm.Algorithm):
+        @classmethod
+        def _decryption_group(
+            cls, payload: bytes, options: "types.Options"
+        ) -> Generator[Callable[[], bytes], None, None]:
+            yield payload.upper
+
+    options = types.Options(mode="raw", plaintext_encoding=None, recursive=True)
+    with mock.patch.object(bullcrypt.main, "_worker", threading.local()):
+        with pytest.raises(RuntimeError):
+            bullcrypt.main._process_in_worker(str(test_path))
+
+        bullcrypt.main._initialize_worker(UpperAlgorithm, options)
+        file_path, results = bullcrypt.main._process_in_worker(str(test_path))
+        assert file_path == str(test_path)
+        assert [(path, r.plaintext) for path, r in results or ()] == [
+            (test_path, b"PAYLOAD")
+        ]
+        assert bullcrypt.main._process_in_worker(str(tmp_path / "missing")) == (
+            str(tmp_path / "missing"),
+            None,
+        )
+
+    assert list(bullcrypt.main._walk(str(tmp_path), options)) == [test_path]
+    assert list(bullcrypt.main._walk(str(test_path), options)) == [test_path]
+    assert list(bullcrypt.main._walk(str(tmp_path / "missing"), options)) == []
+
+
+def test_parallel_queue(tmp_path: pathlib.Path) -> None:
+    for index in range(12):
+        (tmp_path / str(index)).write_bytes(b"")
+
+    with mock.patch.object(bullcrypt.main, "_report") as patch_report:
+        with mock.patch.object(bullcrypt.main, "_PACK_COUNT", 1):
+            bullcrypt.main.main(
+                [
+                    "--raw",
+                    "--jobs=2",
+                    "--recursive",
+                    "--no-sniff",
+                    "--fernet.key=8KAadjX51CrZ5NCX0JVKculskzYmkHYE3C_f8N4clpo=",
+                    "fernet",
+                    str(tmp_path),
+                ]
+            )
+
+    assert patch_report.call_count > 1
+
+
+def test_distributed_dispatch() -> None:
+    with mock.patch.object(distributed, "main") as patch_main:
+        with mock.patch("sys.argv", ["bullcrypt", "worker", "--connect=socket"]):
+            bullcrypt.main.main()
+
+    patch_main.assert_called_once_with(["worker", "--connect=socket"])
+
+
+def test_sniff_skips_files(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture):
+    (tmp_path / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    (tmp_path / "token").write_bytes(
+        b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+        b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+        b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+        b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5"
+    )
+    args = [
+        "--raw",
+        "--recursive",
+        # noinspection SpellCheckingInspection
+        "--fernet.key=eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE=",
+        "fernet",
+        str(tmp_path),
+    ]
+
+    with mock.patch.object(
+        fernet.Fernet, "decrypt_batch", return_value=[]
+    ) as patch_decrypt:
+        bullcrypt.main.main(args)
+        assert patch_decrypt.call_count == 1
+        assert "Skipped 1 files" in caplog.text
+
+        bullcrypt.main.main(["--no-sniff", *args])
+        assert patch_decrypt.call_count == 3
+
+    bullcrypt.main.main(["--jobs=2", *args])
+    assert caplog.text.count("Skipped 1 files") == 2
+
+    options = types.Options(mode="raw", plaintext_encoding=None)
+    sniffer = bullcrypt.main._Sniffer(algorithm.Algorithm, options)
+    assert sniffer(tmp_path / "missing")
+
+
+@pytest.mark.parametrize(
+    "backend, free_threaded, executor",
+    [
+        ("auto", True, concurrent.futures.ThreadPoolExecutor),
+        ("auto", False, concurrent.futures.ProcessPoolExecutor),
+        ("thread", False, concurrent.futures.ThreadPoolExecutor),
+        ("process", True, concurrent.futures.ProcessPoolExecutor),
+    ],
+)
+def test_backend(backend: str, free_threaded: bool, executor: type):
+    # noinspection PyTypeChecker
+    options = types.Options(
+        mode="raw", plaintext_encoding=None, backend=backend  # type: ignore[arg-type]
+    )
+    with mock.patch.object(
+        sys, "_is_gil_enabled", lambda: not free_threaded, create=True
+    ):
+        with bullcrypt.main._executor(algorithm.Algorithm, options, 1) as pool:
+            assert isinstance(pool, executor)
+
+
+def test_thread_backend(tmp_path: pathlib.Path):
+    for index in range(8):
+        (tmp_path / str(index)).write_bytes(
+            b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+            b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+            b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+            b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5"
+        )
+
+    states = set()
+    setup = fernet.Fernet.setup
+
+    def recording_setup(options: types.Options) -> algorithm.State:
+        state = setup(options)
+        states.add((threading.get_ident(), id(state)))
+        return state
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        with mock.patch.object(fernet.Fernet, "setup", recording_setup):
+            bullcrypt.main.main(
+                [
+                    "--raw",
+                    "--recursive",
+                    "--jobs=4",
+                    "--backend=thread",
+                    # noinspection SpellCheckingInspection
+                    "--fernet.key=eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE=",
+                    "fernet",
+                    str(tmp_path),
+                ]
+            )
+
+    # noinspection SpellCheckingInspection
+    assert mock_stdout.getvalue().count("ABCDEFGHIJKLMNOPQRSTUVWXYZ") == 8
+
+    # Each thread prepares its own state.
+    assert len({thread for thread, _state in states}) == len(states)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parallel_split(tmp_path: pathlib.Path, jobs: int) -> None:
+    key: bytes = Fernet.generate_key()
+    tokens = [Fernet(key).encrypt(b"line %d" % index) for index in range(50)]
+    (tmp_path / "large").write_bytes(b"\n".join(tokens) + b"\n")
+    for index in range(3):
+        (tmp_path / f"small-{index}").write_bytes(tokens[index])
+
+    with mock.patch.object(bullcrypt.main, "_SPLIT_SIZE", 1000):
+        with mock.patch.object(bullcrypt.main, "_PACK_SIZE", 500):
+            with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+                bullcrypt.main.main(
+                    [
+                        "--line",
+                        "--plain",
+                        f"--jobs={jobs}",
+                        "--backend=thread",
+                        "--recursive",
+                        f"--fernet.key={key.decode()}",
+                        "fernet",
+                        str(tmp_path),
+                    ]
+                )
+
+    output: str = mock_stdout.getvalue()
+    assert all(output.count(f"b'line {index}'") == 1 for index in range(3, 50))
+    assert all(output.count(f"b'line {index}'") == 2 for index in range(3))
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        [],
+        ["--jobs=2", "--backend=thread"],
+        ["--jobs=2", "--backend=process"],
+    ],
+)
+@pytest.mark.parametrize("limit", [["--first-match"], ["--limit=3"]])
+def test_limit(tmp_path: pathlib.Path, extra: list, limit: list) -> None:
+    key: bytes = Fernet.generate_key()
+    for index in range(20):
+        (tmp_path / f"tokens-{index}").write_bytes(
+            b"\n".join(Fernet(key).encrypt(b"flag{%d}" % line) for line in range(10))
+        )
+
+    with mock.patch.object(bullcrypt.main, "_PACK_SIZE", 0):
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            bullcrypt.main.main(
+                [
+                    "--line",
+                    "--plain",
+                    "--recursive",
+                    "--match=flag",
+                    *limit,
+                    *extra,
+                    f"--fernet.key={key.decode()}",
+                    "fernet",
+                    str(tmp_path),
+                ]
+            )
+
+    expected: int = 1 if limit == ["--first-match"] else 3
+    assert mock_stdout.getvalue().count("flag{") == expected
+
+
+def test_cancelled_worker(tmp_path: pathlib.Path) -> None:
+    test_path: pathlib.Path = tmp_path / "test"
+    test_path.write_bytes(b"payload\n" * 600)
+    options = types.Options(mode="line", plaintext_encoding="plain")
+    cancel = threading.Event()
+
+    class CancellingAlgorithm(algorithm.Algorithm):
+        @classmethod
+        def _decryption_group(
+            cls, payload: bytes, options: "types.Options"
+        ) -> Generator[Callable[[], bytes], None, None]:
+            cancel.set()
+            yield payload.upper
+
+    with mock.patch.object(bullcrypt.main, "_worker", threading.local()):
+        bullcrypt.main._initialize_worker(CancellingAlgorithm, options, cancel)
+        assert bullcrypt.main._process_task(
+            (schedule.Segment(str(test_path)), schedule.Segment(str(test_path)))
+        ) == [
+            (schedule.Segment(str(test_path)), None),
+            (schedule.Segment(str(test_path)), None),
+        ]
+
+
+def test_limit_arguments(tmp_path: pathlib.Path) -> None:
+    key: str = "--fernet.key=8KAadjX51CrZ5NCX0JVKculskzYmkHYE3C_f8N4clpo="
+    for extra in (
+        ["--limit=0"],
+        ["--limit=1", f"--fernet.rekey={key.split('=', 1)[1]}"],
+        ["--limit=1", "--first-match"],
+    ):
+        with pytest.raises(SystemExit):
+            bullcrypt.main.main([*extra, "--raw", key, "fernet", str(tmp_path)])
+
+
+def test_memory_budget(
+    tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    key: bytes = Fernet.generate_key()
+    for index, lines in enumerate((2, 2, 2, 2, 2, 12)):
+        (tmp_path / f"tokens-{index}").write_bytes(
+            b"\n".join(Fernet(key).encrypt(b"flag{%d}" % line) for line in range(lines))
+        )
+
+    token_size: int = len(Fernet(key).encrypt(b"flag{0}")) + 1
+    budget: int = token_size * 5
+    peaks: list = []
+    reserve = bullcrypt.main._Budget.reserve
+
+    def record(self, future, size) -> None:
+        reserve(self, future, size)
+        peaks.append((self.used, len(self.reserved)))
+
+    with mock.patch.object(bullcrypt.main, "_PACK_SIZE", 0):
+        with mock.patch.object(bullcrypt.main._Budget, "reserve", record):
+            with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+                bullcrypt.main.main(
+                    [
+                        "--line",
+                        "--plain",
+                        "--recursive",
+                        "--jobs=3",
+                        "--backend=thread",
+                        f"--max-memory={budget}",
+                        f"--fernet.key={key.decode()}",
+                        "fernet",
+                        str(tmp_path),
+                    ]
+                )
+
+    assert mock_stdout.getvalue().count("flag{") == 22
+    # Files beyond the budget run alone; the rest share it.
+    assert all(used <= budget or count == 1 for used, count in peaks)
+    assert "exceeds --max-memory" in caplog.text
+
+
+def test_memory_budget_batches(tmp_path: pathlib.Path) -> None:
+    key: bytes = Fernet.generate_key()
+    test_path: pathlib.Path = tmp_path / "tokens"
+    test_path.write_bytes(
+        b"\n".join(Fernet(key).encrypt(b"flag{%d}" % line) for line in range(3))
+    )
+
+    with mock.patch.object(
+        fernet.Fernet, "decrypt_batch", wraps=fernet.Fernet.decrypt_batch
+    ) as decrypt_batch:
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            bullcrypt.main.main(
+                [
+                    "--line",
+                    "--plain",
+                    "--max-memory=1",
+                    f"--fernet.key={key.decode()}",
+                    "fernet",
+                    str(test_path),
+                ]
+            )
+
+    assert mock_stdout.getvalue().count("flag{") == 3
+    assert decrypt_batch.call_count == 3
+
+
+def test_memory_budget_arguments(tmp_path: pathlib.Path) -> None:
+    args = [
+        "--raw",
+        "--fernet.key=8KAadjX51CrZ5NCX0JVKculskzYmkHYE3C_f8N4clpo=",
+        "fernet",
+        str(tmp_path),
+    ]
+    for extra in (["--max-memory=lots"], ["--max-memory=1M", "--watch"]):
+        with pytest.raises(SystemExit):
+            bullcrypt.main.main([*extra, *args])
+
+    # Neither watching nor distributed workers would honor the budget.
+    with pytest.raises(SystemExit):
+        bullcrypt.cli.parse(["--max-memory=1M", *args], distributed=True)
+
+
+def test_jobs_arguments(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(SystemExit):
+        bullcrypt.main.main(
+            [
+                "--jobs=-1",
+                "--raw",
+                "--fernet.key=8KAadjX51CrZ5NCX0JVKculskzYmkHYE3C_f8N4clpo=",
+                "fernet",
+                str(tmp_path),
+            ]
+        )
@@ -0,0 +1,79 @@
+import base64
+import pathlib
+from typing import List, Optional, Sequence
+
+import pytest
+
+from bullcrypt import rewrite, types
+
+
+def _reverse(payloads: Sequence[bytes]) -> List[Optional[bytes]]:
+    return [None if payload == b"keep" else payload[::-1] for payload in payloads]
+
+
+def test_rewrite_raw(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_bytes(b"\x00\x01\x02")
+    file_path.chmod(0o640)
+
+    options = types.Options(mode="raw", plaintext_encoding=None)
+    assert rewrite.rewrite_file(file_path, options, _reverse) == (1, 1)
+    assert file_path.read_bytes() == b"\x02\x01\x00"
+    assert file_path.stat().st_mode & 0o777 == 0o640
+    assert [path.name for path in tmp_path.iterdir()] == ["test"]
+
+    # A token saved as text keeps its line ending.
+    file_path.write_bytes(b"token\r\n")
+    assert rewrite.rewrite_file(
+        file_path, options, lambda payloads: [p.strip().upper() for p in payloads]
+    ) == (1, 1)
+    assert file_path.read_bytes() == b"TOKEN\r\n"
+
+    file_path.write_bytes(b"keep")
+    assert rewrite.rewrite_file(file_path, options, _reverse) == (0, 1)
+    assert file_path.read_bytes() == b"keep"
+
+
+def test_rewrite_chunked(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_bytes(b"YWJj\nZGVm\r\n")
+
+    options = types.Options(mode="chunked", plaintext_encoding="base64")
+    assert rewrite.rewrite_file(file_path, options, _reverse) == (1, 1)
+    assert file_path.read_bytes() == base64.b64encode(b"fedcba") + b"\r\n"
+
+    file_path.write_text("not base64!")
+    assert rewrite.rewrite_file(file_path, options, _reverse) == (0, 1)
+    assert file_path.read_text() == "not base64!"
+
+
+def test_rewrite_lines(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_bytes(b"abc\r\n\n  keep\n def \nlast")
+
+    options = types.Options(mode="line", plaintext_encoding="plain")
+    assert rewrite.rewrite_file(file_path, options, _reverse, batch_size=2) == (3, 4)
+    assert file_path.read_bytes() == b"cba\r\n\n  keep\n fed \ntsal"
+
+
+def test_rewrite_lines_unchanged(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_text("keep\n\n!!\n")
+    before: int = file_path.stat().st_ino
+
+    options = types.Options(mode="line", plaintext_encoding="base16")
+    assert rewrite.rewrite_file(file_path, options, _reverse) == (0, 0)
+    assert file_path.stat().st_ino == before
+    assert [path.name for path in tmp_path.iterdir()] == ["test"]
+
+
+def test_rewrite_unknown_mode(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.touch()
+
+    # noinspection PyTypeChecker
+    options = types.Options(mode="unknown", plaintext_encoding=None)  # type: ignore
+    with pytest.raises(ValueError):
+        rewrite.rewrite_file(file_path, options, _reverse)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["test"]
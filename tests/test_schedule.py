@@ -0,0 +1,108 @@
+import pathlib
+
+from bullcrypt import schedule
+
+
+def test_line_boundaries(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "lines"
+    file_path.write_bytes(b"aaaa\nbb\ncccccc\nd\ne")
+
+    assert schedule.line_boundaries(file_path, 0, 18, 4) == [5, 15]
+    assert schedule.line_boundaries(file_path, 0, 18, 5) == [5, 15]
+    assert schedule.line_boundaries(file_path, 5, 18, 1) == [8, 15, 17]
+    assert schedule.line_boundaries(file_path, 0, 18, 100) == []
+
+
+def test_plan(tmp_path: pathlib.Path):
+    large: pathlib.Path = tmp_path / "large"
+    large.write_bytes(b"line\n" * 40)
+
+    tasks = schedule.plan(
+        [
+            schedule.Entry("small-1", 3),
+            schedule.Entry("unsplittable", 50),
+            schedule.Entry(str(large), 200, 0, splittable=True),
+            schedule.Entry("small-2", 4),
+            schedule.Entry("resumed", 60, 55),
+            schedule.Entry("small-3", 1),
+            schedule.Entry("small-4", 2),
+        ],
+        split_size=100,
+        pack_size=8,
+        pack_count=3,
+    )
+
+    assert tasks == [
+        (schedule.Segment(str(large), 0, 100),),
+        (schedule.Segment(str(large), 100),),
+        (schedule.Segment("unsplittable"),),
+        (schedule.Segment("small-2"), schedule.Segment("small-1")),
+        (schedule.Segment("resumed", 55),),
+        (schedule.Segment("small-4"), schedule.Segment("small-3")),
+    ]
+
+
+def test_plan_finished(tmp_path: pathlib.Path):
+    large: pathlib.Path = tmp_path / "large"
+    large.write_bytes(b"line\n" * 40)
+
+    tasks = schedule.plan(
+        [
+            schedule.Entry(str(large), 200, 0, True, ((0, 100), (150, None))),
+            schedule.Entry("small", 4, 0, False, ((0, None),)),
+            schedule.Entry("resumed", 60, 10, False, ((20, 30),)),
+        ],
+        split_size=20,
+        pack_size=8,
+        pack_count=3,
+    )
+
+    # Only unfinished ranges are planned, and fully finished files not at all.
+    assert tasks == [
+        (schedule.Segment("resumed", 30),),
+        (schedule.Segment(str(large), 100, 120),),
+        (schedule.Segment(str(large), 120, 140),),
+        (schedule.Segment(str(large), 140, 150),),
+        (schedule.Segment("resumed", 10, 20),),
+    ]
+    assert schedule.Entry("small", 4, 0, False, ((0, None),)).remaining == 0
+
+
+def test_tracker():
+    tracker = schedule.Tracker(
+        [
+            (schedule.Segment("a", 0, 10),),
+            (schedule.Segment("a", 10), schedule.Segment("b")),
+            (schedule.Segment("c"),),
+        ]
+    )
+
+    assert not tracker.finish("a", True)
+    assert tracker.finish("a", True)
+    assert tracker.finish("b", True)
+    assert not tracker.finish("c", False)
+
+
+def test_stream(tmp_path: pathlib.Path):
+    large: pathlib.Path = tmp_path / "large"
+    large.write_bytes(b"line\n" * 40)
+
+    tasks = schedule.stream(
+        [
+            schedule.Entry("small-1", 3),
+            schedule.Entry(str(large), 200, 0, splittable=True),
+            schedule.Entry("small-2", 4),
+            schedule.Entry("small-3", 1),
+        ],
+        pack_size=8,
+        pack_count=3,
+    )
+
+    assert list(tasks) == [
+        (schedule.Segment(str(large)),),
+        (
+            schedule.Segment("small-1"),
+            schedule.Segment("small-2"),
+            schedule.Segment("small-3"),
+        ),
+    ]
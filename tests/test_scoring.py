@@ -0,0 +1,107 @@
+import io
+import pathlib
+from typing import List
+from unittest import mock
+
+import pytest
+
+import bullcrypt.main
+from bullcrypt import scoring
+
+ENGLISH: bytes = b"the quick brown fox jumps over the lazy dog and then it rested"
+NOISE: bytes = bytes(range(0, 256, 3))
+
+
+def test_printable():
+    validator = scoring.PrintableValidator(0.9)
+    assert validator.check([ENGLISH, NOISE, b""]) == [True, False, True]
+
+
+def test_utf8():
+    validator = scoring.Utf8Validator()
+    assert validator.check(["héllo".encode("utf-8"), b"\xff\xfe"]) == [True, False]
+
+
+@pytest.mark.parametrize("numpy_available", [True, False])
+def test_english(numpy_available: bool):
+    if numpy_available:
+        pytest.importorskip("numpy")
+        patch = mock.patch.object(scoring, "np", scoring.np)
+    else:
+        patch = mock.patch.object(scoring, "np", None)
+
+    with patch:
+        scores: List[float] = scoring.EnglishValidator.scores([ENGLISH, NOISE, b""])
+        assert scores[0] > 5.0 > scores[1]
+        assert scores[2] == 0.0
+        assert scoring.EnglishValidator().check([ENGLISH, NOISE]) == [True, False]
+
+
+def test_regex():
+    validator = scoring.RegexValidator(r"flag\{.*\}")
+    assert validator.check([b"x flag{a\nb} y", b"flag{"]) == [True, False]
+    assert scoring.RegexValidator(rb"^\d+$").check([b"123"]) == [True]
+
+
+def test_magic():
+    candidates = [b"%PDF-1.7", b"\x89PNG\r\n\x1a\n", b"x"]
+    assert scoring.MagicValidator().check(candidates) == [True, True, False]
+    assert scoring.MagicValidator(["png"]).check([b"%PDF-1.7"]) == [False]
+
+
+def test_pipeline_orders_by_cost():
+    english = scoring.EnglishValidator()
+    printable = scoring.PrintableValidator()
+    pipeline = scoring.Pipeline([english, printable])
+
+    assert pipeline.validators == (printable, english)
+    assert pipeline.check([ENGLISH, NOISE, b"!!!!!!!!"]) == [True, False, False]
+    assert pipeline.check([NOISE]) == [False]
+
+
+def test_select():
+    validator = scoring.RegexValidator(b"needle")
+    candidates = [b"hay"] * 10 + [b"needle"] + [b"hay"] * 100
+    consumed: List[bytes] = []
+
+    def generate():
+        for index, candidate in enumerate(candidates):
+            consumed.append(candidate)
+            yield index, candidate
+
+    assert scoring.select(generate(), validator) == (10, b"needle")
+    assert len(consumed) < len(candidates)
+    assert scoring.select(iter([(0, b"hay")]), validator) is None
+    assert scoring.select(iter([(0, b"a"), (1, b"b")]), None) == (0, b"a")
+    assert scoring.select(iter([]), None) is None
+
+
+def test_fernet_regex_rejects(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    with open(test_file, "wb") as file:
+        # noinspection SpellCheckingInspection
+        file.write(
+            b"gAAAAABo7pXag6KIWBdtlWUhl_qnc17dk4b"
+            b"J4-mI_f4oxpBCLQc7sMacXD5XIP7v2sJctA"
+            b"QJDDJvo7hmCby0zBOG3rIfV2D2ZvirH-kSm"
+            b"X9rrvkk5dB7sUhvJUP6B7qG_xAaWzx823_5"
+        )
+
+    arguments = [
+        "--raw",
+        "--fernet.key=eBUADWmyqd8diJhRb2Kps6ZMbDqzLOXj2_6ILmFs-sE=",
+        "fernet",
+        str(test_file),
+    ]
+
+    for validation, expected in (
+        (["--regex", "flag"], ""),
+        (["--regex", "ABC", "--printable", "--utf8", "--english=-100"], "ABC"),
+        (["--magic"], ""),
+        (["--magic", "png"], ""),
+    ):
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            bullcrypt.main.main(validation + arguments)
+
+        assert expected in mock_stdout.getvalue()
+        assert bool(expected) == bool(mock_stdout.getvalue())
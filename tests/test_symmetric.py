@@ -0,0 +1,72 @@
+import base64
+
+import pytest
+
+from bullcrypt.algorithm import symmetric
+
+KEY: bytes = bytes(range(32))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        KEY.hex(),
+        KEY.hex().upper(),
+        base64.b64encode(KEY).decode(),
+        base64.urlsafe_b64encode(KEY).decode().rstrip("="),
+        f"  {KEY.hex()}\n",
+    ],
+)
+def test_parse_key(text: str):
+    assert symmetric.parse_key(text, (16, 32)) == KEY
+
+
+def test_parse_key_prefers_hex():
+    # Valid as 24 bytes of base64 too.
+    assert symmetric.parse_key("00" * 16, (16, 24)) == bytes(16)
+
+
+@pytest.mark.parametrize("text", ["", "zz", KEY.hex()[:-2], "not base64!"])
+def test_parse_key_invalid(text: str):
+    assert symmetric.parse_key(text, (32,)) is None
+
+
+@pytest.mark.parametrize(
+    "layout,expected",
+    [
+        (symmetric.Layout(0, 2), (b"ab", b"cdefgh", b"")),
+        (symmetric.Layout(-2, 2), (b"gh", b"abcdef", b"")),
+        (symmetric.Layout(0, 2, -3, 3), (b"ab", b"cde", b"fgh")),
+        (symmetric.Layout(0, 2, 2, 3), (b"ab", b"fgh", b"cde")),
+        (symmetric.Layout(3, 2, 0, 3), (b"de", b"fgh", b"abc")),
+        (symmetric.Layout(0, 8), (b"abcdefgh", b"", b"")),
+        # Headers before the nonce are skipped.
+        (symmetric.Layout(4, 2), (b"ef", b"gh", b"")),
+        (symmetric.Layout(2, 2, -2, 2), (b"cd", b"ef", b"gh")),
+        (symmetric.Layout(-2, 2, -5, 3), (b"gh", b"abc", b"def")),
+        (symmetric.Layout(-4, 2, -2, 2), (b"ef", b"abcd", b"gh")),
+        # An explicit ciphertext runs up to the next part or the end.
+        (symmetric.Layout(-2, 2, ciphertext_offset=1), (b"gh", b"bcdef", b"")),
+        (symmetric.Layout(0, 2, ciphertext_offset=-3), (b"ab", b"fgh", b"")),
+        (symmetric.Layout(0, 2, -3, 3, 4), (b"ab", b"e", b"fgh")),
+        (symmetric.Layout(0, 2, ciphertext_offset=8), (b"ab", b"", b"")),
+    ],
+)
+def test_layout(layout: symmetric.Layout, expected: tuple):
+    assert layout.split(b"abcdefgh") == expected
+
+
+@pytest.mark.parametrize(
+    "layout",
+    [
+        symmetric.Layout(0, 9),
+        symmetric.Layout(-9, 2),
+        symmetric.Layout(0, 4, -5, 5),
+        symmetric.Layout(8, 1),
+        symmetric.Layout(0, 2, ciphertext_offset=1),
+        symmetric.Layout(0, 2, -3, 3, -2),
+        symmetric.Layout(0, 2, ciphertext_offset=9),
+    ],
+)
+def test_layout_too_short(layout: symmetric.Layout):
+    assert layout.split(b"abcdefgh") is None
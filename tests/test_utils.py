@@ -1,4 +1,5 @@
 import pathlib
+from unittest import mock
 
 import pytest
 
@@ -41,3 +42,166 @@ def test_chunked_base64_decoding_error(tmp_path: pathlib.Path):
 
     for _ in bullcrypt.utils.extract_content(file_path, "chunked", "base64", "utf-8"):
         pass
+
+
+def test_positioned_line_resume(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_bytes(b"one\ntwo\nthree\n")
+
+    positioned = list(
+        bullcrypt.utils.extract_positioned_content(file_path, "line", "plain", "utf-8")
+    )
+    assert positioned == [(4, b"one"), (8, b"two"), (14, b"three")]
+    assert list(
+        bullcrypt.utils.extract_positioned_content(
+            file_path, "line", "plain", "utf-8", start=4
+        )
+    ) == [(8, b"two"), (14, b"three")]
+
+    assert list(
+        bullcrypt.utils.extract_positioned_content(
+            file_path, "line", "plain", "utf-8", start=4, stop=8
+        )
+    ) == [(8, b"two")]
+
+
+def test_batch_bytes():
+    assert bullcrypt.utils.batch_bytes(None, 4) is None
+    assert bullcrypt.utils.batch_bytes(800, 4) == 100
+    assert bullcrypt.utils.batch_bytes(1, 4) == 1
+
+    with mock.patch("os.cpu_count", return_value=None):
+        assert bullcrypt.utils.batch_bytes(800, None) == 400
+
+
+def test_positioned_line_resume_wide_encoding(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_text("one\ntwo\n", encoding="utf-16")
+
+    first, *rest = bullcrypt.utils.extract_positioned_content(
+        file_path, "line", "plain", "utf-16"
+    )
+    assert first[1] == "one".encode("utf-16")
+    assert [payload for _position, payload in rest] == ["two".encode("utf-16")]
+    assert [
+        payload
+        for _position, payload in bullcrypt.utils.extract_positioned_content(
+            file_path, "line", "plain", "utf-16", start=first[0]
+        )
+    ] == ["two".encode("utf-16")]
+    assert [
+        payload
+        for _position, payload in bullcrypt.utils.extract_positioned_content(
+            file_path, "line", "plain", "utf-16", stop=first[0]
+        )
+    ] == ["one".encode("utf-16")]
+
+
+@pytest.mark.parametrize("mode", ["raw", "chunked"])
+def test_positioned_whole_file_resume(tmp_path: pathlib.Path, mode: str):
+    file_path: pathlib.Path = tmp_path / "test"
+    file_path.write_bytes(b"content")
+
+    ((position, payload),) = bullcrypt.utils.extract_positioned_content(
+        file_path, mode, "plain", "utf-8"  # type: ignore[arg-type]
+    )
+    assert payload == b"content"
+    assert not list(
+        bullcrypt.utils.extract_positioned_content(
+            file_path, mode, "plain", "utf-8", start=position  # type: ignore[arg-type]
+        )
+    )
+
+
+def test_exports():
+    assert "ALPHABETS" in bullcrypt.utils.__all__
+    assert bullcrypt.utils.ALPHABETS["base64url"].endswith(b"-_")
+
+
+def test_plausible_content():
+    assert bullcrypt.utils.plausible_content(b"\x00\xff", "raw", None, "utf-8")
+    assert bullcrypt.utils.plausible_content(
+        b"Zm9v\nYmFy==\n", "line", "base64", "utf-8"
+    )
+    assert not bullcrypt.utils.plausible_content(b"Zm9v-_", "line", "base64", "utf-8")
+    assert bullcrypt.utils.plausible_content(b"Zm9v-_", "line", "base64url", "utf-8")
+    assert not bullcrypt.utils.plausible_content(b"abc", "chunked", "base16", "utf-8")
+    assert bullcrypt.utils.plausible_content(b"\x00\xff", "line", "plain", "utf-8")
+    assert bullcrypt.utils.plausible_content(b"\x00\xff", "line", "base64", "utf-16")
+
+    # One plausible line suffices, even after a header or cut short.
+    header: bytes = b"# exported payloads\r\n\n"
+    assert bullcrypt.utils.plausible_content(
+        header + b"Zm9v\nYm", "line", "base64", "utf-8"
+    )
+    assert not bullcrypt.utils.plausible_content(header, "line", "base64", "utf-8")
+    assert not bullcrypt.utils.plausible_content(
+        header + b"Zm9v", "chunked", "base64", "utf-8"
+    )
+    assert bullcrypt.utils.prefix_lines(b" a \r\n\n\tb") == [b"a", b"b"]
+
+
+@pytest.mark.parametrize(
+    "plaintext_encoding", ("base64", "base64url", "base32", "base32hex", "base16")
+)
+def test_decode_lines_matches_per_line(plaintext_encoding: str):
+    payloads = [bytes(range(length)) * 3 for length in (0, 1, 2, 3, 4, 5, 5, 7, 7, 7)]
+    lines = [
+        bullcrypt.utils.encode_content(payload, plaintext_encoding, "utf-8")
+        for payload in payloads
+    ]
+
+    assert bullcrypt.utils.decode_lines(lines, plaintext_encoding, "utf-8") == [
+        bullcrypt.utils.decode_content(line, plaintext_encoding, "utf-8")
+        for line in lines
+    ]
+
+
+def test_decode_lines_failures():
+    lines = ["AAEC", "A!EC", "AwQF", "AAE="]
+
+    assert bullcrypt.utils.decode_lines(lines, "base64", "utf-8") == [
+        b"\x00\x01\x02",
+        None,
+        b"\x03\x04\x05",
+        b"\x00\x01",
+    ]
+
+
+def test_decode_lines_plain():
+    assert bullcrypt.utils.decode_lines(["a", "b"], "plain", "utf-8") == [b"a", b"b"]
+
+
+def test_batched_max_bytes():
+    items = [b"a" * 3, b"b" * 3, b"c" * 10, b"d", b"e"]
+
+    assert list(bullcrypt.utils.batched(items, 4, max_bytes=5)) == [
+        [b"aaa", b"bbb"],
+        [b"c" * 10],
+        [b"d", b"e"],
+    ]
+    assert list(bullcrypt.utils.batched(items, 2, max_bytes=100)) == [
+        items[:2],
+        items[2:4],
+        items[4:],
+    ]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("100", 100),
+        ("2G", 2 << 30),
+        ("512m", 512 << 20),
+        ("1.5KiB", 1536),
+        ("1MB", 1 << 20),
+    ],
+)
+def test_parse_size(text: str, expected: int):
+    assert bullcrypt.utils.parse_size(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "G", "lots", "0", "-1G", "inf", "nan"])
+def test_parse_size_invalid(text: str):
+    with pytest.raises(ValueError):
+        bullcrypt.utils.parse_size(text)
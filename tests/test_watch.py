@@ -0,0 +1,197 @@
+import os
+import pathlib
+import threading
+from unittest import mock
+
+import pytest
+from cryptography.fernet import Fernet
+
+import bullcrypt.main
+from bullcrypt import checkpoint, types, watch
+from bullcrypt.algorithm import fernet
+
+KEY: bytes = Fernet.generate_key()
+
+
+def _token(plaintext: bytes) -> bytes:
+    return Fernet(KEY).encrypt(plaintext)
+
+
+def _options(**kwargs) -> types.Options:
+    return types.Options(
+        **{
+            "mode": "line",
+            "plaintext_encoding": "plain",
+            "algorithm_options": {"key": [KEY.decode()]},
+            **kwargs,
+        }
+    )
+
+
+def _plaintexts(watcher: watch.Watcher) -> list:
+    return [result.plaintext for _path, result in watcher.poll()]
+
+
+def test_appended_lines(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "log"
+    file_path.write_bytes(_token(b"one") + b"\n" + _token(b"two") + b"\n")
+    watcher = watch.Watcher(fernet.Fernet, [str(file_path)], _options())
+
+    assert _plaintexts(watcher) == [b"one", b"two"]
+    assert not _plaintexts(watcher)
+
+    # A line still being written is left until it is complete.
+    three: bytes = _token(b"three")
+    with open(file_path, "ab") as file:
+        file.write(three[:20])
+    assert not _plaintexts(watcher)
+
+    with open(file_path, "ab") as file:
+        file.write(three[20:] + b"\n" + _token(b"four") + b"\n")
+    assert _plaintexts(watcher) == [b"three", b"four"]
+    assert not _plaintexts(watcher)
+
+    # Truncated files are read anew.
+    file_path.write_bytes(_token(b"five") + b"\n")
+    assert _plaintexts(watcher) == [b"five"]
+
+
+def test_new_files(tmp_path: pathlib.Path):
+    watcher = watch.Watcher(
+        fernet.Fernet, [str(tmp_path)], _options(mode="raw", recursive=True)
+    )
+    assert not _plaintexts(watcher)
+
+    (tmp_path / "empty").touch()
+    (tmp_path / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "token").write_bytes(_token(b"one"))
+    assert _plaintexts(watcher) == [b"one"]
+    assert not _plaintexts(watcher)
+
+    assert watcher.sniffer.skipped == 1
+
+    (tmp_path / "empty").write_bytes(_token(b"two"))
+    (tmp_path / "nested" / "token").unlink()
+    assert _plaintexts(watcher) == [b"two"]
+
+    (tmp_path / "nested" / "token").write_bytes(_token(b"three"))
+    os.utime(tmp_path / "empty", ns=(0, 0))
+    assert sorted(_plaintexts(watcher)) == [b"three", b"two"]
+
+
+def test_watch_checkpoint(tmp_path: pathlib.Path):
+    log: pathlib.Path = tmp_path / "log"
+    log.write_bytes(_token(b"one") + b"\n")
+    raw: pathlib.Path = tmp_path / "raw"
+    raw.write_bytes(_token(b"two"))
+    path: pathlib.Path = tmp_path / "checkpoint"
+
+    def run(file_path: pathlib.Path, **kwargs) -> list:
+        with checkpoint.Checkpoint.open(path, [], resume=path.exists()) as progress:
+            watcher = watch.Watcher(
+                fernet.Fernet, [str(file_path)], _options(**kwargs), progress
+            )
+            return _plaintexts(watcher)
+
+    assert run(log) == [b"one"]
+    with open(log, "ab") as file:
+        file.write(_token(b"three") + b"\n")
+    assert run(log) == [b"three"]
+
+    assert run(raw, mode="raw") == [b"two"]
+    assert not run(raw, mode="raw")
+
+
+def test_wide_encoding(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "log"
+    file_path.write_text(_token(b"one").decode() + "\n", encoding="utf-16")
+    (tmp_path / "empty").touch()
+    watcher = watch.Watcher(
+        fernet.Fernet,
+        [str(file_path), str(tmp_path / "empty")],
+        _options(encoding="utf-16"),
+    )
+
+    assert _plaintexts(watcher) == [b"one"]
+    assert not _plaintexts(watcher)
+
+    # A line still being written is left until it is complete.
+    two: bytes = _token(b"two")
+    with open(file_path, "ab") as file:
+        file.write(two[:20].decode().encode("utf-16-le"))
+    assert not _plaintexts(watcher)
+
+    with open(file_path, "ab") as file:
+        file.write((two[20:].decode() + "\n").encode("utf-16-le"))
+    assert _plaintexts(watcher) == [b"two"]
+    assert not _plaintexts(watcher)
+
+
+def test_rejected_files_grow(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "log"
+    file_path.write_bytes(b"\x89PNG\r\n")
+    watcher = watch.Watcher(fernet.Fernet, [str(tmp_path)], _options(recursive=True))
+
+    assert not _plaintexts(watcher)
+    assert not _plaintexts(watcher)
+    assert watcher.sniffer.skipped == 1
+
+    # Sniffed again once it grows, such as with a token after a header.
+    with open(file_path, "ab") as file:
+        file.write(_token(b"one") + b"\n")
+    assert _plaintexts(watcher) == [b"one"]
+
+
+def test_missing_and_failing(tmp_path: pathlib.Path):
+    file_path: pathlib.Path = tmp_path / "log"
+    file_path.write_bytes(b"payload\n")
+    watcher = watch.Watcher(
+        fernet.Fernet,
+        [str(tmp_path / "missing"), str(tmp_path), str(file_path)],
+        _options(),
+    )
+
+    with mock.patch.object(
+        bullcrypt.main, "_decrypt_file", side_effect=RuntimeError
+    ) as patch_decrypt:
+        assert not _plaintexts(watcher)
+        assert not _plaintexts(watcher)
+
+    assert patch_decrypt.call_count == 1
+
+
+def test_run(tmp_path: pathlib.Path, capsys: pytest.CaptureFixture):
+    file_path: pathlib.Path = tmp_path / "log"
+    file_path.write_bytes(_token(b"one") + b"\n")
+    watcher = watch.Watcher(fernet.Fernet, [str(file_path)], _options())
+
+    stop = threading.Event()
+    stop.set()
+    watcher.run(1.0, stop)
+    assert "b'one'" in capsys.readouterr().out
+
+    with mock.patch.object(watcher, "poll", side_effect=KeyboardInterrupt):
+        watcher.run(1.0)
+
+
+def test_watch_main(tmp_path: pathlib.Path):
+    args = ["--line", "--plain", f"--fernet.key={KEY.decode()}", "fernet"]
+    with mock.patch.object(watch.Watcher, "run") as patch_run:
+        bullcrypt.main.main(["--watch", *args, str(tmp_path)])
+
+    patch_run.assert_called_once_with(1.0)
+
+    for extra in (["--watch=0"], ["--watch", f"--fernet.rekey={KEY.decode()}"]):
+        with pytest.raises(SystemExit):
+            bullcrypt.main.main([*extra, *args, str(tmp_path)])
+
+
+def test_run_limit(tmp_path: pathlib.Path, capsys: pytest.CaptureFixture):
+    file_path: pathlib.Path = tmp_path / "log"
+    file_path.write_bytes(_token(b"one") + b"\n" + _token(b"two") + b"\n")
+    watcher = watch.Watcher(fernet.Fernet, [str(file_path)], _options(limit=1))
+
+    watcher.run(60.0)
+    output: str = capsys.readouterr().out
+    assert "b'one'" in output and "b'two'" not in output
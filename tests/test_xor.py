@@ -0,0 +1,218 @@
+import argparse
+import base64
+import io
+import pathlib
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import bullcrypt.main
+from bullcrypt import scoring, types
+from bullcrypt.algorithm import xor
+
+PLAINTEXT: bytes = (
+    b"It was the best of times, it was the worst of times, it was the age of "
+    b"wisdom, it was the age of foolishness, it was the epoch of belief, it "
+    b"was the epoch of incredulity, it was the season of Light, it was the "
+    b"season of Darkness, it was the spring of hope, it was the winter of "
+    b"despair, we had everything before us, we had nothing before us."
+)
+
+
+@pytest.mark.parametrize("key", [b"K", b"ab", b"bullcrypt", b"secretkey!!"])
+def test_crack(key: bytes):
+    ciphertext: bytes = xor.Xor.decrypt_one(PLAINTEXT, key)
+    recovered, _score = xor.Xor.crack(ciphertext)[0]
+
+    assert recovered == key
+    assert xor.Xor.decrypt_one(ciphertext, recovered) == PLAINTEXT
+
+
+def test_crack_short():
+    assert xor.Xor.crack(b"") == []
+    assert xor.Xor.estimate_key_lengths(b"a") == [1]
+    assert len(xor.Xor.crack(b"a")) == 1
+
+
+def test_decrypt_many():
+    payloads = [b"hello", b"", b"world!"]
+    ciphertexts = [xor.Xor.decrypt_one(p, b"ab") for p in payloads]
+
+    assert xor.Xor.decrypt_many(ciphertexts, b"ab") == payloads
+    assert xor.Xor.decrypt_many([], b"ab") == []
+
+
+def test_xor_raw_recovery(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(xor.Xor.decrypt_one(PLAINTEXT, b"bullcrypt"))
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(["--raw", "xor", str(test_file)])
+
+    assert "it was the age of wisdom" in mock_stdout.getvalue()
+
+
+def test_xor_line_key(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(
+        base64.b64encode(xor.Xor.decrypt_one(b"flag{xor}", b"\x13\x37"))
+        + b"\n\n"
+        + base64.b64encode(xor.Xor.decrypt_one(b"second", b"\x13\x37"))
+    )
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            ["--line", "--base64", "--xor.key=1337", "xor", str(test_file)]
+        )
+
+    result: str = mock_stdout.getvalue()
+    assert "flag{xor}" in result
+    assert "second" in result
+
+
+@pytest.mark.parametrize(
+    "arguments,message",
+    [
+        (["--xor.key=zz"], "An XOR key must be hex-encoded: zz"),
+        (["--xor.key="], "An XOR key must not be empty."),
+        (
+            ["--xor.max-key-length=0"],
+            "XOR key length and candidate limits must be positive.",
+        ),
+    ],
+)
+def test_invalid_args(arguments, message):
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    xor.Xor.register_args("xor", parser)
+
+    with pytest.raises(ValueError) as e:
+        xor.Xor.extract_args("xor", parser.parse_args(arguments))
+
+    assert e.value.args[0] == message
+
+
+def test_missing_numpy():
+    with mock.patch.object(xor, "np", None):
+        with pytest.raises(ValueError):
+            xor.Xor.extract_args("xor", argparse.Namespace())
+
+
+def test_invalid_options():
+    options = types.Options(mode="raw", plaintext_encoding=None)
+    with pytest.raises(ValueError) as e:
+        xor.Xor.decrypt_batch(xor.Xor.setup(options), [b""])
+
+    assert e.value.args[0] == "Algorithm options expected to be a dict"
+
+
+def test_decrypt_batch():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    xor.Xor.register_args("xor", parser)
+    arguments = parser.parse_args(["--xor.key=00", "--xor.key=80"])
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options=xor.Xor.extract_args("xor", arguments),
+        validators=(scoring.PrintableValidator(1.0),),
+    )
+
+    payloads = [b"plain", xor.Xor.decrypt_one(b"keyed", b"\x80"), b"\xff"]
+    results = xor.Xor.decrypt_batch(xor.Xor.setup(options), payloads)
+
+    assert [(r.index, r.key_index, r.plaintext) for r in results] == [
+        (0, 0, b"plain"),
+        (1, 1, b"keyed"),
+    ]
+
+    unvalidated = xor.Xor.setup(options._replace(validators=()))
+    unvalidated.validator = None
+    assert len(xor.Xor.decrypt_batch(unvalidated, payloads)) == 3
+
+
+def test_minimal_period():
+    assert xor.Xor._minimal_period(b"abab") == b"ab"
+    assert xor.Xor._minimal_period(b"aba") == b"aba"
+
+
+def test_xor_empty_file(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.touch()
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(["--raw", "xor", str(test_file)])
+
+    assert mock_stdout.getvalue() == ""
+
+
+def test_xor_validator_selects_key(tmp_path: pathlib.Path):
+    test_file: pathlib.Path = tmp_path / "test"
+    test_file.write_bytes(xor.Xor.decrypt_one(b"flag{validated}", b"\x42"))
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        bullcrypt.main.main(
+            [
+                "--raw",
+                "--regex",
+                r"flag\{.*\}",
+                "--xor.key=00",
+                "--xor.key=41",
+                "--xor.key=42",
+                "xor",
+                str(test_file),
+            ]
+        )
+
+    assert mock_stdout.getvalue().count("flag{validated}") == 1
+
+
+def test_xor_default_validator():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    xor.Xor.register_args("xor", parser)
+    keyed = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options=xor.Xor.extract_args(
+            "xor", parser.parse_args(["--xor.key=42"])
+        ),
+    )
+    binary: bytes = bytes(range(256))
+
+    # A given key's plaintext is kept even when binary.
+    assert xor.Xor.validator(keyed) is None
+    assert [
+        r.plaintext
+        for r in xor.Xor.decrypt_batch(
+            xor.Xor.setup(keyed), [xor.Xor.decrypt_one(binary, b"\x42")]
+        )
+    ] == [binary]
+
+    # Recovered keys are checked for printable text unless told otherwise.
+    recovering = keyed._replace(
+        algorithm_options=xor.Xor.extract_args("xor", parser.parse_args([]))
+    )
+    assert isinstance(xor.Xor.validator(recovering), scoring.Pipeline)
+    assert (
+        xor.Xor.validator(
+            recovering._replace(validators=(scoring.PrintableValidator(1.0),))
+        )
+        is not None
+    )
+    assert xor.Xor.validator(keyed._replace(algorithm_options=None)) is None
+
+
+def test_xor_key_space():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    xor.Xor.register_args("xor", parser)
+    options = types.Options(
+        mode="raw",
+        plaintext_encoding=None,
+        algorithm_options=xor.Xor.extract_args(
+            "xor", parser.parse_args(["--xor.key=01", "--xor.key=02"])
+        ),
+    )
+
+    # Every key decrypts, so splitting keys would report a plaintext per shard.
+    assert xor.Xor.key_count(options) is None
+    assert xor.Xor.restrict_keys(options, 1, 2) is options